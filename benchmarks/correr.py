@@ -0,0 +1,197 @@
+"""
+Benchmark de extremo a extremo: recorre los routers dentro del proceso
+(ASGI, sin red) contra la base configurada en .env, idealmente cargada con
+benchmarks.generar_datos.
+
+Por endpoint reporta latencias p50/p90/p99/máx, throughput, bytes
+descargados y RSS máximo del proceso durante la corrida.
+
+Uso:
+    python -m benchmarks.correr --peticiones 200 --concurrencia 10
+    python -m benchmarks.correr --solo censo,denue --json bench.json
+"""
+import argparse
+import asyncio
+import json
+import math
+import random
+import resource
+import sys
+import time
+import httpx
+from benchmarks.generar_datos import MIN_LON, MIN_LAT, MAX_LON, MAX_LAT, USUARIO_BENCH, PASSWORD_BENCH
+
+
+def _bbox(rng: random.Random, ancho: float):
+    lon = rng.uniform(MIN_LON, MAX_LON - ancho)
+    lat = rng.uniform(MIN_LAT, MAX_LAT - ancho)
+    return f"{lon},{lat},{lon + ancho},{lat + ancho}"
+
+
+def _punto(rng: random.Random):
+    return rng.uniform(MIN_LON, MAX_LON), rng.uniform(MIN_LAT, MAX_LAT)
+
+
+def _tesela(rng: random.Random, z: int):
+    lon, lat = _punto(rng)
+    n = 1 << z
+    x = int((lon + 180.0) / 360.0 * n)
+    y = int((1.0 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2.0 * n)
+    return x, y
+
+
+# nombre -> función(rng) que devuelve (método, ruta, params, cuerpo json)
+ESCENARIOS = {
+    "censo": lambda r: ("GET", "/censo/", {"in_bbox": _bbox(r, 0.01)}, None),
+    "censo_ndjson": lambda r: ("GET", "/censo/", {"in_bbox": _bbox(r, 0.01), "format": "ndjson"}, None),
+    "censo_zoom12": lambda r: ("GET", "/censo/", {"in_bbox": _bbox(r, 0.05), "zoom": 12}, None),
+    "denue": lambda r: ("GET", "/denue/", {"in_bbox": _bbox(r, 0.02)}, None),
+    "denue_stream": lambda r: ("GET", "/denue/", {"in_bbox": _bbox(r, 0.02), "format": "geojson-stream"}, None),
+    "denue_hex": lambda r: ("GET", "/denue/", {"in_bbox": _bbox(r, 0.1), "zoom": 12}, None),
+    "colonias": lambda r: ("GET", "/colonias/", {}, None),
+    "colonias_zoom10": lambda r: ("GET", "/colonias/", {"zoom": 10}, None),
+    "colonias_topojson": lambda r: ("GET", "/colonias/", {"format": "topojson"}, None),
+    "censo_topojson": lambda r: ("GET", "/censo/", {"in_bbox": _bbox(r, 0.01), "format": "topojson"}, None),
+    "centralidades": lambda r: ("GET", "/centralidades/", {"clave_2": f"CB-{r.randint(0, 3)}-{r.randint(0, 3)}"}, None),
+    "lista_centralidades": lambda r: ("GET", "/lista-centralidades/", {}, None),
+    "info_manzana": lambda r: ("GET", "/info-manzana/", dict(zip(("lon", "lat"), _punto(r))), None),
+    "info_manzana_batch": lambda r: ("POST", "/info-manzana/batch", {}, {
+        "type": "MultiPoint", "coordinates": [list(_punto(r)) for _ in range(500)],
+    }),
+    "mis_zonas": lambda r: ("GET", "/mis_zonas/", {}, None),
+    "capa_referencia": lambda r: ("GET", "/zonas/capa-referencia-centralidades/", {"clave": "CB-0-0"}, None),
+    "estadisticas_obras": lambda r: ("GET", "/visop/estadisticas/obras", {}, None),
+    "tile_censo_z15": lambda r: ("GET", "/tiles/censo/15/{}/{}.pbf".format(*_tesela(r, 15)), {}, None),
+    "tile_colonias_z12": lambda r: ("GET", "/tiles/colonias/12/{}/{}.pbf".format(*_tesela(r, 12)), {}, None),
+    "comentarios": lambda r: ("GET", f"/comentarios/feature-{r.randint(0, 499)}", {}, None),
+    "comentarios_lote": lambda r: ("POST", "/comentarios/lote", {}, {
+        "feature_ids": [f"feature-{r.randint(0, 499)}" for _ in range(100)], "ultimos": 3,
+    }),
+    "login": lambda r: ("POST", "/login", {}, {"username": USUARIO_BENCH, "password": PASSWORD_BENCH}),
+}
+
+
+def _rss_actual() -> int:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * resource.getpagesize()
+    except OSError:
+        # Sin /proc: máximo histórico del proceso (KiB en Linux, bytes en macOS)
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class _MuestreadorRSS:
+    def __init__(self, intervalo: float = 0.005):
+        self.intervalo = intervalo
+        self.maximo = 0
+        self._tarea = None
+
+    async def _muestrear(self):
+        while True:
+            self.maximo = max(self.maximo, _rss_actual())
+            await asyncio.sleep(self.intervalo)
+
+    def __enter__(self):
+        self.maximo = _rss_actual()
+        self._tarea = asyncio.create_task(self._muestrear())
+        return self
+
+    def __exit__(self, *exc):
+        self._tarea.cancel()
+
+
+def _percentil(valores, p: float):
+    if not valores:
+        return None
+    ordenados = sorted(valores)
+    k = min(len(ordenados) - 1, max(0, math.ceil(p / 100 * len(ordenados)) - 1))
+    return ordenados[k]
+
+
+async def correr_escenario(cliente: httpx.AsyncClient, nombre: str, peticiones: int, concurrencia: int, semilla: int):
+    rng = random.Random(f"{semilla}-{nombre}")
+    solicitudes = [ESCENARIOS[nombre](rng) for _ in range(peticiones)]
+    latencias, estados, descargado = [], {}, 0
+    semaforo = asyncio.Semaphore(concurrencia)
+
+    async def una(metodo, ruta, params, cuerpo):
+        nonlocal descargado
+        async with semaforo:
+            inicio = time.perf_counter()
+            respuesta = await cliente.request(metodo, ruta, params=params, json=cuerpo)
+            latencias.append(time.perf_counter() - inicio)
+            estados[respuesta.status_code] = estados.get(respuesta.status_code, 0) + 1
+            descargado += respuesta.num_bytes_downloaded
+
+    with _MuestreadorRSS() as rss:
+        rss_inicial = rss.maximo
+        inicio = time.perf_counter()
+        await asyncio.gather(*(una(*s) for s in solicitudes))
+        duracion = time.perf_counter() - inicio
+
+    return {
+        "endpoint": nombre,
+        "peticiones": peticiones,
+        "concurrencia": concurrencia,
+        "estados": estados,
+        "p50_ms": round(1000 * _percentil(latencias, 50), 2),
+        "p90_ms": round(1000 * _percentil(latencias, 90), 2),
+        "p99_ms": round(1000 * _percentil(latencias, 99), 2),
+        "max_ms": round(1000 * max(latencias), 2),
+        "req_s": round(peticiones / duracion, 1),
+        "bytes_promedio": descargado // peticiones,
+        "rss_max_mb": round(rss.maximo / 2 ** 20, 1),
+        "rss_delta_mb": round((rss.maximo - rss_inicial) / 2 ** 20, 1),
+    }
+
+
+def _imprimir(resultados):
+    columnas = ["endpoint", "p50_ms", "p90_ms", "p99_ms", "max_ms", "req_s", "bytes_promedio", "rss_max_mb", "rss_delta_mb", "estados"]
+    anchos = {c: max(len(c), *(len(str(r[c])) for r in resultados)) for c in columnas}
+    print("  ".join(c.ljust(anchos[c]) for c in columnas))
+    for r in resultados:
+        print("  ".join(str(r[c]).ljust(anchos[c]) for c in columnas))
+
+
+async def main(args):
+    from main import app  # importa la app con la configuración de .env
+
+    # ASGITransport no dispara los eventos de ciclo de vida; se llaman a mano
+    for manejador in app.router.on_startup:
+        await manejador()
+
+    resultados = []
+    cabeceras = {"Accept-Encoding": "identity"} if args.sin_compresion else {}
+    try:
+        transporte = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transporte, base_url="http://bench", headers=cabeceras, timeout=120) as cliente:
+            for nombre in args.solo:
+                # Una petición de calentamiento (pools, cachés del plan, etc.)
+                await correr_escenario(cliente, nombre, 1, 1, args.semilla)
+                resultados.append(await correr_escenario(cliente, nombre, args.peticiones, args.concurrencia, args.semilla))
+                print(f"  {nombre}: p50 {resultados[-1]['p50_ms']} ms", file=sys.stderr)
+    finally:
+        for manejador in app.router.on_shutdown:
+            await manejador()
+
+    _imprimir(resultados)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(resultados, f, indent=2)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark de los routers vía ASGI")
+    parser.add_argument("--peticiones", type=int, default=100)
+    parser.add_argument("--concurrencia", type=int, default=10)
+    parser.add_argument("--semilla", type=int, default=42)
+    parser.add_argument("--solo", type=lambda s: s.split(","), default=list(ESCENARIOS))
+    parser.add_argument("--sin-compresion", action="store_true", help="envía Accept-Encoding: identity")
+    parser.add_argument("--json", help="guarda los resultados en este archivo")
+    args = parser.parse_args()
+
+    desconocidos = [n for n in args.solo if n not in ESCENARIOS]
+    if desconocidos:
+        sys.exit(f"Escenarios desconocidos: {', '.join(desconocidos)}. Disponibles: {', '.join(ESCENARIOS)}")
+
+    asyncio.run(main(args))
@@ -0,0 +1,189 @@
+"""
+Genera un conjunto de datos sintético y reproducible en un PostGIS local,
+con el mismo esquema que usan los routers (bases General y VISOP).
+
+- cpyv_2020: manzanas en rejilla (teselación) alrededor de Tuxtla.
+- COLONIAS_2023_POB2020_UTM: bloques de manzanas, en UTM 15N (EPSG:32615).
+- centralidad_barrial02: bloques mayores con atributos agregados.
+- denue_tuxtla_cb_2026: establecimientos aleatorios con códigos SCIAN.
+- mis_zonas, faismun_2023_geo, faismun_2024_geo, faismun_2025, comments, users.
+
+Uso (BORRA y recrea las tablas en las bases de .env):
+    python -m benchmarks.generar_datos --confirmar --manzanas 40000 --denue 100000
+
+Por seguridad solo corre contra localhost salvo que se pase --permitir-remoto.
+"""
+import argparse
+import asyncio
+import math
+import sys
+from sqlalchemy import text
+from core.config import settings
+from core.security import hash_password
+from db.connection import engine1, engine2
+
+# Extensión aproximada de Tuxtla Gutiérrez (lon/lat)
+MIN_LON, MIN_LAT, MAX_LON, MAX_LAT = -93.22, 16.70, -93.02, 16.82
+
+# Manzanas por lado de cada colonia y de cada centralidad
+LADO_COLONIA = 6
+LADO_CENTRALIDAD = 24
+
+SECTORES_SCIAN = ["461110", "463211", "722511", "811111", "541110", "621111", "611111", "812110", "431110", "332320"]
+
+USUARIO_BENCH = "bench"
+PASSWORD_BENCH = "bench"
+
+
+def _sentencias_general(manzanas: int, denue: int, zonas: int):
+    lado = max(1, int(math.sqrt(manzanas)))
+    dx = (MAX_LON - MIN_LON) / lado
+    dy = (MAX_LAT - MIN_LAT) / lado
+    sectores = "ARRAY[" + ",".join(f"'{s}'" for s in SECTORES_SCIAN) + "]"
+
+    return [
+        'DROP TABLE IF EXISTS cpyv_2020, denue_tuxtla_cb_2026, "COLONIAS_2023_POB2020_UTM", centralidad_barrial02, mis_zonas, mis_zonas_estadisticas, sync_bajas CASCADE',
+        "CREATE EXTENSION IF NOT EXISTS postgis",
+
+        """CREATE TABLE cpyv_2020 (
+            ogc_fid serial PRIMARY KEY, cvegeo text, pobtot integer, pobmas integer,
+            pobfem integer, vivtot integer, wkb_geometry geometry(Polygon, 4326))""",
+        f"""INSERT INTO cpyv_2020 (cvegeo, pobtot, pobmas, pobfem, vivtot, wkb_geometry)
+            SELECT format('0710100%s%s', lpad(i::text, 4, '0'), lpad(j::text, 4, '0')),
+                   p.tot, p.tot - p.fem, p.fem, greatest(1, p.tot / 4),
+                   ST_MakeEnvelope({MIN_LON} + i * {dx}, {MIN_LAT} + j * {dy},
+                                   {MIN_LON} + (i + 1) * {dx}, {MIN_LAT} + (j + 1) * {dy}, 4326)
+            FROM generate_series(0, {lado - 1}) i, generate_series(0, {lado - 1}) j,
+                 LATERAL (SELECT (20 + random() * 180 + i * 0 + j * 0)::int AS tot) t,
+                 LATERAL (SELECT t.tot, (t.tot * (0.45 + random() * 0.1))::int AS fem) p""",
+        "CREATE INDEX cpyv_2020_geom_idx ON cpyv_2020 USING GIST (wkb_geometry)",
+
+        """CREATE TABLE "COLONIAS_2023_POB2020_UTM" (
+            gid serial PRIMARY KEY, "NOM_ASEN" text, "POBTOT" integer, geom geometry(Polygon, 32615))""",
+        f"""INSERT INTO "COLONIAS_2023_POB2020_UTM" ("NOM_ASEN", "POBTOT", geom)
+            SELECT format('Colonia %s-%s', ci, cj), (500 + random() * 5000)::int,
+                   ST_Transform(ST_MakeEnvelope(
+                       {MIN_LON} + ci * {LADO_COLONIA * dx}, {MIN_LAT} + cj * {LADO_COLONIA * dy},
+                       {MIN_LON} + (ci + 1) * {LADO_COLONIA * dx}, {MIN_LAT} + (cj + 1) * {LADO_COLONIA * dy}, 4326), 32615)
+            FROM generate_series(0, {max(0, lado // LADO_COLONIA - 1)}) ci,
+                 generate_series(0, {max(0, lado // LADO_COLONIA - 1)}) cj""",
+        'CREATE INDEX colonias_geom_idx ON "COLONIAS_2023_POB2020_UTM" USING GIST (geom)',
+
+        """CREATE TABLE centralidad_barrial02 (
+            gid serial PRIMARY KEY, "CLAVE_2" text, "NAME" text, "POBTOT" integer, "VIVTOT" integer,
+            "POBFEM" integer, "POBMAS" integer, geom geometry(Polygon, 4326))""",
+        f"""INSERT INTO centralidad_barrial02 ("CLAVE_2", "NAME", "POBTOT", "VIVTOT", "POBFEM", "POBMAS", geom)
+            SELECT format('CB-%s-%s', ci, cj), format('Centralidad %s-%s', ci, cj),
+                   p.tot, p.tot / 4, p.tot / 2, p.tot - p.tot / 2,
+                   ST_MakeEnvelope(
+                       {MIN_LON} + ci * {LADO_CENTRALIDAD * dx}, {MIN_LAT} + cj * {LADO_CENTRALIDAD * dy},
+                       {MIN_LON} + (ci + 1) * {LADO_CENTRALIDAD * dx}, {MIN_LAT} + (cj + 1) * {LADO_CENTRALIDAD * dy}, 4326)
+            FROM generate_series(0, {max(0, lado // LADO_CENTRALIDAD - 1)}) ci,
+                 generate_series(0, {max(0, lado // LADO_CENTRALIDAD - 1)}) cj,
+                 LATERAL (SELECT (5000 + random() * 50000 + ci * 0 + cj * 0)::int AS tot) p""",
+        'CREATE INDEX centralidad_geom_idx ON centralidad_barrial02 USING GIST (geom)',
+        'CREATE INDEX centralidad_clave_idx ON centralidad_barrial02 ("CLAVE_2")',
+
+        """CREATE TABLE denue_tuxtla_cb_2026 (
+            id serial PRIMARY KEY, nom_estab text, codigo_act text, nombre_act text, geom geometry(Point, 4326))""",
+        f"""INSERT INTO denue_tuxtla_cb_2026 (nom_estab, codigo_act, nombre_act, geom)
+            SELECT format('Establecimiento %s', n), s.codigo, format('Actividad %s', s.codigo),
+                   ST_SetSRID(ST_MakePoint({MIN_LON} + random() * {MAX_LON - MIN_LON},
+                                           {MIN_LAT} + random() * {MAX_LAT - MIN_LAT}), 4326)
+            FROM generate_series(1, {denue}) n,
+                 LATERAL (SELECT ({sectores})[1 + floor(random() * {len(SECTORES_SCIAN)})::int + (n * 0)] AS codigo) s""",
+        "CREATE INDEX denue_geom_idx ON denue_tuxtla_cb_2026 USING GIST (geom)",
+
+        """CREATE TABLE mis_zonas (id serial PRIMARY KEY, nombre text, geom geometry(Geometry, 4326))""",
+        f"""INSERT INTO mis_zonas (nombre, geom)
+            SELECT format('Zona %s', n),
+                   ST_Buffer(ST_SetSRID(ST_MakePoint({MIN_LON} + random() * {MAX_LON - MIN_LON},
+                                                     {MIN_LAT} + random() * {MAX_LAT - MIN_LAT}), 4326), 0.005, 8)
+            FROM generate_series(1, {zonas}) n""",
+        "CREATE INDEX mis_zonas_geom_idx ON mis_zonas USING GIST (geom)",
+
+        'ANALYZE cpyv_2020, denue_tuxtla_cb_2026, "COLONIAS_2023_POB2020_UTM", centralidad_barrial02, mis_zonas',
+    ]
+
+
+def _sentencias_visop(obras: int, comentarios: int):
+    tipos = "ARRAY['Agua potable','Drenaje','Electrificación','Urbanización','Vivienda',NULL]"
+    sentencias = [
+        "DROP TABLE IF EXISTS faismun_2023_geo, faismun_2024_geo, faismun_2025, faismun_estadisticas, sync_bajas, comments, users CASCADE",
+        "CREATE EXTENSION IF NOT EXISTS postgis",
+    ]
+    for tabla, columna in (("faismun_2023_geo", "tipo"), ("faismun_2024_geo", "tipo"), ("faismun_2025", "tipo_proy")):
+        sentencias += [
+            f"""CREATE TABLE {tabla} (
+                id serial PRIMARY KEY, {columna} text, obra_accio text, no_aprobac text,
+                colonia text, geom geometry(Geometry, 4326))""",
+            f"""INSERT INTO {tabla} ({columna}, obra_accio, no_aprobac, colonia, geom)
+                SELECT ({tipos})[1 + floor(random() * 6)::int + (n * 0)], format('Obra %s', n),
+                       format('AP-%s', n), format('Colonia %s', n % 50),
+                       ST_SetSRID(ST_MakePoint({MIN_LON} + random() * {MAX_LON - MIN_LON},
+                                               {MIN_LAT} + random() * {MAX_LAT - MIN_LAT}), 4326)
+                FROM generate_series(1, {obras}) n""",
+            f"CREATE INDEX {tabla}_geom_idx ON {tabla} USING GIST (geom)",
+        ]
+    sentencias += [
+        """CREATE TABLE comments (
+            id serial PRIMARY KEY, feature_id text NOT NULL, content text NOT NULL,
+            created_at timestamptz NOT NULL DEFAULT now())""",
+        f"""INSERT INTO comments (feature_id, content, created_at)
+            SELECT format('feature-%s', floor(random() * 500)::int), format('Comentario %s', n),
+                   now() - (random() * interval '365 days')
+            FROM generate_series(1, {comentarios}) n""",
+        "CREATE INDEX comments_feature_created_idx ON comments (feature_id, created_at DESC, id DESC)",
+        """CREATE TABLE users (
+            id serial PRIMARY KEY, username text UNIQUE NOT NULL, password text NOT NULL, role text NOT NULL)""",
+        "ANALYZE faismun_2023_geo, faismun_2024_geo, faismun_2025, comments, users",
+    ]
+    return sentencias
+
+
+async def _ejecutar(engine, sentencias, semilla: float, extra=None):
+    async with engine.begin() as conn:
+        # setseed hace reproducible random() dentro de esta sesión
+        await conn.execute(text("SELECT setseed(:s)"), {"s": semilla})
+        for sql in sentencias:
+            await conn.execute(text(sql))
+        if extra:
+            await extra(conn)
+
+
+async def main(args):
+    async def crear_usuario(conn):
+        await conn.execute(
+            text("INSERT INTO users (username, password, role) VALUES (:u, :p, 'admin')"),
+            {"u": USUARIO_BENCH, "p": hash_password(PASSWORD_BENCH)},
+        )
+
+    try:
+        await _ejecutar(engine1, _sentencias_general(args.manzanas, args.denue, args.zonas), args.semilla)
+        print(f"General ({settings.DB_NAME}): {args.manzanas} manzanas, {args.denue} establecimientos, {args.zonas} zonas")
+        await _ejecutar(engine2, _sentencias_visop(args.obras, args.comentarios), args.semilla, crear_usuario)
+        print(f"VISOP ({settings.DB_NAME_2}): {args.obras} obras por año, {args.comentarios} comentarios, "
+              f"usuario '{USUARIO_BENCH}'")
+    finally:
+        await engine1.dispose()
+        await engine2.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Datos sintéticos para benchmarks (BORRA las tablas existentes)")
+    parser.add_argument("--manzanas", type=int, default=40000)
+    parser.add_argument("--denue", type=int, default=100000)
+    parser.add_argument("--zonas", type=int, default=200)
+    parser.add_argument("--obras", type=int, default=5000)
+    parser.add_argument("--comentarios", type=int, default=20000)
+    parser.add_argument("--semilla", type=float, default=0.42, help="valor para setseed() entre -1 y 1")
+    parser.add_argument("--confirmar", action="store_true", help="confirma que se pueden borrar las tablas")
+    parser.add_argument("--permitir-remoto", action="store_true")
+    args = parser.parse_args()
+
+    if not args.confirmar:
+        sys.exit("Este comando borra y recrea las tablas; vuelva a ejecutarlo con --confirmar")
+    if settings.DB_HOST not in ("localhost", "127.0.0.1", "::1") and not args.permitir_remoto:
+        sys.exit(f"DB_HOST={settings.DB_HOST} no es local; use --permitir-remoto si está seguro")
+
+    asyncio.run(main(args))
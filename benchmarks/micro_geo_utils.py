@@ -0,0 +1,63 @@
+"""
+Micro-benchmarks de la serialización GeoJSON en Python (sin base de datos).
+
+Compara, con filas sintéticas como las que devuelve ST_AsGeoJSON:
+- rows_to_geojson + json_a_bytes   (camino clásico, json.loads por geometría)
+- fila_a_feature_json              (geometría insertada como texto, usada en streaming)
+
+Uso:
+    python -m benchmarks.micro_geo_utils --filas 10000 --vertices 5 --repeticiones 5
+"""
+import argparse
+import os
+import random
+import timeit
+
+# geo_utils importa la configuración; para este benchmark no hace falta una base real
+for variable in ("DB_HOST", "DB_NAME", "DB_NAME_2", "DB_USER", "DB_PASSWORD"):
+    os.environ.setdefault(variable, "bench")
+
+from services.geo_utils import rows_to_geojson, json_a_bytes, fila_a_feature_json  # noqa: E402
+
+
+def filas_sinteticas(cantidad: int, vertices: int, semilla: int = 42):
+    rng = random.Random(semilla)
+    filas = []
+    for i in range(cantidad):
+        lon, lat = rng.uniform(-93.22, -93.02), rng.uniform(16.70, 16.82)
+        anillo = [[lon + rng.uniform(0, 0.001), lat + rng.uniform(0, 0.001)] for _ in range(vertices)]
+        anillo.append(anillo[0])
+        coords = ",".join(f"[{x!r},{y!r}]" for x, y in anillo)
+        filas.append({
+            "cvegeo": f"07101{i:010d}",
+            "pobtot": rng.randint(0, 300),
+            "pobmas": rng.randint(0, 150),
+            "pobfem": rng.randint(0, 150),
+            "vivtot": rng.randint(0, 80),
+            "geom": '{"type":"Polygon","coordinates":[[' + coords + "]]}",
+        })
+    return filas
+
+
+def main(args):
+    filas = filas_sinteticas(args.filas, args.vertices)
+    casos = {
+        "rows_to_geojson + json_a_bytes": lambda: json_a_bytes(rows_to_geojson(filas)),
+        "fila_a_feature_json (join)": lambda: (
+            '{"type":"FeatureCollection","features":[' + ",".join(fila_a_feature_json(f) for f in filas) + "]}"
+        ).encode("utf-8"),
+    }
+
+    print(f"{args.filas} filas, {args.vertices + 1} vértices por polígono, mejor de {args.repeticiones}")
+    for nombre, caso in casos.items():
+        mejor = min(timeit.repeat(caso, number=1, repeat=args.repeticiones))
+        tamano = len(caso())
+        print(f"  {nombre:<34} {1000 * mejor:9.2f} ms  {args.filas / mejor:12.0f} filas/s  {tamano / 2 ** 20:7.2f} MB")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Micro-benchmarks de services.geo_utils")
+    parser.add_argument("--filas", type=int, default=10000)
+    parser.add_argument("--vertices", type=int, default=5)
+    parser.add_argument("--repeticiones", type=int, default=5)
+    main(parser.parse_args())
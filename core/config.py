@@ -1,3 +1,6 @@
+import os
+import tempfile
+from typing import Optional
 from pydantic_settings import BaseSettings, SettingsConfigDict # pip install pydantic-settings
 
 class Settings(BaseSettings):
@@ -13,9 +16,71 @@ class Settings(BaseSettings):
     DB_USER: str
     DB_PASSWORD: str
     
+    # Pool de conexiones (aplica a primarios y réplicas)
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30
+    DB_POOL_PRE_PING: bool = False
+    DB_POOL_RECYCLE: int = -1  # segundos; -1 = nunca
+    DB_STATEMENT_CACHE_SIZE: int = 100  # 0 para desactivarla (p. ej. detrás de PgBouncer)
+
+    # Réplicas de lectura opcionales (URL completa postgresql+asyncpg://...)
+    DB_REPLICA_URL_1: Optional[str] = None
+    DB_REPLICA_URL_2: Optional[str] = None
+    
+    # Registro de consultas lentas (0 lo desactiva) y fracción de ellas con EXPLAIN ANALYZE
+    CONSULTA_LENTA_MS: float = 500
+    CONSULTA_LENTA_MUESTRA_EXPLAIN: float = 0.1
+    
     # Opción de servidor
     DEBUG: bool = False 
 
+    # Serialización GeoJSON: True = PostGIS arma el FeatureCollection completo,
+    # False = camino clásico (filas + rows_to_geojson en Python)
+    GEOJSON_EN_BD: bool = True
+
+    # Caché en proceso de capas de referencia (services/cache.py)
+    CACHE_MAX_ENTRADAS: int = 256
+    CACHE_MAX_BYTES: int = 256 * 1024 * 1024
+    CACHE_TTL_SEGUNDOS: float = 3600
+
+    # Índice en memoria de manzanas (requiere shapely y numpy)
+    INDICE_MANZANAS_EN_MEMORIA: bool = False
+
+    # Ajusta los bbox de /censo/ y /denue/ a la rejilla de teselas (claves compartidas)
+    BBOX_REJILLA: bool = True
+    # Si el bbox ajustado cubre más de este múltiplo del área pedida se consulta el original
+    BBOX_REJILLA_MAX_EXPANSION: float = 4.0
+
+    # Agregación de /denue/ por zoom: por debajo de DENUE_ZOOM_PUNTOS se devuelven
+    # celdas ("hex" con ST_HexagonGrid o "rejilla" con ST_SnapToGrid) con conteos por sector
+    DENUE_ZOOM_PUNTOS: int = 15
+    DENUE_AGRUPACION: str = "hex"
+    DENUE_CELDA_PX: int = 64
+
+    # format=topojson: pasos de la rejilla de cuantización sobre el bbox de la respuesta
+    TOPOJSON_CUANTIZACION: int = 100000
+
+    # Hashing de contraseñas (bcrypt) fuera del event loop
+    BCRYPT_ROUNDS: int = 12
+    HASH_WORKERS: int = 4
+    HASH_MAX_COLA: int = 32
+
+    # Máximo de features por petición en las cargas masivas (/bulk)
+    CARGA_MAX_FEATURES: int = 50000
+    # Tope del cuerpo FeatureCollection, que se lee completo en memoria (el NDJSON va en streaming)
+    CARGA_MAX_BYTES_COLECCION: int = 100 * 1024 * 1024
+
+    # Exportación FlatGeobuf (/export/{layer}.fgb) con ogr2ogr de GDAL
+    EXPORT_DIR: str = os.path.join(tempfile.gettempdir(), "ovie_exportaciones")
+    OGR2OGR_BIN: str = "ogr2ogr"
+    EXPORT_TIMEOUT_SEGUNDOS: float = 600
+
+    # Trabajos de exportación en segundo plano (/exportaciones)
+    EXPORT_WORKERS: int = 2
+    EXPORT_MAX_COLA: int = 50
+    EXPORT_RETENCION_SEGUNDOS: float = 24 * 3600
+
     # Configuración del cargador
     model_config = SettingsConfigDict(
         env_file=".env", 
@@ -1,12 +1,23 @@
 from passlib.context import CryptContext #pip install passlib[bcrypt] 
 import jwt #pip install PyJWT
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
+from core.config import settings
 
 SECRET_KEY = "super_secret_key" #sirver para firmar los tokens, debe ser una cadena larga y segura en producción
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 #1 hora
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# min/max = rounds: los hashes con otro costo se marcan para rehash (verify_and_update)
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__rounds=settings.BCRYPT_ROUNDS,
+    bcrypt__min_rounds=settings.BCRYPT_ROUNDS,
+    bcrypt__max_rounds=settings.BCRYPT_ROUNDS,
+)
 
 def hash_password(password: str):
     return pwd_context.hash(password)
@@ -14,8 +25,81 @@ def hash_password(password: str):
 def verify_password(plain_password, hashed_password):
     return pwd_context.verify(plain_password, hashed_password)
 
+class PoolHashSaturado(Exception):
+    """La cola del pool de hashing está llena; el llamador debe responder 503."""
+
+
+class PoolHash:
+    """
+    Pool acotado de hilos para bcrypt, fuera del event loop.
+    bcrypt libera el GIL mientras calcula, así que los hilos corren en paralelo.
+    """
+    def __init__(self, workers: int, max_cola: int):
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+        self.workers = workers
+        self.max_cola = max_cola
+        self.pendientes = 0
+        self.completadas = 0
+        self.rechazadas = 0
+        self.segundos_espera = 0.0
+        self.segundos_total = 0.0
+        self.segundos_max = 0.0
+
+    async def ejecutar(self, fn, *args):
+        if self.pendientes >= self.workers + self.max_cola:
+            self.rechazadas += 1
+            raise PoolHashSaturado()
+
+        self.pendientes += 1
+        encolado = time.perf_counter()
+        inicio = []
+
+        def tarea():
+            inicio.append(time.perf_counter())
+            return fn(*args)
+
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, tarea)
+        finally:
+            fin = time.perf_counter()
+            self.pendientes -= 1
+            self.completadas += 1
+            self.segundos_espera += (inicio[0] if inicio else fin) - encolado
+            self.segundos_total += fin - encolado
+            self.segundos_max = max(self.segundos_max, fin - encolado)
+
+    def estadisticas(self):
+        return {
+            "workers": self.workers,
+            "max_cola": self.max_cola,
+            "pendientes": self.pendientes,
+            "en_cola": max(0, self.pendientes - self.workers),
+            "completadas": self.completadas,
+            "rechazadas": self.rechazadas,
+            "espera_promedio_ms": round(1000 * self.segundos_espera / self.completadas, 2) if self.completadas else None,
+            "latencia_promedio_ms": round(1000 * self.segundos_total / self.completadas, 2) if self.completadas else None,
+            "latencia_max_ms": round(1000 * self.segundos_max, 2),
+        }
+
+
+pool_hash = PoolHash(workers=settings.HASH_WORKERS, max_cola=settings.HASH_MAX_COLA)
+
+async def verify_and_update_password(plain_password, hashed_password):
+    """
+    Verifica en el pool de hashing. Devuelve (valido, nuevo_hash); nuevo_hash
+    no es None cuando el hash guardado usa otro costo y hay que reemplazarlo.
+    Lanza PoolHashSaturado si la cola está llena.
+    """
+    return await pool_hash.ejecutar(pwd_context.verify_and_update, plain_password, hashed_password)
+
 def create_access_token(data: dict):
     to_encode = data.copy()
     expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     to_encode.update({"exp": expire})
-    return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
\ No newline at end of file
+    return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+
+def decode_access_token(token: str):
+    """
+    Valida firma y expiración del token; lanza jwt.PyJWTError si no es válido.
+    """
+    return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
\ No newline at end of file
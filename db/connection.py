@@ -1,5 +1,7 @@
+import time
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
 from sqlalchemy.orm import declarative_base
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from core.config import settings
 
 # 1. Definición de las URLs de conexión (Usando asyncpg)
@@ -7,14 +9,60 @@ from core.config import settings
 DATABASE_URL_1 = f"postgresql+asyncpg://{settings.DB_USER}:{settings.DB_PASSWORD}@{settings.DB_HOST}:{settings.DB_PORT}/{settings.DB_NAME}"
 DATABASE_URL_2 = f"postgresql+asyncpg://{settings.DB_USER}:{settings.DB_PASSWORD}@{settings.DB_HOST}:{settings.DB_PORT}/{settings.DB_NAME_2}"
 
+class PoolMedido(AsyncAdaptedQueuePool):
+    """
+    Pool estándar que además mide cuánto se espera para obtener una conexión.
+    services.metricas asigna `observar_espera` al instrumentar el engine.
+    """
+    observar_espera = None
+
+    def _do_get(self):
+        inicio = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            if self.observar_espera:
+                self.observar_espera(time.perf_counter() - inicio)
+
+def crear_engine(url: str):
+    """
+    Engine asíncrono con la configuración de pool de core.config.Settings.
+    """
+    return create_async_engine(
+        url,
+        echo=False,
+        poolclass=PoolMedido,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_pre_ping=settings.DB_POOL_PRE_PING,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        connect_args={
+            # Caché de sentencias preparadas: la de asyncpg y la del dialecto de SQLAlchemy
+            "statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE,
+            "prepared_statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE,
+        },
+    )
+
 # 2. Creación de los Engines Asíncronos
 # SQLAlchemy maneja internamente el pooling de conexiones (sustituye a ThreadedConnectionPool)
-engine1 = create_async_engine(DATABASE_URL_1, echo=False, pool_size=5, max_overflow=10)
-engine2 = create_async_engine(DATABASE_URL_2, echo=False, pool_size=5, max_overflow=10)
+engine1 = crear_engine(DATABASE_URL_1)
+engine2 = crear_engine(DATABASE_URL_2)
+
+# Réplicas de solo lectura (opcionales); sin réplica se lee del primario
+engine1_lectura = crear_engine(settings.DB_REPLICA_URL_1) if settings.DB_REPLICA_URL_1 else engine1
+engine2_lectura = crear_engine(settings.DB_REPLICA_URL_2) if settings.DB_REPLICA_URL_2 else engine2
 
 # 3. Creadores de Sesiones
 AsyncSessionLocal1 = async_sessionmaker(bind=engine1, class_=AsyncSession, expire_on_commit=False)
 AsyncSessionLocal2 = async_sessionmaker(bind=engine2, class_=AsyncSession, expire_on_commit=False)
+AsyncSessionLectura1 = async_sessionmaker(bind=engine1_lectura, class_=AsyncSession, expire_on_commit=False)
+AsyncSessionLectura2 = async_sessionmaker(bind=engine2_lectura, class_=AsyncSession, expire_on_commit=False)
+
+# Por nombre de base (clave "bd" de services.capas)
+ENGINES = {"general": engine1, "visop": engine2}
+ENGINES_LECTURA = {"general": engine1_lectura, "visop": engine2_lectura}
+SESIONES_LECTURA = {"general": AsyncSessionLectura1, "visop": AsyncSessionLectura2}
 
 Base = declarative_base()
 
@@ -36,5 +84,21 @@ async def get_db_visop():
         finally:
             await session.close()
 
+async def get_db_lectura():
+    """Dependencia de solo lectura para la Base General (réplica si está configurada)"""
+    async with AsyncSessionLectura1() as session:
+        try:
+            yield session
+        finally:
+            await session.close()
+
+async def get_db_visop_lectura():
+    """Dependencia de solo lectura para la Base VISOP (réplica si está configurada)"""
+    async with AsyncSessionLectura2() as session:
+        try:
+            yield session
+        finally:
+            await session.close()
+
 # Nota: Las funciones execute_read_query y execute_write_query se vuelven obsoletas.
 # Ahora la lógica de ejecución se mueve a los archivos en /services/ usando la sesión inyectada.
\ No newline at end of file
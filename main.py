@@ -1,3 +1,5 @@
+import asyncio
+import signal
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 # Importamos los routers (ya convertidos a async)
@@ -6,8 +8,20 @@ from routers.zonas import router as zonas_router
 from routers.visop_geo import router as visop_router
 from routers.auth_router import router as auth_router
 from routers.comment_router import router as comment_router
+from routers.tiles import router as tiles_router
+from routers.admin import router as admin_router
+from routers.metricas import router as metricas_router
+from routers.exportaciones import router as exportaciones_router
 # Importamos los engines para monitorear el inicio
-from db.connection import engine1, engine2 
+from db.connection import engine1, engine2, engine1_lectura, engine2_lectura, AsyncSessionLocal1, AsyncSessionLocal2
+from core.config import settings
+from services.indice_manzanas import indice_manzanas
+from models.comment_model import has_feature_created_index
+from services.estadisticas_zonas import asegurar_tabla as asegurar_estadisticas_zonas
+from services.metricas import MetricasMiddleware, instrumentar_engine
+from services.trabajos_exportacion import gestor_exportaciones
+from services.consultas_lentas import registrar_consultas_lentas
+from services.auditoria_indices import auditar_indices
 
 app = FastAPI(title="API OVIE Tuxtla 2026", root_path="/api")
 
@@ -18,14 +32,37 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Cabeceras que el frontend necesita leer (paginación por cursor, lecturas Range de .fgb)
+    expose_headers=["X-Siguiente-Cursor", "Content-Range", "Accept-Ranges", "Content-Length"],
 )
 
+# --- MÉTRICAS (GET /metrics) ---
+app.add_middleware(MetricasMiddleware)
+instrumentar_engine(engine1, "general")
+instrumentar_engine(engine2, "visop")
+if engine1_lectura is not engine1:
+    instrumentar_engine(engine1_lectura, "general_lectura")
+if engine2_lectura is not engine2:
+    instrumentar_engine(engine2_lectura, "visop_lectura")
+
+# --- CONSULTAS LENTAS (settings.CONSULTA_LENTA_MS) ---
+registrar_consultas_lentas(engine1, "general")
+registrar_consultas_lentas(engine2, "visop")
+if engine1_lectura is not engine1:
+    registrar_consultas_lentas(engine1_lectura, "general_lectura")
+if engine2_lectura is not engine2:
+    registrar_consultas_lentas(engine2_lectura, "visop_lectura")
+
 # --- REGISTRO DE RUTAS ---
 app.include_router(geografia_router)
 app.include_router(zonas_router)
 app.include_router(visop_router) 
 app.include_router(auth_router)
 app.include_router(comment_router)
+app.include_router(tiles_router)
+app.include_router(admin_router)
+app.include_router(metricas_router)
+app.include_router(exportaciones_router)
 
 @app.on_event("startup")
 async def startup():
@@ -33,14 +70,70 @@ async def startup():
     # pero podemos verificar la configuración aquí.
     print("Servidor OVIE 2026 iniciado en modo ASYNC con SQLAlchemy + asyncpg")
 
+    # Workers de /exportaciones
+    gestor_exportaciones.iniciar()
+
+    # La paginación de /comentarios/ depende de este índice
+    try:
+        async with AsyncSessionLocal2() as session:
+            if not await has_feature_created_index(session):
+                print("AVISO: falta el índice de comments (feature_id, created_at). Créelo con:\n"
+                      "  CREATE INDEX CONCURRENTLY comments_feature_created_idx "
+                      "ON comments (feature_id, created_at DESC, id DESC);")
+    except Exception as e:
+        print(f"No se pudo verificar el índice de comments: {e}")
+
+    # Índices espaciales y de búsqueda que esperan los routers (detalle en GET /admin/indices)
+    try:
+        for entrada in await auditar_indices():
+            if entrada["estado"] == "falta":
+                print(f"AVISO: falta índice {entrada['metodo']} en {entrada['tabla']}.{entrada['columna']} "
+                      f"({entrada['bd']}). Sugerencia:\n  {entrada['sugerencia']}")
+            elif entrada["estado"] == "sin_tabla":
+                print(f"AVISO: la tabla {entrada['tabla']} ({entrada['bd']}) no existe")
+    except Exception as e:
+        print(f"No se pudo auditar los índices: {e}")
+
+    # Tabla de estadísticas zonales de mis_zonas (se llena al guardar zonas)
+    try:
+        async with AsyncSessionLocal1() as session:
+            await asegurar_estadisticas_zonas(session)
+            await session.commit()
+    except Exception as e:
+        print(f"No se pudo crear mis_zonas_estadisticas: {e}")
+
+    if settings.INDICE_MANZANAS_EN_MEMORIA:
+        if not indice_manzanas.disponible:
+            print("INDICE_MANZANAS_EN_MEMORIA activo pero faltan shapely/numpy; se usará la base de datos")
+        else:
+            # Si falla, el índice queda inactivo y /censo/ e /info-manzana/ consultan la base
+            try:
+                await indice_manzanas.cargar(engine1_lectura)
+            except Exception as e:
+                print(f"No se pudo cargar el índice de manzanas en memoria: {e}")
+            # kill -HUP <pid> recarga el índice sin reiniciar el proceso
+            sighup = getattr(signal, "SIGHUP", None)
+            if sighup:
+                try:
+                    asyncio.get_running_loop().add_signal_handler(
+                        sighup, lambda: asyncio.create_task(indice_manzanas.recargar(engine1_lectura))
+                    )
+                except NotImplementedError:
+                    pass
+
 @app.on_event("shutdown")
 async def shutdown():
     """
     Cerramos los engines asíncronos para asegurar que no queden 
     conexiones colgadas en PostgreSQL.
     """
+    await gestor_exportaciones.detener()
     await engine1.dispose()
     await engine2.dispose()
+    if engine1_lectura is not engine1:
+        await engine1_lectura.dispose()
+    if engine2_lectura is not engine2:
+        await engine2_lectura.dispose()
     print("Motores de base de datos General y VISOP cerrados correctamente")
 
 @app.get("/")
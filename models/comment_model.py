@@ -20,15 +20,64 @@ async def create_comment(db: AsyncSession, feature_id: str, content: str):
     # Obtenemos el ID retornado
     return result.scalar()
 
-async def get_comments_by_feature(db: AsyncSession, feature_id: str):
-    query = text("""
+async def get_comments_by_feature(db: AsyncSession, feature_id: str, limite: int, despues_de: tuple = None):
+    """
+    Página de comentarios (más recientes primero) por keyset sobre (created_at, id).
+    `despues_de` es el (created_at, id) del último comentario de la página anterior.
+    """
+    filtro_cursor = "AND (created_at, id) < (:cursor_fecha, :cursor_id)" if despues_de else ""
+    query = text(f"""
         SELECT id, content, created_at
         FROM comments
-        WHERE feature_id = :feature_id
-        ORDER BY created_at DESC;
+        WHERE feature_id = :feature_id {filtro_cursor}
+        ORDER BY created_at DESC, id DESC
+        LIMIT :limite;
     """)
 
-    result = await db.execute(query, {"feature_id": feature_id})
+    params = {"feature_id": feature_id, "limite": limite}
+    if despues_de:
+        params["cursor_fecha"], params["cursor_id"] = despues_de
+
+    result = await db.execute(query, params)
     
     # .mappings().all() emula el comportamiento de RealDictCursor (lista de dicts)
-    return result.mappings().all()
\ No newline at end of file
+    return result.mappings().all()
+
+async def get_comments_summary(db: AsyncSession, feature_ids: list, ultimos: int):
+    """
+    Conteo y últimos N comentarios de muchos features en una sola consulta.
+    """
+    query = text("""
+        SELECT f.feature_id, c.total, COALESCE(u.ultimos, '[]'::json)::text AS ultimos
+        FROM unnest(CAST(:feature_ids AS text[])) AS f(feature_id)
+        CROSS JOIN LATERAL (
+            SELECT COUNT(*) AS total FROM comments WHERE feature_id = f.feature_id
+        ) c
+        LEFT JOIN LATERAL (
+            SELECT json_agg(json_build_object('id', x.id, 'content', x.content, 'created_at', x.created_at)
+                            ORDER BY x.created_at DESC, x.id DESC) AS ultimos
+            FROM (
+                SELECT id, content, created_at FROM comments
+                WHERE feature_id = f.feature_id
+                ORDER BY created_at DESC, id DESC
+                LIMIT :ultimos
+            ) x
+        ) u ON true
+    """)
+
+    result = await db.execute(query, {"feature_ids": feature_ids, "ultimos": ultimos})
+    return result.mappings().all()
+
+async def has_feature_created_index(db: AsyncSession):
+    """
+    True si existe un índice que empiece por (feature_id, created_at) en comments.
+    """
+    query = text("""
+        SELECT EXISTS (
+            SELECT 1 FROM pg_indexes
+            WHERE tablename = 'comments'
+              AND replace(indexdef, '"', '') LIKE '%(feature_id, created_at%'
+        )
+    """)
+    result = await db.execute(query)
+    return bool(result.scalar())
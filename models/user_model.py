@@ -12,4 +12,14 @@ async def get_user_by_username(db: AsyncSession, username: str):
     result = await db.execute(query, {"username": username})
     
     # .mappings().first() devuelve un diccionario o None si no existe
-    return result.mappings().first()
\ No newline at end of file
+    return result.mappings().first()
+
+async def update_user_password(db: AsyncSession, user_id, hashed_password: str):
+    query = text("""
+        UPDATE users
+        SET password = :password
+        WHERE id = :id
+    """)
+
+    await db.execute(query, {"id": user_id, "password": hashed_password})
+    await db.commit()
\ No newline at end of file
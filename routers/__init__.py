@@ -2,4 +2,8 @@ from .geografia import router
 from .zonas import router
 from .visop_geo import router
 from .auth_router import router
-from .comment_router import router
\ No newline at end of file
+from .comment_router import router
+from .tiles import router
+from .admin import router
+from .metricas import router
+from .exportaciones import router
\ No newline at end of file
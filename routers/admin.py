@@ -0,0 +1,109 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+from db.connection import get_db_visop, engine1_lectura
+from core.security import pool_hash
+from services.auth_service import require_admin
+from services.cache import cache_respuestas
+from services.estadisticas_service import refrescar_resumen
+from services.indice_manzanas import indice_manzanas
+from services.trabajos_exportacion import gestor_exportaciones
+from services.vuelo_unico import vuelo_unico
+from services.consultas_lentas import consultas_lentas_recientes
+from services.auditoria_indices import auditar_indices
+
+router = APIRouter(prefix="/admin", tags=["Administración"], dependencies=[Depends(require_admin)])
+
+@router.get("/cache")
+async def get_estadisticas_cache():
+    """
+    Contadores de la caché de respuestas (hits, misses, expulsiones, tamaño).
+    """
+    return cache_respuestas.estadisticas()
+
+@router.get("/coalescencia")
+async def get_estadisticas_coalescencia():
+    """
+    Consultas bbox ejecutadas vs. peticiones que compartieron una ejecución en curso.
+    """
+    return vuelo_unico.estadisticas()
+
+@router.get("/hash")
+async def get_estadisticas_hash():
+    """
+    Profundidad de cola y latencias del pool de bcrypt usado por /login.
+    """
+    return pool_hash.estadisticas()
+
+@router.get("/exportaciones")
+async def get_estadisticas_exportaciones():
+    """
+    Cola de exportaciones en segundo plano: trabajos por estado, deduplicados y rechazados.
+    """
+    return gestor_exportaciones.estadisticas()
+
+@router.delete("/cache")
+async def limpiar_cache():
+    """
+    Vacía la caché de respuestas.
+    """
+    cache_respuestas.limpiar()
+    return {"mensaje": "Caché vaciada"}
+
+@router.post("/estadisticas/refrescar")
+async def refrescar_estadisticas(db: AsyncSession = Depends(get_db_visop)):
+    """
+    Recalcula el resumen materializado de obras FAISMUN.
+    """
+    try:
+        await refrescar_resumen(db)
+    except Exception as e:
+        await db.rollback()
+        print(f"Error al refrescar estadísticas: {e}")
+        raise HTTPException(status_code=500, detail="Error interno al refrescar las estadísticas")
+
+    cache_respuestas.invalidar("faismun")
+    return {"mensaje": "Estadísticas actualizadas"}
+
+@router.get("/indice-manzanas")
+async def get_estado_indice_manzanas():
+    """
+    Estado y uso de memoria del índice de manzanas en memoria.
+    """
+    return indice_manzanas.memoria()
+
+@router.post("/indice-manzanas/recargar")
+async def recargar_indice_manzanas():
+    """
+    Vuelve a leer cpyv_2020 y reconstruye el índice en memoria.
+    """
+    if not indice_manzanas.disponible:
+        raise HTTPException(status_code=503, detail="shapely/numpy no instalados en el servidor")
+
+    try:
+        await indice_manzanas.cargar(engine1_lectura)
+    except Exception as e:
+        print(f"Error al recargar índice de manzanas: {e}")
+        raise HTTPException(status_code=500, detail="Error interno al recargar el índice")
+
+    return indice_manzanas.memoria()
+
+
+@router.get("/consultas-lentas")
+async def get_consultas_lentas():
+    """
+    Últimas consultas que superaron CONSULTA_LENTA_MS, con su plan si se muestreó.
+    """
+    return consultas_lentas_recientes()
+
+@router.get("/indices")
+async def get_auditoria_indices():
+    """
+    Índices GiST y de búsqueda esperados por los routers y cuáles faltan.
+    """
+    try:
+        reporte = await auditar_indices()
+    except Exception as e:
+        print(f"Error al auditar índices: {e}")
+        raise HTTPException(status_code=500, detail="Error interno al auditar los índices")
+
+    return {"faltantes": sum(1 for r in reporte if r["estado"] != "ok"), "indices": reporte}
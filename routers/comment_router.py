@@ -1,8 +1,8 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Query, Response
 from sqlalchemy.ext.asyncio import AsyncSession
-from db.connection import get_db_visop  # Conexión a la base de datos VISOP
-from schemas.zonas import CommentCreate
-from services.comment_service import add_comment, list_comments
+from db.connection import get_db_visop, get_db_visop_lectura  # Conexión a la base de datos VISOP
+from schemas.zonas import CommentCreate, CommentSummaryRequest
+from services.comment_service import add_comment, list_comments, summarize_comments
 
 router = APIRouter(prefix="/comentarios", tags=["comentarios"])
 
@@ -21,13 +21,31 @@ async def create_comment_endpoint(
         content=data.content
     )
 
+@router.post("/lote")
+async def get_comments_summary_endpoint(
+    data: CommentSummaryRequest,
+    db: AsyncSession = Depends(get_db_visop_lectura)
+):
+    """
+    Conteo y últimos N comentarios de varios features en una sola consulta.
+    """
+    return await summarize_comments(db=db, feature_ids=data.feature_ids, ultimos=data.ultimos)
+
 @router.get("/{feature_id}")
 async def get_comments(
     feature_id: str, 
-    db: AsyncSession = Depends(get_db_visop)
+    response: Response,
+    limite: int = Query(50, ge=1, le=200),
+    cursor: str = Query(None),
+    db: AsyncSession = Depends(get_db_visop_lectura)
 ):
     """
-    Lista los comentarios asociados a un feature desde la base de datos VISOP.
+    Lista los comentarios asociados a un feature desde la base de datos VISOP,
+    paginados por cursor. Si hay más, el cursor de la siguiente página va en
+    la cabecera X-Siguiente-Cursor.
     """
     # Llamada asíncrona al service
-    return await list_comments(db=db, feature_id=feature_id)
\ No newline at end of file
+    comentarios, siguiente = await list_comments(db=db, feature_id=feature_id, limite=limite, cursor=cursor)
+    if siguiente:
+        response.headers["X-Siguiente-Cursor"] = siguiente
+    return comentarios
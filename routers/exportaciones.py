@@ -0,0 +1,107 @@
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import FileResponse, JSONResponse
+from schemas.zonas import ExportacionCreate
+from services.capas import obtener_capa
+from services.exportacion_fgb import archivo_fgb, ExportacionNoDisponible, FGB_MEDIA_TYPE
+from services.trabajos_exportacion import (
+    gestor_exportaciones, ColaExportacionLlena, FORMATOS_EXPORTACION, TERMINADO
+)
+
+router = APIRouter(tags=["Exportaciones"])
+
+@router.get("/export/{layer}.fgb")
+async def exportar_fgb(layer: str):
+    """
+    Capa completa en FlatGeobuf con índice espacial. FileResponse atiende
+    peticiones Range, así que los clientes leen solo la parte de su bbox.
+    """
+    capa = obtener_capa(layer)
+    if not capa:
+        raise HTTPException(status_code=404, detail=f"Capa '{layer}' no disponible")
+
+    try:
+        ruta = await archivo_fgb(layer, capa)
+    except ExportacionNoDisponible as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except LookupError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        print(f"Error al exportar {layer}: {e}")
+        raise HTTPException(status_code=500, detail="Error interno al generar la exportación")
+
+    return FileResponse(
+        ruta,
+        media_type=FGB_MEDIA_TYPE,
+        filename=f"{layer}.fgb",
+        content_disposition_type="inline",
+        headers={"Cache-Control": f"public, max-age={capa['max_age']}"},
+    )
+
+def _estado(request: Request, trabajo):
+    datos = trabajo.a_dict()
+    datos["estado_url"] = str(request.url_for("get_exportacion", trabajo_id=trabajo.id))
+    if trabajo.estado == TERMINADO:
+        datos["descarga_url"] = str(request.url_for("descargar_exportacion", trabajo_id=trabajo.id))
+    return datos
+
+@router.post("/exportaciones", status_code=202)
+async def crear_exportacion(request: Request, datos: ExportacionCreate):
+    """
+    Encola la exportación de una capa (completa o recortada a un bbox).
+    Responde 202 con el id del trabajo; un trabajo idéntico que siga pendiente
+    o en proceso se reutiliza en lugar de encolar otro.
+    """
+    capa = obtener_capa(datos.capa)
+    if not capa:
+        raise HTTPException(status_code=404, detail=f"Capa '{datos.capa}' no disponible")
+    if datos.formato not in FORMATOS_EXPORTACION:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Formato no soportado. Opciones: {', '.join(FORMATOS_EXPORTACION)}"
+        )
+
+    bbox = None
+    if datos.in_bbox:
+        try:
+            bbox = [float(v) for v in datos.in_bbox.split(",")]
+        except ValueError:
+            bbox = []
+        if len(bbox) != 4 or bbox[0] >= bbox[2] or bbox[1] >= bbox[3]:
+            raise HTTPException(status_code=400, detail="in_bbox debe ser min_lon,min_lat,max_lon,max_lat")
+        if datos.formato == "fgb":
+            # El .fgb trae índice espacial: el recorte se hace del lado del cliente con Range
+            raise HTTPException(status_code=400, detail="fgb solo se exporta como capa completa")
+
+    try:
+        trabajo = gestor_exportaciones.enviar(datos.capa, capa, bbox, datos.formato)
+    except ColaExportacionLlena as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "30"})
+
+    return JSONResponse(
+        status_code=202,
+        content=_estado(request, trabajo),
+        headers={"Location": str(request.url_for("get_exportacion", trabajo_id=trabajo.id))},
+    )
+
+@router.get("/exportaciones/{trabajo_id}")
+async def get_exportacion(request: Request, trabajo_id: str):
+    """
+    Estado del trabajo: pendiente, en_proceso, terminado o error.
+    """
+    trabajo = gestor_exportaciones.obtener(trabajo_id)
+    if not trabajo:
+        raise HTTPException(status_code=404, detail="Exportación no encontrada o vencida")
+    return _estado(request, trabajo)
+
+@router.get("/exportaciones/{trabajo_id}/descarga")
+async def descargar_exportacion(trabajo_id: str):
+    """
+    Archivo del trabajo terminado (admite peticiones Range).
+    """
+    trabajo = gestor_exportaciones.obtener(trabajo_id)
+    if not trabajo:
+        raise HTTPException(status_code=404, detail="Exportación no encontrada o vencida")
+    if trabajo.estado != TERMINADO:
+        raise HTTPException(status_code=409, detail=f"La exportación está en estado '{trabajo.estado}'")
+
+    return FileResponse(trabajo.ruta, media_type=trabajo.media_type, filename=trabajo.nombre_archivo)
@@ -1,65 +1,258 @@
-from fastapi import APIRouter, Query, HTTPException, Depends
+from fastapi import APIRouter, Query, HTTPException, Depends, Request
+from typing import List, Union
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import text
-from db.connection import get_db
-from services.geo_utils import rows_to_geojson
+from db.connection import get_db, get_db_lectura, engine1_lectura, AsyncSessionLectura1
+from core.config import settings
+from schemas.zonas import PuntoLatLon, MultiPointGeoJSON
+from services.geo_utils import (
+    consultar_geojson, respuesta_stream, validar_formato, FORMATOS_STREAM,
+    json_a_bytes, ajustar_bbox_a_rejilla, tamano_celda,
+    validar_campos, construir_consulta_capa, consultar_pagina
+)
+from services.cache import CacheRespuestas, cache_respuestas, obtener_o_calcular
+from services.vuelo_unico import vuelo_unico
+from services.respuestas import Payload, responder
+from services.generalizacion import expresion_geojson, precision_para
+from services.indice_manzanas import indice_manzanas
+from services.sincronizacion import responder_cambios
+from services.capas import obtener_capa
+from services.topojson import consultar_topojson
 
 router = APIRouter(tags=["Geografía y Censo"])
 
+def _parsear_bbox(in_bbox: str):
+    bbox = list(map(float, in_bbox.split(',')))
+    # Ajuste a la rejilla de teselas: bboxes casi iguales comparten clave (y consulta)
+    if not settings.BBOX_REJILLA:
+        return bbox
+    return ajustar_bbox_a_rejilla(bbox, max_expansion=settings.BBOX_REJILLA_MAX_EXPANSION)
+
+def _bbox_opcional(in_bbox: str):
+    """
+    in_bbox de las rutas de capa completa: None si no viene, 400 si no son 4 números.
+    Es un filtro del cliente, así que no se ajusta a la rejilla de teselas.
+    """
+    if not in_bbox:
+        return None
+    try:
+        bbox = list(map(float, in_bbox.split(',')))
+        if len(bbox) != 4:
+            raise ValueError(in_bbox)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="in_bbox debe ser min_lon,min_lat,max_lon,max_lat")
+    return bbox
+
+async def _geojson_compartido(ruta: str, sql: str, params: dict) -> Payload:
+    """
+    Ejecuta la consulta una sola vez para todas las peticiones idénticas en curso.
+    Usa su propia sesión porque la ejecución no pertenece a una sola petición.
+    """
+    async def producir():
+        async with AsyncSessionLectura1() as session:
+            return Payload(await consultar_geojson(session, sql, params))
+
+    return await vuelo_unico.ejecutar(CacheRespuestas.clave(ruta, sql=sql, **params), producir)
+
+# Formatos de las capas poligonales sin streaming
+FORMATOS_POLIGONOS = ("geojson", "topojson")
+
+def _validar_formato_poligonos(formato: str):
+    if formato not in FORMATOS_POLIGONOS:
+        raise HTTPException(status_code=400, detail=f"Formato no soportado. Opciones: {', '.join(FORMATOS_POLIGONOS)}")
+
+async def _topojson_cacheado(request: Request, db: AsyncSession, ruta: str, sql: str, params: dict,
+                             nombre_objeto: str, etiqueta: str):
+    """
+    Topología cacheada por capa y consulta (en /censo/ el bbox ya viene ajustado a la rejilla).
+    """
+    async def producir():
+        return await consultar_topojson(db, sql, params, nombre_objeto)
+
+    clave = cache_respuestas.clave(ruta, formato="topojson", sql=sql, **params)
+    payload = await obtener_o_calcular(clave, (etiqueta,), producir)
+    return responder(request, payload)
+
+# Tamaño de página si se manda `cursor` sin `limite`
+LIMITE_PAGINA_DEFECTO = 1000
+
+async def _capa_filtrada(request: Request, db: AsyncSession, ruta: str, nombre_capa: str,
+                         geometria: str, params_geom: dict, fields: str, in_bbox: str,
+                         cursor: int, limite: int, etiqueta: str):
+    """
+    Camino común de fields=, in_bbox, cursor y limite para las rutas de capa completa.
+    Las páginas llevan el cursor siguiente en X-Siguiente-Cursor y no se cachean;
+    el resto se cachea con la etiqueta de la capa.
+    """
+    capa = obtener_capa(nombre_capa)
+    campos, con_geometria = validar_campos(capa, fields)
+    if cursor is not None and limite is None:
+        limite = LIMITE_PAGINA_DEFECTO
+    bbox = _bbox_opcional(in_bbox)
+
+    sql, params = construir_consulta_capa(
+        capa, campos, geometria if con_geometria else None, bbox, cursor, limite
+    )
+    if con_geometria:
+        params.update(params_geom)
+
+    if limite is not None:
+        contenido, siguiente = await consultar_pagina(db, sql, params, capa["clave"], limite)
+        headers = {"X-Siguiente-Cursor": str(siguiente)} if siguiente is not None else None
+        return responder(request, Payload(contenido), headers)
+
+    clave = cache_respuestas.clave(ruta, sql=sql, **params)
+    payload = await obtener_o_calcular(clave, (etiqueta,), lambda: consultar_geojson(db, sql, params))
+    return responder(request, payload)
+
 @router.get("/censo/")
-async def get_censo_bbox(in_bbox: str = Query(None), db: AsyncSession = Depends(get_db)):
+async def get_censo_bbox(
+    request: Request,
+    in_bbox: str = Query(None),
+    formato: str = Query("geojson", alias="format"),
+    zoom: int = Query(None, ge=0, le=22),
+    precision: int = Query(None, ge=0, le=15),
+    db: AsyncSession = Depends(get_db_lectura)
+):
+    """
+    Manzanas del censo dentro del bbox. Con format=geojson-stream|geojsonseq|ndjson
+    la respuesta se envía por trozos leyendo con un cursor del lado del servidor;
+    format=topojson devuelve las fronteras compartidas una sola vez.
+    `zoom` elige la geometría generalizada y `precision` los decimales de salida.
+    """
+    validar_formato(formato, extra=FORMATOS_POLIGONOS)
     if not in_bbox: 
         return {"type": "FeatureCollection", "features": []}
     
     try:
-        bbox = list(map(float, in_bbox.split(',')))
-        query = text("""
+        bbox = _parsear_bbox(in_bbox)
+
+        # Respuesta desde el índice en memoria (sin generalización ni precisión a medida)
+        if indice_manzanas.activo and formato == "geojson" and zoom is None and precision is None:
+            return responder(request, Payload(indice_manzanas.feature_collection_bbox(bbox)))
+
+        sql = f"""
             SELECT cvegeo, pobtot, pobmas, pobfem, vivtot,
-                   ST_AsGeoJSON(wkb_geometry) as geom 
+                   {await expresion_geojson(db, "censo", zoom)} as geom 
             FROM cpyv_2020
             WHERE wkb_geometry && ST_MakeEnvelope(:min_lon, :min_lat, :max_lon, :max_lat, 4326)
-        """)
+        """
         
         params = {
             "min_lon": bbox[0], "min_lat": bbox[1], 
-            "max_lon": bbox[2], "max_lat": bbox[3]
+            "max_lon": bbox[2], "max_lat": bbox[3],
+            "precision": precision_para(zoom, precision)
         }
+
+        if formato in FORMATOS_STREAM:
+            return respuesta_stream(engine1_lectura, sql, params, formato)
+
+        if formato == "topojson":
+            return await _topojson_cacheado(request, db, "/censo/", sql, params, "censo", "censo")
         
-        result = await db.execute(query, params)
-        return rows_to_geojson(result.mappings().all())
+        return responder(request, await _geojson_compartido("/censo/", sql, params))
         
     except Exception as e:
         return {"type": "FeatureCollection", "features": [], "error": str(e)}
 
 @router.get("/centralidades/")
-async def get_poligono_zona(clave_2: str, db: AsyncSession = Depends(get_db)):
-    query = text("""
+async def get_poligono_zona(
+    request: Request,
+    clave_2: str,
+    zoom: int = Query(None, ge=0, le=22),
+    precision: int = Query(None, ge=0, le=15),
+    formato: str = Query("geojson", alias="format"),
+    db: AsyncSession = Depends(get_db_lectura)
+):
+    _validar_formato_poligonos(formato)
+    sql = f"""
         SELECT "NAME" as nombre, "POBTOT" as pobtot, "VIVTOT" as vivtot,
                "POBFEM" as pobfem, "POBMAS" as pobmas,
-               ST_AsGeoJSON(geom) as geom 
+               {await expresion_geojson(db, "centralidades", zoom)} as geom 
         FROM centralidad_barrial02 
         WHERE "CLAVE_2" = :clave
-    """)
-    result = await db.execute(query, {"clave": clave_2})
-    return rows_to_geojson(result.mappings().all())
+    """
+    params = {"clave": clave_2, "precision": precision_para(zoom, precision)}
+    if formato == "topojson":
+        return await _topojson_cacheado(request, db, "/centralidades/", sql, params, "centralidades", "centralidades")
+
+    clave = cache_respuestas.clave("/centralidades/", clave_2=clave_2, zoom=zoom, precision=params["precision"])
+    payload = await obtener_o_calcular(clave, ("centralidades",), lambda: consultar_geojson(db, sql, params))
+    return responder(request, payload)
 
 @router.get("/lista-centralidades/")
-async def get_lista_zonas(db: AsyncSession = Depends(get_db)):
-    query = text('SELECT DISTINCT "CLAVE_2" FROM centralidad_barrial02 WHERE "CLAVE_2" IS NOT NULL ORDER BY "CLAVE_2"')
-    result = await db.execute(query)
-    # Extraemos solo el valor de la columna
-    return [r["CLAVE_2"] for r in result.mappings().all()]
+async def get_lista_zonas(request: Request, db: AsyncSession = Depends(get_db_lectura)):
+    async def consultar():
+        query = text('SELECT DISTINCT "CLAVE_2" FROM centralidad_barrial02 WHERE "CLAVE_2" IS NOT NULL ORDER BY "CLAVE_2"')
+        result = await db.execute(query)
+        # Extraemos solo el valor de la columna
+        return json_a_bytes([r["CLAVE_2"] for r in result.mappings().all()])
+
+    payload = await obtener_o_calcular(
+        cache_respuestas.clave("/lista-centralidades/"), ("centralidades",), consultar
+    )
+    return responder(request, payload)
 
 @router.get("/info-manzana/")
-async def obtener_info_manzana(lat: float, lon: float, db: AsyncSession = Depends(get_db)):
+async def obtener_info_manzana(lat: float, lon: float, db: AsyncSession = Depends(get_db_lectura)):
+    if indice_manzanas.activo:
+        return _formatear_manzana(indice_manzanas.buscar_puntos([(lon, lat)])[0])
+
     query = text("""
         SELECT cvegeo, pobtot, vivtot, pobfem, pobmas 
         FROM cpyv_2020 
         WHERE ST_Contains(wkb_geometry, ST_SetSRID(ST_MakePoint(:lon, :lat), 4326))
     """)
     result = await db.execute(query, {"lat": lat, "lon": lon})
-    resultado = result.mappings().first()
-    
+    return _formatear_manzana(result.mappings().first())
+
+# Tope de puntos por petición en la consulta por lote
+MAX_PUNTOS_LOTE = 10000
+
+@router.post("/info-manzana/batch")
+async def obtener_info_manzanas_lote(
+    puntos: Union[List[PuntoLatLon], MultiPointGeoJSON],
+    db: AsyncSession = Depends(get_db_lectura)
+):
+    """
+    Resuelve muchos puntos en un solo viaje a la base (unnest + LATERAL).
+    Acepta una lista de {lat, lon} o un MultiPoint GeoJSON; responde en el
+    mismo orden de entrada y con los mismos campos que /info-manzana/.
+    """
+    if isinstance(puntos, MultiPointGeoJSON):
+        coordenadas = [(c[0], c[1]) for c in puntos.coordinates]
+    else:
+        coordenadas = [(p.lon, p.lat) for p in puntos]
+
+    if not coordenadas:
+        return []
+    if len(coordenadas) > MAX_PUNTOS_LOTE:
+        raise HTTPException(status_code=413, detail=f"Máximo {MAX_PUNTOS_LOTE} puntos por petición")
+
+    if indice_manzanas.activo:
+        return [_formatear_manzana(r) for r in indice_manzanas.buscar_puntos(coordenadas)]
+
+    query = text("""
+        SELECT m.cvegeo, m.pobtot, m.vivtot, m.pobfem, m.pobmas
+        FROM unnest(CAST(:lons AS double precision[]), CAST(:lats AS double precision[]))
+             WITH ORDINALITY AS p(lon, lat, orden)
+        LEFT JOIN LATERAL (
+            SELECT cvegeo, pobtot, vivtot, pobfem, pobmas
+            FROM cpyv_2020
+            WHERE ST_Contains(wkb_geometry, ST_SetSRID(ST_MakePoint(p.lon, p.lat), 4326))
+            LIMIT 1
+        ) m ON true
+        ORDER BY p.orden
+    """)
+    params = {"lons": [c[0] for c in coordenadas], "lats": [c[1] for c in coordenadas]}
+    result = await db.execute(query, params)
+
+    return [
+        _formatear_manzana(r if r["cvegeo"] is not None else None)
+        for r in result.mappings().all()
+    ]
+
+def _formatear_manzana(resultado):
     if not resultado: 
         return {"mensaje": "Sin datos"}
     
@@ -72,43 +265,186 @@ async def obtener_info_manzana(lat: float, lon: float, db: AsyncSession = Depend
     }
 
 @router.get("/colonias/")
-async def get_colonias(db: AsyncSession = Depends(get_db)):
-    query = text("""
-        SELECT "NOM_ASEN" as nom_asen, "POBTOT" as pobtot, ST_AsGeoJSON(geom) as geom 
+async def get_colonias(
+    request: Request,
+    zoom: int = Query(None, ge=0, le=22),
+    precision: int = Query(None, ge=0, le=15),
+    fields: str = Query(None),
+    in_bbox: str = Query(None),
+    cursor: int = Query(None),
+    limite: int = Query(None, ge=1, le=5000),
+    formato: str = Query("geojson", alias="format"),
+    db: AsyncSession = Depends(get_db_lectura)
+):
+    """
+    Colonias con población. format=topojson codifica las fronteras compartidas
+    una sola vez (capa completa o recortada con `in_bbox`). `fields` elige atributos (incluya "geom" para la
+    geometría), `in_bbox` filtra por área y `cursor`/`limite` paginan por gid
+    (siguiente cursor en X-Siguiente-Cursor). Sin esos parámetros responde la
+    capa completa ordenada por nombre, como siempre.
+    """
+    _validar_formato_poligonos(formato)
+    params = {"precision": precision_para(zoom, precision)}
+
+    if formato == "topojson":
+        if fields or cursor is not None or limite is not None:
+            raise HTTPException(status_code=400, detail="format=topojson solo admite in_bbox, zoom y precision")
+        campos = list(obtener_capa("colonias")["campos"])
+        bbox = _bbox_opcional(in_bbox)
+        sql, params_capa = construir_consulta_capa(
+            obtener_capa("colonias"), campos, await expresion_geojson(db, "colonias", zoom, alias_tabla="t"), bbox
+        )
+        params.update(params_capa)
+        return await _topojson_cacheado(request, db, "/colonias/", sql, params, "colonias", "colonias")
+
+    if fields or in_bbox or cursor is not None or limite is not None:
+        return await _capa_filtrada(
+            request, db, "/colonias/", "colonias",
+            await expresion_geojson(db, "colonias", zoom, alias_tabla="t"), params,
+            fields, in_bbox, cursor, limite, "colonias"
+        )
+
+    sql = f"""
+        SELECT "NOM_ASEN" as nom_asen, "POBTOT" as pobtot,
+               {await expresion_geojson(db, "colonias", zoom)} as geom 
         FROM "COLONIAS_2023_POB2020_UTM" 
         ORDER BY "NOM_ASEN" ASC
-    """)
-    result = await db.execute(query)
-    return rows_to_geojson(result.mappings().all())
+    """
+    clave = cache_respuestas.clave("/colonias/", zoom=zoom, precision=params["precision"])
+    payload = await obtener_o_calcular(clave, ("colonias",), lambda: consultar_geojson(db, sql, params))
+    return responder(request, payload)
+
+# Modos de agregación de /denue/ (celdas en EPSG:3857 ancladas al origen)
+MODOS_AGRUPACION = ("hex", "rejilla")
+
+def _sql_denue_agrupado(modo: str) -> str:
+    """
+    Conteo de establecimientos por celda y por sector (dos primeros dígitos de
+    codigo_act). Las celdas no dependen del bbox, así que coinciden entre
+    peticiones; las del borde solo cuentan lo que cae dentro del bbox.
+    """
+    if modo == "hex":
+        # Hexágono de cada punto: rejilla solo alrededor del punto, no de todo el bbox
+        # (un bbox enorme a zoom medio serían millones de celdas vacías)
+        celdas = """
+            SELECT format('%s:%s', h.i, h.j) AS id, h.geom AS celda, c.sector
+            FROM (
+                SELECT ST_Transform(geom, 3857) AS punto,
+                       COALESCE(left(codigo_act, 2), '00') AS sector
+                FROM denue_tuxtla_cb_2026
+                WHERE geom && ST_MakeEnvelope(:min_lon, :min_lat, :max_lon, :max_lat, 4326)
+            ) AS c
+            CROSS JOIN LATERAL (
+                SELECT g.i, g.j, g.geom
+                FROM ST_HexagonGrid(:tamano, ST_Expand(c.punto, 0.5)) AS g
+                WHERE ST_Intersects(g.geom, c.punto)
+                ORDER BY g.i, g.j
+                LIMIT 1
+            ) AS h
+        """
+    else:
+        celdas = """
+            SELECT format('%s:%s', round(ST_X(c.centro) / :tamano), round(ST_Y(c.centro) / :tamano)) AS id,
+                   ST_Expand(c.centro, :tamano / 2.0) AS celda, c.sector
+            FROM (
+                SELECT ST_SnapToGrid(ST_Transform(geom, 3857), :tamano) AS centro,
+                       COALESCE(left(codigo_act, 2), '00') AS sector
+                FROM denue_tuxtla_cb_2026
+                WHERE geom && ST_MakeEnvelope(:min_lon, :min_lat, :max_lon, :max_lat, 4326)
+            ) AS c
+        """
+
+    return f"""
+        SELECT id, sum(n)::int AS total, jsonb_object_agg(sector, n) AS sectores,
+               ST_AsGeoJSON(ST_Transform(celda, 4326), 6) AS geom
+        FROM (
+            SELECT id, celda, sector, count(*) AS n
+            FROM ({celdas}) AS p
+            GROUP BY id, celda, sector
+        ) AS conteos
+        GROUP BY id, celda
+    """
 
 @router.get("/denue/")
-async def get_denue(in_bbox: str = Query(None), db: AsyncSession = Depends(get_db)):
+async def get_denue(
+    request: Request,
+    in_bbox: str = Query(None),
+    formato: str = Query("geojson", alias="format"),
+    zoom: int = Query(None, ge=0, le=22),
+    agrupar: str = Query(None),
+    db: AsyncSession = Depends(get_db_lectura)
+):
+    """
+    Establecimientos DENUE dentro del bbox. El modo en memoria (format=geojson)
+    se limita a 10000 puntos; los formatos por streaming no tienen tope.
+    Con `zoom` menor a DENUE_ZOOM_PUNTOS se devuelven celdas (`agrupar`=hex|rejilla,
+    por defecto DENUE_AGRUPACION) con `total` y `sectores` {sector: conteo}.
+    """
+    validar_formato(formato)
+    modo = agrupar or settings.DENUE_AGRUPACION
+    if modo not in MODOS_AGRUPACION:
+        raise HTTPException(status_code=400, detail=f"agrupar debe ser uno de: {', '.join(MODOS_AGRUPACION)}")
     if not in_bbox: 
         return {"type": "FeatureCollection", "features": []}
     
     try:
-        bbox = list(map(float, in_bbox.split(',')))
-        query = text("""
-            SELECT id, nom_estab, codigo_act, nombre_act, 
-                   ST_AsGeoJSON(geom) as geom
-            FROM denue_tuxtla_cb_2026 
-            WHERE geom && ST_MakeEnvelope(:min_lon, :min_lat, :max_lon, :max_lat, 4326)
-            LIMIT 10000
-        """)
-        
+        bbox = _parsear_bbox(in_bbox)
         params = {
             "min_lon": bbox[0], "min_lat": bbox[1], 
             "max_lon": bbox[2], "max_lat": bbox[3]
         }
+
+        if zoom is not None and zoom < settings.DENUE_ZOOM_PUNTOS:
+            sql = _sql_denue_agrupado(modo)
+            params["tamano"] = tamano_celda(zoom, settings.DENUE_CELDA_PX)
+        else:
+            limite = "" if formato in FORMATOS_STREAM else "LIMIT 10000"
+            sql = f"""
+                SELECT id, nom_estab, codigo_act, nombre_act, 
+                       ST_AsGeoJSON(geom) as geom
+                FROM denue_tuxtla_cb_2026 
+                WHERE geom && ST_MakeEnvelope(:min_lon, :min_lat, :max_lon, :max_lat, 4326)
+                {limite}
+            """
+
+        if formato in FORMATOS_STREAM:
+            return respuesta_stream(engine1_lectura, sql, params, formato)
         
-        result = await db.execute(query, params)
-        return rows_to_geojson(result.mappings().all())
+        return responder(request, await _geojson_compartido("/denue/", sql, params))
 
     except Exception as e:
         return {"type": "FeatureCollection", "features": [], "error": str(e)}
 
 @router.get("/mis_zonas/")
-async def listar_mis_zonas(db: AsyncSession = Depends(get_db)):
-    query = text("SELECT id, nombre, ST_AsGeoJSON(geom) as geom FROM mis_zonas")
-    result = await db.execute(query)
-    return rows_to_geojson(result.mappings().all())
\ No newline at end of file
+async def listar_mis_zonas(
+    request: Request,
+    since: int = Query(None, ge=0),
+    fields: str = Query(None),
+    in_bbox: str = Query(None),
+    cursor: int = Query(None),
+    limite: int = Query(None, ge=1, le=5000),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Zonas guardadas. Con `since` (0 la primera vez) devuelve solo lo nuevo o
+    modificado desde esa versión, los ids `eliminados` y la `version` para la
+    siguiente llamada. `fields`, `in_bbox` y `cursor`/`limite` (por id)
+    funcionan igual que en /colonias/.
+    """
+    # Primario a propósito: la caché se invalida al escribir y una réplica atrasada
+    # dejaría guardada una versión vieja hasta el TTL
+    if since is not None:
+        return await responder_cambios(request, db, "mis_zonas", since)
+
+    if fields or in_bbox or cursor is not None or limite is not None:
+        return await _capa_filtrada(
+            request, db, "/mis_zonas/", "mis_zonas", 'ST_AsGeoJSON(t."geom")', {},
+            fields, in_bbox, cursor, limite, "mis_zonas"
+        )
+
+    sql = "SELECT id, nombre, ST_AsGeoJSON(geom) as geom FROM mis_zonas"
+    # Se invalida desde POST /zonas/mis_zonas/
+    payload = await obtener_o_calcular(
+        cache_respuestas.clave("/mis_zonas/"), ("mis_zonas",), lambda: consultar_geojson(db, sql)
+    )
+    return responder(request, payload)
\ No newline at end of file
@@ -0,0 +1,12 @@
+from fastapi import APIRouter, Response
+from prometheus_client import generate_latest, CONTENT_TYPE_LATEST
+import services.metricas  # noqa: F401 (registra los colectores)
+
+router = APIRouter(tags=["Métricas"])
+
+@router.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    """
+    Métricas en formato de texto de Prometheus.
+    """
+    return Response(content=generate_latest(), media_type=CONTENT_TYPE_LATEST)
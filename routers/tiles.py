@@ -0,0 +1,70 @@
+from fastapi import APIRouter, HTTPException, Response
+from sqlalchemy import text
+from db.connection import SESIONES_LECTURA
+from services.capas import obtener_capa, columnas_select
+
+router = APIRouter(prefix="/tiles", tags=["Teselas Vectoriales"])
+
+MVT_MEDIA_TYPE = "application/vnd.mapbox-vector-tile"
+MVT_EXTENT = 4096
+MVT_BUFFER = 64
+
+@router.get("/{layer}/{z}/{x}/{y}.pbf")
+async def get_tile(layer: str, z: int, x: int, y: int):
+    """
+    Devuelve una tesela Mapbox Vector Tile (ST_AsMVT) de la capa solicitada.
+    Fuera del rango de zoom de la capa se responde 204 (tesela vacía).
+    La sesión se abre sobre la base de la capa (general o VISOP).
+    """
+    capa = obtener_capa(layer)
+    if not capa:
+        raise HTTPException(status_code=404, detail=f"Capa '{layer}' no disponible")
+
+    if z < 0 or z > 22 or not (0 <= x < 2 ** z) or not (0 <= y < 2 ** z):
+        raise HTTPException(status_code=400, detail="Coordenadas de tesela inválidas")
+
+    if z < capa["zoom_min"] or z > capa["zoom_max"]:
+        return Response(status_code=204)
+
+    geom = capa["geom"]
+    # El filtro && se hace en el SRID original de la tabla para aprovechar el índice GiST;
+    # solo la envolvente de la tesela se reproyecta (con margen igual al buffer del MVT).
+    query = text(f"""
+        WITH limites AS (
+            SELECT ST_TileEnvelope(:z, :x, :y) AS env_3857,
+                   ST_Transform(
+                       ST_TileEnvelope(:z, :x, :y, margin => :margen),
+                       Find_SRID('public', :tabla, :geom_col)
+                   ) AS env_fuente
+        ),
+        mvtgeom AS (
+            SELECT ST_AsMVTGeom(ST_Transform(t."{geom}", 3857), limites.env_3857,
+                                {MVT_EXTENT}, {MVT_BUFFER}, true) AS geom,
+                   {columnas_select(capa)}
+            FROM "{capa['tabla']}" t, limites
+            WHERE t."{geom}" && limites.env_fuente
+        )
+        SELECT ST_AsMVT(mvtgeom.*, :nombre_capa, {MVT_EXTENT}, 'geom') FROM mvtgeom
+    """)
+
+    params = {
+        "z": z, "x": x, "y": y,
+        "margen": MVT_BUFFER / MVT_EXTENT,
+        "tabla": capa["tabla"],
+        "geom_col": geom,
+        "nombre_capa": layer,
+    }
+
+    try:
+        async with SESIONES_LECTURA[capa["bd"]]() as db:
+            result = await db.execute(query, params)
+            tile = result.scalar()
+    except Exception as e:
+        print(f"Error al generar tesela {layer}/{z}/{x}/{y}: {e}")
+        raise HTTPException(status_code=500, detail="Error interno al generar la tesela")
+
+    headers = {"Cache-Control": f"public, max-age={capa['max_age']}"}
+    if not tile:
+        return Response(status_code=204, headers=headers)
+
+    return Response(content=bytes(tile), media_type=MVT_MEDIA_TYPE, headers=headers)
@@ -1,38 +1,39 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Query, Request
 import json
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import text
 from db.connection import get_db_visop  # Conexión a la base VISOP
 from schemas.zonas import ObraNueva
+from services.cache import cache_respuestas, obtener_o_calcular
+from services.geo_utils import json_a_bytes, consultar_geojson
+from services.respuestas import responder
+from services.estadisticas_service import leer_resumen, estadisticas_en_vivo, incrementar_resumen
+from services.carga_masiva import abrir_fuente, importar_features, validar_geometria
+from services.capas import obtener_capa, columnas_select
+from services.sincronizacion import responder_cambios
 
 router = APIRouter(prefix="/visop", tags=["Capas Geográficas"])
 
 @router.get("/estadisticas/obras")
-async def get_estadisticas(db: AsyncSession = Depends(get_db_visop)):
+async def get_estadisticas(request: Request, db: AsyncSession = Depends(get_db_visop)):
     """
-    Obtiene el conteo de obras agrupadas por tipo para los años 2023, 2024 y 2025 de forma asíncrona.
+    Obtiene el conteo de obras agrupadas por tipo para los años 2023, 2024 y 2025.
+    Se lee del primario (no de la réplica) porque la caché se invalida al insertar.
+    Lee el resumen materializado (faismun_estadisticas); si todavía no existe,
+    calcula los tres años en paralelo sobre conexiones separadas del pool.
     """
-    queries = {
-        "anio_2025": 'SELECT tipo_proy AS label, COUNT(*) AS total FROM faismun_2025 GROUP BY tipo_proy ORDER BY total DESC;',
-        "anio_2024": 'SELECT tipo AS label, COUNT(*) AS total FROM faismun_2024_geo GROUP BY tipo ORDER BY total DESC;',
-        "anio_2023": 'SELECT tipo AS label, COUNT(*) AS total FROM faismun_2023_geo GROUP BY tipo ORDER BY total DESC;'
-    }
-    
-    resultados = {}
+    async def consultar():
+        resultados = await leer_resumen(db)
+        if resultados is None:
+            resultados = await estadisticas_en_vivo()
+        return json_a_bytes(resultados)
     
     try:
-        for anio, sql in queries.items():
-            # Ejecución asíncrona de cada consulta
-            result = await db.execute(text(sql))
-            rows = result.mappings().all()
-            
-            # Mapeo de resultados compatible con tu lógica anterior
-            resultados[anio] = [
-                {"label": r["label"] or "Sin Clasificar", "value": r["total"]} 
-                for r in rows
-            ]
-            
-        return resultados
+        # Se invalida desde POST /visop/obras/crear
+        payload = await obtener_o_calcular(
+            cache_respuestas.clave("/visop/estadisticas/obras"), ("faismun",), consultar
+        )
+        return responder(request, payload)
     except Exception as e:
         print(f"Error crítico en estadísticas: {e}")
         return {"anio_2025": [], "anio_2024": [], "anio_2023": []}
@@ -60,13 +61,97 @@ async def crear_obra(obra: ObraNueva, db: AsyncSession = Depends(get_db_visop)):
         # Ejecución y obtención del ID retornado
         result = await db.execute(sql, params)
         nuevo_id = result.scalar()
+
+        # Mantiene el resumen de estadísticas en la misma transacción (tipo aún sin clasificar)
+        await incrementar_resumen(db, 2024)
         
         # IMPORTANTE: En SQLAlchemy Async debemos hacer commit explícito
         await db.commit()
+
+        # Las estadísticas cacheadas ya no reflejan la nueva obra
+        cache_respuestas.invalidar("faismun")
         
         return {"status": "ok", "id": nuevo_id, "mensaje": "Obra registrada correctamente"}
     except Exception as e:
         # En caso de error, hacemos rollback para limpiar la transacción
         await db.rollback()
         print(f"Error al insertar obra: {e}")
-        raise HTTPException(status_code=500, detail="Error interno al guardar la obra")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail="Error interno al guardar la obra")
+
+def _obra_desde_feature(feature: dict):
+    props = feature.get("properties") or {}
+    obra = ObraNueva(
+        colonia=props.get("colonia"),
+        nombre_obra=props.get("nombre_obra"),
+        num_aprobacion=props.get("num_aprobacion"),
+        geometry=feature.get("geometry"),
+    )
+    return obra.nombre_obra, obra.num_aprobacion, obra.colonia, validar_geometria(obra.geometry)
+
+@router.post("/obras/bulk")
+async def crear_obras_bulk(request: Request, db: AsyncSession = Depends(get_db_visop)):
+    """
+    Carga masiva de obras (FeatureCollection o NDJSON) vía COPY a una tabla
+    temporal y fusión en una sola transacción. Reporta errores por feature.
+    """
+    try:
+        fuente = await abrir_fuente(request)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    try:
+        creados, errores = await importar_features(
+            db, fuente,
+            tabla_staging="carga_obras",
+            columnas_staging="nombre text, num text, col text, geom text",
+            convertir=_obra_desde_feature,
+            sql_merge=[
+                "UPDATE carga_obras SET id = nextval(pg_get_serial_sequence('faismun_2024_geo', 'id'))",
+                """
+                INSERT INTO faismun_2024_geo (id, obra_accio, no_aprobac, colonia, geom)
+                SELECT id, nombre, num, col, ST_SetSRID(ST_GeomFromGeoJSON(geom), 4326)
+                FROM carga_obras ORDER BY indice
+                """,
+                "SELECT indice, id FROM carga_obras ORDER BY indice",
+            ],
+        )
+
+        if creados:
+            await incrementar_resumen(db, 2024, cantidad=len(creados))
+        await db.commit()
+    except Exception as e:
+        await db.rollback()
+        print(f"Error en carga masiva de obras: {e}")
+        raise HTTPException(status_code=500, detail="Error interno en la carga masiva de obras")
+
+    if creados:
+        cache_respuestas.invalidar("faismun")
+
+    return {"creados": creados, "errores": errores, "total_creados": len(creados), "total_errores": len(errores)}
+
+@router.get("/obras/{anio}")
+async def get_obras(
+    request: Request,
+    anio: int,
+    since: int = Query(None, ge=0),
+    db: AsyncSession = Depends(get_db_visop)
+):
+    """
+    Obras FAISMUN de un año como FeatureCollection. Con `since` (0 la primera
+    vez) devuelve solo las obras nuevas o modificadas, los ids `eliminados`
+    y la `version` para la siguiente sincronización.
+    """
+    nombre_capa = f"faismun_{anio}"
+    capa = obtener_capa(nombre_capa)
+    if not capa or capa["bd"] != "visop":
+        raise HTTPException(status_code=404, detail=f"No hay obras FAISMUN para {anio}")
+
+    if since is not None:
+        return await responder_cambios(request, db, nombre_capa, since)
+
+    sql = f'SELECT {columnas_select(capa)}, ST_AsGeoJSON(t."{capa["geom"]}") AS geom FROM "{capa["tabla"]}" t'
+    # Se invalida junto con las estadísticas al registrar obras
+    payload = await obtener_o_calcular(
+        cache_respuestas.clave("/visop/obras", anio=anio), ("faismun",), lambda: consultar_geojson(db, sql)
+    )
+    return responder(request, payload)
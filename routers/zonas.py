@@ -1,32 +1,39 @@
 import json
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import text
-from db.connection import get_db  # Usamos la base de datos General (Pool 1)
+from db.connection import get_db, get_db_lectura  # Usamos la base de datos General (Pool 1)
 from schemas.zonas import ZonaCreate
-from services.geo_utils import rows_to_geojson
+from services.geo_utils import consultar_geojson
+from services.cache import cache_respuestas, obtener_o_calcular
+from services.respuestas import responder
+from services.carga_masiva import abrir_fuente, importar_features, validar_geometria
+from services.estadisticas_zonas import calcular_estadisticas, calcular_sin_bloquear, leer_estadisticas
 
 router = APIRouter(prefix="/zonas", tags=["Zonas Personalizadas"])
 
 @router.get("/capa-referencia-centralidades/")
-async def get_capa_referencia(clave: str = None, db: AsyncSession = Depends(get_db)):
+async def get_capa_referencia(request: Request, clave: str = None, db: AsyncSession = Depends(get_db_lectura)):
     """
     Obtiene la geometría de una centralidad barrial de forma asíncrona.
     """
     if not clave:
         return {"type": "FeatureCollection", "features": []}
         
-    # Cambiamos %(c)s por :c y usamos text()
-    query = text("""
+    # PostGIS arma el FeatureCollection (ver services.geo_utils.consultar_geojson)
+    sql = """
         SELECT "CLAVE_2", ST_AsGeoJSON(geom) as geom 
         FROM centralidad_barrial02 
         WHERE "CLAVE_2" = :c
-    """)
+    """
     
     try:
-        result = await db.execute(query, {"c": clave})
-        rows = result.mappings().all()
-        return rows_to_geojson(rows)
+        payload = await obtener_o_calcular(
+            cache_respuestas.clave("/zonas/capa-referencia-centralidades/", clave=clave),
+            ("centralidades",),
+            lambda: consultar_geojson(db, sql, {"c": clave})
+        )
+        return responder(request, payload)
     except Exception as e:
         print(f"Error al obtener capa de referencia: {e}")
         return {"type": "FeatureCollection", "features": [], "error": str(e)}
@@ -54,9 +61,15 @@ async def guardar_zona(zona: ZonaCreate, db: AsyncSession = Depends(get_db)):
         # Ejecutamos la inserción
         result = await db.execute(query, params)
         id_nueva = result.scalar()
+
+        # Estadísticas zonales (censo y DENUE) en la misma transacción
+        await calcular_sin_bloquear(db, [id_nueva])
         
         # IMPORTANTE: Confirmar la transacción en la base de datos General
         await db.commit()
+
+        # Las respuestas cacheadas de /mis_zonas/ ya no son válidas
+        cache_respuestas.invalidar("mis_zonas")
         
         return {
             "mensaje": "Zona guardada exitosamente", 
@@ -69,4 +82,72 @@ async def guardar_zona(zona: ZonaCreate, db: AsyncSession = Depends(get_db)):
         raise HTTPException(
             status_code=500, 
             detail="Error interno al guardar la zona personalizada"
-        )
\ No newline at end of file
+        )
+
+def _zona_desde_feature(feature: dict):
+    props = feature.get("properties") or {}
+    zona = ZonaCreate(nombre=props.get("nombre"), geom=feature.get("geometry"))
+    return zona.nombre, validar_geometria(zona.geom)
+
+@router.post("/mis_zonas/bulk")
+async def guardar_zonas_bulk(request: Request, db: AsyncSession = Depends(get_db)):
+    """
+    Carga masiva de zonas (FeatureCollection o NDJSON) vía COPY a una tabla
+    temporal y fusión en una sola transacción. Reporta errores por feature.
+    """
+    try:
+        fuente = await abrir_fuente(request)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    try:
+        creados, errores = await importar_features(
+            db, fuente,
+            tabla_staging="carga_zonas",
+            columnas_staging="nombre text, geom text",
+            convertir=_zona_desde_feature,
+            sql_merge=[
+                "UPDATE carga_zonas SET id = nextval(pg_get_serial_sequence('mis_zonas', 'id'))",
+                """
+                INSERT INTO mis_zonas (id, nombre, geom)
+                SELECT id, nombre, ST_SetSRID(ST_GeomFromGeoJSON(geom), 4326)
+                FROM carga_zonas ORDER BY indice
+                """,
+                "SELECT indice, id FROM carga_zonas ORDER BY indice",
+            ],
+        )
+        await calcular_sin_bloquear(db, [c["id"] for c in creados])
+        await db.commit()
+    except Exception as e:
+        await db.rollback()
+        print(f"Error en carga masiva de zonas: {e}")
+        raise HTTPException(status_code=500, detail="Error interno en la carga masiva de zonas")
+
+    if creados:
+        cache_respuestas.invalidar("mis_zonas")
+
+    return {"creados": creados, "errores": errores, "total_creados": len(creados), "total_errores": len(errores)}
+
+@router.get("/mis_zonas/{zona_id}/estadisticas")
+async def get_estadisticas_zona(zona_id: int, db: AsyncSession = Depends(get_db)):
+    """
+    Población y viviendas (ponderadas por área de manzana) y establecimientos
+    DENUE por sector dentro de la zona. Se leen de mis_zonas_estadisticas; las
+    zonas anteriores a esa tabla se calculan y guardan en la primera consulta.
+    """
+    try:
+        estadisticas = await leer_estadisticas(db, zona_id)
+        if estadisticas is None:
+            existe = await db.execute(text("SELECT 1 FROM mis_zonas WHERE id = :id"), {"id": zona_id})
+            if existe.scalar() is None:
+                raise HTTPException(status_code=404, detail="Zona no encontrada")
+            await calcular_estadisticas(db, [zona_id])
+            await db.commit()
+            estadisticas = await leer_estadisticas(db, zona_id)
+        return estadisticas
+    except HTTPException:
+        raise
+    except Exception as e:
+        await db.rollback()
+        print(f"Error al obtener estadísticas de la zona {zona_id}: {e}")
+        raise HTTPException(status_code=500, detail="Error interno al calcular las estadísticas de la zona")
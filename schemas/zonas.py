@@ -1,11 +1,23 @@
-from typing import Any, Dict
-from pydantic import BaseModel
+from typing import Annotated, Any, Dict, List, Literal, Optional
+from pydantic import BaseModel, Field
 
 class ZonaCreate(BaseModel):
     nombre: str
     geom: dict
 
 
+class PuntoLatLon(BaseModel):
+    lat: float
+    lon: float
+
+
+class MultiPointGeoJSON(BaseModel):
+    type: Literal["MultiPoint"]
+    # [lon, lat] o [lon, lat, alt] como en GeoJSON; el lote es posicional, así
+    # que una posición incompleta rechaza la petición (422) en vez de omitirse
+    coordinates: List[Annotated[List[float], Field(min_length=2, max_length=3)]]
+
+
 class ObraNueva(BaseModel):
     colonia: str
     nombre_obra: str
@@ -23,4 +35,14 @@ class TokenResponse(BaseModel):
 
 class CommentCreate(BaseModel):
     feature_id: str
-    content: str
\ No newline at end of file
+    content: str
+
+class CommentSummaryRequest(BaseModel):
+    feature_ids: List[str] = Field(..., min_length=1, max_length=1000)
+    ultimos: int = Field(3, ge=0, le=20)
+
+
+class ExportacionCreate(BaseModel):
+    capa: str
+    formato: str = "geojson"  # geojson | ndjson | geojsonseq | fgb
+    in_bbox: Optional[str] = None  # "min_lon,min_lat,max_lon,max_lat" (EPSG:4326)
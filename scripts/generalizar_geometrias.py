@@ -0,0 +1,147 @@
+"""
+Comando de mantenimiento: recalcula las geometrías generalizadas por zoom.
+
+Uso:
+    python -m scripts.generalizar_geometrias            # todas las capas
+    python -m scripts.generalizar_geometrias colonias   # solo algunas
+
+Pasos, pensados para no bloquear las lecturas de /censo/ y /colonias/:
+1. DDL solo si falta algo: ADD COLUMN en una transacción corta propia (con
+   lock_timeout) y los índices GiST con CREATE INDEX CONCURRENTLY.
+2. Las geometrías simplificadas se calculan con un SELECT (solo lectura) en
+   una tabla temporal.
+3. La tabla se actualiza por lotes de LOTE filas (por ctid), cada lote en su
+   propia transacción. Las capas son de referencia: se asume que nadie las
+   edita mientras corre el comando.
+
+Las capas son teselaciones (manzanas, colonias): si la base tiene
+ST_CoverageSimplify (PostGIS 3.4 con GEOS 3.12) las fronteras compartidas se
+simplifican juntas y los vecinos siguen compartiendo vértices. Sin ella se
+simplifica cada polígono por separado, lo que deja huecos y traslapes finos
+entre vecinos en z10/z13 y hace que TopoJSON no pueda compartir esos arcos.
+"""
+import asyncio
+import sys
+from sqlalchemy import text
+from db.connection import engine1
+from services.capas import obtener_capa
+from services.generalizacion import NIVELES, CAPAS_GENERALIZADAS
+
+# Filas por transacción al copiar las geometrías simplificadas
+LOTE = 5000
+
+
+async def _asegurar_columnas(tabla: str):
+    async with engine1.connect() as conn:
+        result = await conn.execute(text("""
+            SELECT column_name FROM information_schema.columns
+            WHERE table_schema = 'public' AND table_name = :tabla
+        """), {"tabla": tabla})
+        existentes = {r[0] for r in result.all()}
+        result = await conn.execute(text(
+            "SELECT indexname FROM pg_indexes WHERE schemaname = 'public' AND tablename = :tabla"
+        ), {"tabla": tabla})
+        indices = {r[0] for r in result.all()}
+
+    faltantes = [c for c, _, _ in NIVELES if c not in existentes]
+    if faltantes:
+        # Sin DEFAULT el ADD COLUMN solo toca el catálogo; el lock_timeout evita
+        # quedar en la cola del ACCESS EXCLUSIVE detrás de una lectura larga
+        async with engine1.begin() as conn:
+            await conn.execute(text("SET LOCAL lock_timeout = '5s'"))
+            await conn.execute(text(
+                f'ALTER TABLE "{tabla}" '
+                + ", ".join(f'ADD COLUMN IF NOT EXISTS "{c}" geometry' for c in faltantes)
+            ))
+
+    async with engine1.connect() as conn:
+        conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+        for columna, _, _ in NIVELES:
+            indice = f"{tabla}_{columna}_idx"
+            if indice not in indices:
+                await conn.execute(text(
+                    f'CREATE INDEX CONCURRENTLY IF NOT EXISTS "{indice}" ON "{tabla}" USING GIST ("{columna}")'
+                ))
+
+
+async def _simplificacion_por_cobertura(conn) -> bool:
+    result = await conn.execute(text("SELECT to_regproc('st_coveragesimplify') IS NOT NULL"))
+    return bool(result.scalar())
+
+
+async def generalizar_capa(nombre_capa: str):
+    capa = obtener_capa(nombre_capa)
+    tabla, geom = capa["tabla"], capa["geom"]
+
+    await _asegurar_columnas(tabla)
+
+    async with engine1.connect() as conn:
+        cobertura = await _simplificacion_por_cobertura(conn)
+        if not cobertura:
+            print(f"Aviso: sin ST_CoverageSimplify; '{nombre_capa}' se simplifica polígono por polígono")
+
+        # Se simplifica en 3857 para que la tolerancia esté en metros sin importar el SRID de origen
+        expresiones, params = [], {}
+        for i, (columna, _, tolerancia) in enumerate(NIVELES):
+            params[f"tol{i}"] = tolerancia
+            if cobertura:
+                simplificada = f'ST_CoverageSimplify(ST_Transform("{geom}", 3857), :tol{i}) OVER ()'
+            else:
+                simplificada = f'ST_SimplifyPreserveTopology(ST_Transform("{geom}", 3857), :tol{i})'
+            expresiones.append(f'ST_Transform(ST_MakeValid({simplificada}), ST_SRID("{geom}")) AS "{columna}"')
+
+        await conn.execute(text("DROP TABLE IF EXISTS generalizacion_tmp"))
+        await conn.execute(text(f"""
+            CREATE TEMP TABLE generalizacion_tmp AS
+            SELECT ctid AS fila, {", ".join(expresiones)}
+            FROM "{tabla}"
+        """), params)
+        await conn.execute(text("CREATE INDEX ON generalizacion_tmp (fila)"))
+        await conn.commit()
+
+        # Los ctid viajan como texto (asyncpg codifica tid como tupla); ctid = ANY(...)
+        # permite un TID scan en lugar de recorrer la tabla en cada lote
+        asignaciones = ", ".join(f'"{c}" = g."{c}"' for c, _, _ in NIVELES)
+        lote_sql = """
+            SELECT fila FROM generalizacion_tmp
+            WHERE fila > CAST(CAST(:desde AS text) AS tid)
+            ORDER BY fila LIMIT :lote
+        """
+        desde, lotes = "(0,0)", 0
+        while True:
+            result = await conn.execute(text(f"""
+                SELECT fila::text FROM ({lote_sql}) AS l ORDER BY fila DESC LIMIT 1
+            """), {"desde": desde, "lote": LOTE})
+            hasta = result.scalar()
+            if hasta is None:
+                break
+            await conn.execute(text(f"""
+                UPDATE "{tabla}" t SET {asignaciones}
+                FROM generalizacion_tmp g
+                WHERE t.ctid = ANY(ARRAY({lote_sql}))
+                  AND g.fila = t.ctid
+            """), {"desde": desde, "lote": LOTE})
+            await conn.commit()
+            desde, lotes = hasta, lotes + 1
+
+        await conn.execute(text("DROP TABLE generalizacion_tmp"))
+        await conn.execute(text(f'ANALYZE "{tabla}"'))
+        await conn.commit()
+
+    print(f"Capa '{nombre_capa}' ({tabla}) generalizada en {lotes} lotes: {', '.join(c for c, _, _ in NIVELES)}")
+
+
+async def main(capas):
+    try:
+        for nombre in capas:
+            await generalizar_capa(nombre)
+    finally:
+        await engine1.dispose()
+
+
+if __name__ == "__main__":
+    solicitadas = sys.argv[1:] or list(CAPAS_GENERALIZADAS)
+    desconocidas = [c for c in solicitadas if c not in CAPAS_GENERALIZADAS]
+    if desconocidas:
+        sys.exit(f"Capas no soportadas: {', '.join(desconocidas)}")
+    asyncio.run(main(solicitadas))
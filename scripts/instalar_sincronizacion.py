@@ -0,0 +1,34 @@
+"""
+Comando de mantenimiento: instala la sincronización incremental (?since=)
+en mis_zonas (base General) y en las tablas de obras FAISMUN (base VISOP):
+columna sync_version, triggers y tabla sync_bajas. Se puede correr varias veces.
+
+Uso:
+    python -m scripts.instalar_sincronizacion
+"""
+import asyncio
+from sqlalchemy import text
+from db.connection import ENGINES
+from services.capas import obtener_capa
+from services.sincronizacion import CAPAS_SINCRONIZABLES, sentencias_instalacion
+
+
+async def main():
+    tablas_por_bd = {}
+    for nombre in CAPAS_SINCRONIZABLES:
+        capa = obtener_capa(nombre)
+        tablas_por_bd.setdefault(capa["bd"], []).append(capa["tabla"])
+
+    try:
+        for bd, tablas in tablas_por_bd.items():
+            async with ENGINES[bd].begin() as conn:
+                for sentencia in sentencias_instalacion(tablas):
+                    await conn.execute(text(sentencia))
+            print(f"Sincronización instalada en la base {bd}: {', '.join(tablas)}")
+    finally:
+        for engine in ENGINES.values():
+            await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
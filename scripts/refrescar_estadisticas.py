@@ -0,0 +1,23 @@
+"""
+Comando de mantenimiento: crea (si hace falta) y recalcula el resumen
+de obras FAISMUN que sirve /visop/estadisticas/obras.
+
+Uso:
+    python -m scripts.refrescar_estadisticas
+"""
+import asyncio
+from db.connection import AsyncSessionLocal2, engine2
+from services.estadisticas_service import refrescar_resumen
+
+
+async def main():
+    try:
+        async with AsyncSessionLocal2() as session:
+            await refrescar_resumen(session)
+        print("Resumen faismun_estadisticas actualizado")
+    finally:
+        await engine2.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
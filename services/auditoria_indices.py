@@ -0,0 +1,70 @@
+"""
+Auditoría de índices: revisa que las tablas consultadas por los routers
+tengan el índice espacial (GiST) de su geometría y los índices de búsqueda
+por clave. Corre al arrancar (imprime lo que falta) y desde
+GET /admin/indices.
+"""
+from sqlalchemy import text
+from db.connection import ENGINES
+from services.capas import CAPAS
+
+# Índices de búsqueda usados por los routers: (bd, tabla, columna)
+BUSQUEDAS = [
+    ("general", "centralidad_barrial02", "CLAVE_2"),     # /centralidades/, capa-referencia
+    ("visop", "comments", "feature_id"),                  # /comentarios/
+    ("visop", "users", "username"),                       # /login
+]
+
+
+def indices_esperados():
+    """
+    (bd, tabla, columna, método): GiST para la geometría de cada capa del
+    catálogo y btree (como primera columna) para las búsquedas por clave.
+    """
+    esperados = [(c["bd"], c["tabla"], c["geom"], "gist") for c in CAPAS.values()]
+    esperados += [(bd, tabla, columna, "btree") for bd, tabla, columna in BUSQUEDAS]
+    return esperados
+
+
+async def auditar_indices():
+    """
+    Devuelve una entrada por índice esperado con estado "ok", "falta" o
+    "sin_tabla"; las que faltan traen el CREATE INDEX sugerido.
+    """
+    reporte = []
+    por_bd = {}
+    for bd, tabla, columna, metodo in indices_esperados():
+        por_bd.setdefault(bd, []).append((tabla, columna, metodo))
+
+    for bd, esperados in por_bd.items():
+        async with ENGINES[bd].connect() as conn:
+            for tabla, columna, metodo in esperados:
+                result = await conn.execute(text("""
+                    SELECT to_regclass(quote_ident(:tabla)) IS NOT NULL AS existe,
+                           EXISTS (
+                               SELECT 1
+                               FROM pg_index i
+                               JOIN pg_class ic ON ic.oid = i.indexrelid
+                               JOIN pg_am am ON am.oid = ic.relam
+                               JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = i.indkey[0]
+                               WHERE i.indrelid = to_regclass(quote_ident(:tabla))
+                                 AND a.attname = :columna
+                                 AND am.amname = :metodo
+                                 AND i.indisvalid
+                           ) AS indexada
+                """), {"tabla": tabla, "columna": columna, "metodo": metodo})
+                fila = result.mappings().first()
+
+                entrada = {"bd": bd, "tabla": tabla, "columna": columna, "metodo": metodo}
+                if not fila["existe"]:
+                    entrada["estado"] = "sin_tabla"
+                elif fila["indexada"]:
+                    entrada["estado"] = "ok"
+                else:
+                    entrada["estado"] = "falta"
+                    entrada["sugerencia"] = (
+                        f'CREATE INDEX CONCURRENTLY ON "{tabla}" USING {metodo.upper()} ("{columna}");'
+                    )
+                reporte.append(entrada)
+
+    return reporte
@@ -1,6 +1,10 @@
-from models.user_model import get_user_by_username
-from core.security import verify_password, create_access_token
-from fastapi import HTTPException
+import jwt
+from models.user_model import get_user_by_username, update_user_password
+from core.security import (
+    verify_and_update_password, create_access_token, decode_access_token, PoolHashSaturado
+)
+from fastapi import Depends, HTTPException
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 from sqlalchemy.ext.asyncio import AsyncSession
 
 async def authenticate_user(db: AsyncSession, username: str, password: str):
@@ -10,10 +14,27 @@ async def authenticate_user(db: AsyncSession, username: str, password: str):
     if not user:
         raise HTTPException(status_code=401, detail="Credenciales inválidas")
 
-    # Si usabas RealDictCursor, SQLAlchemy devuelve objetos similares a diccionarios (mappings)
-    if not verify_password(password, user["password"]):
+    # bcrypt corre en el pool acotado (core.security.pool_hash), no en el event loop
+    try:
+        valido, nuevo_hash = await verify_and_update_password(password, user["password"])
+    except PoolHashSaturado:
+        raise HTTPException(
+            status_code=503,
+            detail="Servidor ocupado, intente de nuevo en unos segundos",
+            headers={"Retry-After": "1"}
+        )
+
+    if not valido:
         raise HTTPException(status_code=401, detail="Credenciales inválidas")
 
+    # El costo de bcrypt cambió: se guarda el hash nuevo de forma transparente
+    if nuevo_hash:
+        try:
+            await update_user_password(db, user["id"], nuevo_hash)
+        except Exception as e:
+            await db.rollback()
+            print(f"Error al actualizar hash del usuario {user['id']}: {e}")
+
     token = create_access_token({
         "sub": str(user["id"]),
         "role": user["role"]
@@ -22,4 +43,20 @@ async def authenticate_user(db: AsyncSession, username: str, password: str):
     return {
         "access_token": token,
         "token_type": "bearer"
-    }
\ No newline at end of file
+    }
+
+bearer_scheme = HTTPBearer()
+
+async def require_admin(credentials: HTTPAuthorizationCredentials = Depends(bearer_scheme)):
+    """
+    Dependencia para los endpoints de administración: exige un token válido con rol admin.
+    """
+    try:
+        payload = decode_access_token(credentials.credentials)
+    except jwt.PyJWTError:
+        raise HTTPException(status_code=401, detail="Token inválido o expirado")
+
+    if payload.get("role") != "admin":
+        raise HTTPException(status_code=403, detail="Se requiere rol de administrador")
+
+    return payload
\ No newline at end of file
@@ -0,0 +1,140 @@
+"""
+Caché en proceso de respuestas ya serializadas (Payload) para capas de referencia.
+
+- Límite por número de entradas y por bytes totales (LRU) y expiración por TTL.
+- Cada entrada lleva etiquetas (p. ej. "mis_zonas", "faismun") para que los
+  endpoints de escritura invaliden solo lo afectado.
+- Cada etiqueta tiene un número de generación que sube al invalidarla; un
+  resultado calculado antes de una invalidación no se guarda.
+"""
+import json
+import time
+from collections import OrderedDict
+from core.config import settings
+from services.respuestas import Payload
+
+
+class CacheRespuestas:
+    def __init__(self, max_entradas: int, max_bytes: int, ttl: float):
+        self.max_entradas = max_entradas
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entradas = OrderedDict()  # clave -> (expira, contenido, etiquetas)
+        self._bytes = 0
+        self._generaciones = {}  # etiqueta -> invalidaciones recibidas
+        self._limpiezas = 0
+        self.hits = 0
+        self.misses = 0
+        self.expulsiones = 0
+        self.invalidaciones = 0
+        self.descartados = 0
+
+    @staticmethod
+    def clave(ruta: str, **params) -> str:
+        """
+        Clave estable: ruta + parámetros ordenados (se ignoran los None).
+        """
+        filtrados = {k: v for k, v in params.items() if v is not None}
+        return ruta + "?" + json.dumps(filtrados, sort_keys=True, default=str)
+
+    def obtener(self, clave: str):
+        entrada = self._entradas.get(clave)
+        if entrada is None:
+            self.misses += 1
+            return None
+
+        expira, contenido, _ = entrada
+        if expira < time.monotonic():
+            self._eliminar(clave)
+            self.misses += 1
+            return None
+
+        self._entradas.move_to_end(clave)
+        self.hits += 1
+        return contenido
+
+    def guardar(self, clave: str, contenido, etiquetas=()):
+        tamano = len(contenido)
+        if tamano > self.max_bytes:
+            return
+
+        if clave in self._entradas:
+            self._eliminar(clave)
+
+        self._entradas[clave] = (time.monotonic() + self.ttl, contenido, frozenset(etiquetas))
+        self._bytes += tamano
+
+        while len(self._entradas) > self.max_entradas or self._bytes > self.max_bytes:
+            antigua = next(iter(self._entradas))
+            self._eliminar(antigua)
+            self.expulsiones += 1
+
+    def generacion(self, etiquetas) -> tuple:
+        """
+        Marca a tomar antes de calcular una entrada; si cambia antes de
+        guardarla, alguna de sus etiquetas se invalidó mientras tanto.
+        """
+        return (self._limpiezas,) + tuple(self._generaciones.get(e, 0) for e in sorted(etiquetas))
+
+    def invalidar(self, *etiquetas):
+        """
+        Elimina todas las entradas que tengan alguna de las etiquetas.
+        """
+        objetivo = set(etiquetas)
+        for etiqueta in objetivo:
+            self._generaciones[etiqueta] = self._generaciones.get(etiqueta, 0) + 1
+        afectadas = [c for c, (_, _, tags) in self._entradas.items() if tags & objetivo]
+        for clave in afectadas:
+            self._eliminar(clave)
+        self.invalidaciones += len(afectadas)
+        return len(afectadas)
+
+    def limpiar(self):
+        self._limpiezas += 1
+        self._entradas.clear()
+        self._bytes = 0
+
+    def _eliminar(self, clave: str):
+        _, contenido, _ = self._entradas.pop(clave)
+        self._bytes -= len(contenido)
+
+    def estadisticas(self):
+        consultas = self.hits + self.misses
+        return {
+            "entradas": len(self._entradas),
+            "bytes": self._bytes,
+            "max_entradas": self.max_entradas,
+            "max_bytes": self.max_bytes,
+            "ttl_segundos": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / consultas, 4) if consultas else None,
+            "expulsiones": self.expulsiones,
+            "invalidaciones": self.invalidaciones,
+            "descartados": self.descartados,
+        }
+
+
+cache_respuestas = CacheRespuestas(
+    max_entradas=settings.CACHE_MAX_ENTRADAS,
+    max_bytes=settings.CACHE_MAX_BYTES,
+    ttl=settings.CACHE_TTL_SEGUNDOS,
+)
+
+
+async def obtener_o_calcular(clave: str, etiquetas, productor) -> Payload:
+    """
+    Devuelve el Payload cacheado o ejecuta `productor()` (corrutina que
+    devuelve bytes), lo precomprime y lo guarda. Si el productor falla, no se cachea.
+    Tampoco si una escritura invalidó alguna de las etiquetas durante el cálculo:
+    el resultado se leyó antes de esa escritura.
+    """
+    payload = cache_respuestas.obtener(clave)
+    if payload is None:
+        generacion = cache_respuestas.generacion(etiquetas)
+        payload = Payload(await productor()).precomprimir()
+        if cache_respuestas.generacion(etiquetas) == generacion:
+            cache_respuestas.guardar(clave, payload, etiquetas)
+        else:
+            cache_respuestas.descartados += 1
+    return payload
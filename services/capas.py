@@ -0,0 +1,149 @@
+"""
+Catálogo de capas geográficas publicadas por la API.
+
+Cada entrada describe de dónde sale la capa (base, tabla y columna de
+geometría) y qué atributos se pueden exponer. `bd` es "general" (engine1)
+o "visop" (engine2). Los nombres de las tablas y columnas
+provienen solo de este catálogo, nunca del cliente, por lo que es seguro
+interpolarlos en el SQL.
+"""
+
+CAPAS = {
+    "censo": {
+        "bd": "general",
+        "tabla": "cpyv_2020",
+        "geom": "wkb_geometry",
+        # alias expuesto -> expresión SQL
+        "campos": {
+            "cvegeo": "cvegeo",
+            "pobtot": "pobtot",
+            "pobmas": "pobmas",
+            "pobfem": "pobfem",
+            "vivtot": "vivtot",
+        },
+        "zoom_min": 13,
+        "zoom_max": 22,
+        "max_age": 86400,
+    },
+    "denue": {
+        "bd": "general",
+        "tabla": "denue_tuxtla_cb_2026",
+        "geom": "geom",
+        "campos": {
+            "id": "id",
+            "nom_estab": "nom_estab",
+            "codigo_act": "codigo_act",
+            "nombre_act": "nombre_act",
+        },
+        "zoom_min": 14,
+        "zoom_max": 22,
+        "max_age": 86400,
+    },
+    "colonias": {
+        "bd": "general",
+        "tabla": "COLONIAS_2023_POB2020_UTM",
+        "geom": "geom",
+        # Columna única y ordenable para la paginación keyset
+        "clave": "gid",
+        "campos": {
+            "nom_asen": '"NOM_ASEN"',
+            "pobtot": '"POBTOT"',
+        },
+        "zoom_min": 10,
+        "zoom_max": 22,
+        "max_age": 86400,
+    },
+    "centralidades": {
+        "bd": "general",
+        "tabla": "centralidad_barrial02",
+        "geom": "geom",
+        "campos": {
+            "clave_2": '"CLAVE_2"',
+            "nombre": '"NAME"',
+            "pobtot": '"POBTOT"',
+            "vivtot": '"VIVTOT"',
+            "pobfem": '"POBFEM"',
+            "pobmas": '"POBMAS"',
+        },
+        "zoom_min": 8,
+        "zoom_max": 22,
+        "max_age": 86400,
+    },
+    "mis_zonas": {
+        "bd": "general",
+        "tabla": "mis_zonas",
+        "geom": "geom",
+        "clave": "id",
+        "campos": {
+            "id": "id",
+            "nombre": "nombre",
+        },
+        "zoom_min": 8,
+        "zoom_max": 22,
+        # Las zonas cambian desde POST /zonas/mis_zonas/, se cachean poco tiempo
+        "max_age": 60,
+    },
+    "faismun_2023": {
+        "bd": "visop",
+        "tabla": "faismun_2023_geo",
+        "geom": "geom",
+        "campos": {
+            "id": "id",
+            "tipo": "tipo",
+            "obra_accio": "obra_accio",
+            "no_aprobac": "no_aprobac",
+            "colonia": "colonia",
+        },
+        "zoom_min": 10,
+        "zoom_max": 22,
+        "max_age": 86400,
+    },
+    "faismun_2024": {
+        "bd": "visop",
+        "tabla": "faismun_2024_geo",
+        "geom": "geom",
+        "campos": {
+            "id": "id",
+            "tipo": "tipo",
+            "obra_accio": "obra_accio",
+            "no_aprobac": "no_aprobac",
+            "colonia": "colonia",
+        },
+        "zoom_min": 10,
+        "zoom_max": 22,
+        # Recibe altas desde /visop/obras/crear y /visop/obras/bulk
+        "max_age": 300,
+    },
+    "faismun_2025": {
+        "bd": "visop",
+        "tabla": "faismun_2025",
+        "geom": "geom",
+        "campos": {
+            "id": "id",
+            "tipo": "tipo_proy",
+            "obra_accio": "obra_accio",
+            "no_aprobac": "no_aprobac",
+            "colonia": "colonia",
+        },
+        "zoom_min": 10,
+        "zoom_max": 22,
+        "max_age": 86400,
+    },
+}
+
+
+def obtener_capa(nombre: str):
+    """
+    Devuelve la configuración de una capa o None si no está publicada.
+    """
+    return CAPAS.get(nombre)
+
+
+def columnas_select(capa: dict, alias_tabla: str = "t"):
+    """
+    Arma la lista de columnas del SELECT a partir de la lista blanca de la capa.
+    """
+    return ", ".join(
+        f"{alias_tabla}.{expresion} AS {alias}"
+        for alias, expresion in capa["campos"].items()
+    )
@@ -0,0 +1,178 @@
+"""
+Carga masiva de features (FeatureCollection o NDJSON) mediante COPY.
+
+Los features se validan uno por uno a medida que se leen del cuerpo de la
+petición y los válidos se envían por COPY (asyncpg) a una tabla temporal;
+después se fusionan con la tabla destino en la misma transacción.
+Los inválidos se reportan con su índice y no detienen la carga.
+
+Solo el NDJSON se lee en streaming: un FeatureCollection se junta completo
+en memoria antes de decodificarlo, con tope CARGA_MAX_BYTES_COLECCION (413).
+"""
+import json
+from fastapi import HTTPException
+from pydantic import ValidationError
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+from core.config import settings
+
+MEDIA_NDJSON = ("application/x-ndjson", "application/ndjson", "application/geo+seq", "application/jsonl")
+
+# tipo de geometría -> profundidad de anidamiento de "coordinates"
+PROFUNDIDAD_GEOMETRIA = {
+    "Point": 1, "MultiPoint": 2, "LineString": 2,
+    "MultiLineString": 3, "Polygon": 3, "MultiPolygon": 4,
+}
+
+
+def validar_geometria(geom) -> str:
+    """
+    Revisa la estructura de una geometría GeoJSON para que ST_GeomFromGeoJSON
+    no falle dentro de la transacción. Devuelve la geometría serializada.
+    """
+    if not isinstance(geom, dict):
+        raise ValueError("Feature sin geometría")
+
+    tipo = geom.get("type")
+    if tipo not in PROFUNDIDAD_GEOMETRIA:
+        raise ValueError(f"Tipo de geometría no soportado: {tipo}")
+
+    def revisar(coords, profundidad):
+        if not isinstance(coords, list) or not coords:
+            raise ValueError("Coordenadas vacías o mal formadas")
+        if profundidad == 1:
+            # bool es subclase de int: true/false pasaría y haría fallar todo el COPY
+            if len(coords) < 2 or not all(
+                isinstance(c, (int, float)) and not isinstance(c, bool) for c in coords
+            ):
+                raise ValueError("Posición inválida")
+            return
+        for c in coords:
+            revisar(c, profundidad - 1)
+
+    revisar(geom.get("coordinates"), PROFUNDIDAD_GEOMETRIA[tipo])
+
+    anillos = []
+    if tipo == "Polygon":
+        anillos = geom["coordinates"]
+    elif tipo == "MultiPolygon":
+        anillos = [a for poligono in geom["coordinates"] for a in poligono]
+    for anillo in anillos:
+        if len(anillo) < 4 or anillo[0] != anillo[-1]:
+            raise ValueError("Anillo de polígono sin cerrar o con menos de 4 posiciones")
+
+    return json.dumps(geom)
+
+
+async def _lineas_ndjson(request):
+    buffer = b""
+    async for trozo in request.stream():
+        buffer += trozo
+        *lineas, buffer = buffer.split(b"\n")
+        for linea in lineas:
+            yield linea
+    yield buffer
+
+
+async def _cuerpo_acotado(request, maximo: int) -> bytes:
+    demasiado_grande = HTTPException(
+        status_code=413,
+        detail=f"El FeatureCollection excede {maximo} bytes; envíe NDJSON para cargas mayores",
+    )
+    largo = request.headers.get("content-length")
+    if largo and largo.isdigit() and int(largo) > maximo:
+        raise demasiado_grande
+
+    # Content-Length puede faltar (chunked) o mentir: se cuenta al leer
+    trozos, total = [], 0
+    async for trozo in request.stream():
+        total += len(trozo)
+        if total > maximo:
+            raise demasiado_grande
+        trozos.append(trozo)
+    return b"".join(trozos)
+
+
+async def abrir_fuente(request):
+    """
+    Devuelve un iterador asíncrono de (indice, feature crudo).
+    El FeatureCollection se lee completo (hasta CARGA_MAX_BYTES_COLECCION) y
+    se decodifica aquí para rechazar con 400 un cuerpo inválido antes de
+    tocar la base; el NDJSON se lee por trozos.
+    """
+    tipo = request.headers.get("content-type", "").split(";")[0].strip().lower()
+
+    if tipo in MEDIA_NDJSON:
+        async def ndjson():
+            indice = 0
+            async for linea in _lineas_ndjson(request):
+                linea = linea.strip().lstrip(b"\x1e")
+                if linea:
+                    yield indice, linea
+                    indice += 1
+        return ndjson()
+
+    try:
+        documento = json.loads(await _cuerpo_acotado(request, settings.CARGA_MAX_BYTES_COLECCION))
+    except ValueError:
+        raise ValueError("El cuerpo no es JSON válido")
+
+    if isinstance(documento, dict) and documento.get("type") == "FeatureCollection":
+        features = documento.get("features") or []
+    elif isinstance(documento, dict) and documento.get("type") == "Feature":
+        features = [documento]
+    else:
+        raise ValueError("Se esperaba un FeatureCollection o NDJSON de Features")
+
+    async def coleccion():
+        for indice, feature in enumerate(features):
+            yield indice, feature
+    return coleccion()
+
+
+async def importar_features(
+    db: AsyncSession,
+    fuente,
+    tabla_staging: str,
+    columnas_staging: str,
+    convertir,
+    sql_merge: list,
+):
+    """
+    Copia los features válidos a `tabla_staging` (temporal, ON COMMIT DROP) y
+    ejecuta las sentencias `sql_merge`; la última debe devolver (indice, id).
+    `convertir(feature)` devuelve la tupla de columnas o lanza ValueError/ValidationError.
+    No hace commit: el llamador confirma o revierte.
+    """
+    errores = []
+
+    async def registros():
+        async for indice, crudo in fuente:
+            if indice >= settings.CARGA_MAX_FEATURES:
+                # Un solo error y se deja de leer el cuerpo
+                errores.append({"indice": indice, "error": f"Se excede el máximo de {settings.CARGA_MAX_FEATURES} features"})
+                return
+            try:
+                feature = json.loads(crudo) if isinstance(crudo, (bytes, str)) else crudo
+                if not isinstance(feature, dict):
+                    raise ValueError("Se esperaba un Feature")
+                yield (indice, *convertir(feature))
+            except (ValueError, ValidationError, TypeError) as e:
+                errores.append({"indice": indice, "error": str(e)})
+
+    await db.execute(text(
+        f"CREATE TEMP TABLE {tabla_staging} (indice integer PRIMARY KEY, id bigint, {columnas_staging}) ON COMMIT DROP"
+    ))
+
+    # COPY directo con asyncpg sobre la misma conexión (y transacción) de la sesión
+    conexion = await db.connection()
+    raw = await conexion.get_raw_connection()
+    columnas = ["indice"] + [c.strip().split()[0] for c in columnas_staging.split(",")]
+    await raw.driver_connection.copy_records_to_table(tabla_staging, records=registros(), columns=columnas)
+
+    result = None
+    for sql in sql_merge:
+        result = await db.execute(text(sql))
+    creados = [{"indice": r["indice"], "id": r["id"]} for r in result.mappings().all()]
+
+    return creados, sorted(errores, key=lambda e: e["indice"])
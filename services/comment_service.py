@@ -1,4 +1,7 @@
-from models.comment_model import create_comment, get_comments_by_feature
+import base64
+import json
+from datetime import datetime
+from models.comment_model import create_comment, get_comments_by_feature, get_comments_summary
 from fastapi import HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
 
@@ -14,6 +17,32 @@ async def add_comment(db: AsyncSession, feature_id: str, content: str):
         "comment_id": comment_id
     }
 
-async def list_comments(db: AsyncSession, feature_id: str):
-    # Retornamos los comentarios de forma asíncrona
-    return await get_comments_by_feature(db, feature_id)
\ No newline at end of file
+def _codificar_cursor(comentario) -> str:
+    crudo = json.dumps([comentario["created_at"].isoformat(), comentario["id"]])
+    return base64.urlsafe_b64encode(crudo.encode()).decode()
+
+def _decodificar_cursor(cursor: str):
+    try:
+        fecha, comment_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.fromisoformat(fecha), comment_id
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+
+async def list_comments(db: AsyncSession, feature_id: str, limite: int, cursor: str = None):
+    """
+    Devuelve (comentarios, siguiente_cursor). siguiente_cursor es None en la última página.
+    """
+    despues_de = _decodificar_cursor(cursor) if cursor else None
+
+    # Se pide uno de más para saber si hay otra página
+    filas = await get_comments_by_feature(db, feature_id, limite + 1, despues_de)
+    comentarios = filas[:limite]
+    siguiente = _codificar_cursor(comentarios[-1]) if len(filas) > limite else None
+    return comentarios, siguiente
+
+async def summarize_comments(db: AsyncSession, feature_ids: list, ultimos: int):
+    filas = await get_comments_summary(db, feature_ids, ultimos)
+    return {
+        f["feature_id"]: {"total": f["total"], "ultimos": json.loads(f["ultimos"])}
+        for f in filas
+    }
@@ -0,0 +1,139 @@
+"""
+Registro de consultas lentas con captura de EXPLAIN (ANALYZE, BUFFERS).
+
+Toda sentencia que tarde más de CONSULTA_LENTA_MS se imprime con su duración
+y parámetros y se guarda en un buffer circular (GET /admin/consultas-lentas).
+Para una fracción CONSULTA_LENTA_MUESTRA_EXPLAIN de las lentas que sean
+SELECT, se vuelve a ejecutar la sentencia con EXPLAIN (ANALYZE, BUFFERS) en
+otra conexión y dentro de una transacción que se revierte, para ver si los
+filtros &&/ST_Contains usan los índices GiST. Solo corre un EXPLAIN a la vez.
+"""
+import asyncio
+import random
+import re
+import time
+from collections import deque
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+from core.config import settings
+
+MAX_REGISTROS = 100
+MAX_LARGO_PARAMETRO = 200
+
+_registros = deque(maxlen=MAX_REGISTROS)
+_engines = {}
+_explicando = False
+# Referencias a las tareas de EXPLAIN en curso (evita que el GC las cancele)
+_tareas = set()
+
+# Lo que EXPLAIN ANALYZE ejecutaría con efectos que el rollback no deshace del
+# todo (secuencias, bloqueos): CTE de escritura, SELECT ... FOR UPDATE/SHARE, nextval
+_ESCRITURA = re.compile(
+    r"\b(INSERT|UPDATE|DELETE|MERGE|NEXTVAL|SETVAL)\b|\bFOR\s+(NO\s+KEY\s+UPDATE|KEY\s+SHARE|SHARE)\b",
+    re.IGNORECASE,
+)
+
+
+def _es_select(statement: str) -> bool:
+    inicio = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else ""
+    if inicio not in ("SELECT", "WITH"):
+        return False
+    return _ESCRITURA.search(statement) is None
+
+
+def _parametros_visibles(statement: str, parameters):
+    # Las sentencias de users llevan hashes de contraseña
+    if "users" in statement:
+        return "[ocultos]"
+    if parameters is None:
+        return None
+    valores = parameters if isinstance(parameters, (list, tuple)) else [parameters]
+    return [
+        (repr(v)[:MAX_LARGO_PARAMETRO] + "…") if len(repr(v)) > MAX_LARGO_PARAMETRO else v
+        for v in valores
+    ]
+
+
+async def _explicar(nombre: str, engine: AsyncEngine, statement: str, parameters, registro: dict):
+    global _explicando
+    try:
+        async with engine.connect() as conn:
+            trans = await conn.begin()
+            try:
+                result = await conn.exec_driver_sql(
+                    "EXPLAIN (ANALYZE, BUFFERS) " + statement, tuple(parameters or ())
+                )
+                registro["explain"] = "\n".join(r[0] for r in result.all())
+            finally:
+                await trans.rollback()
+        print(f"[consulta lenta] EXPLAIN ({nombre}):\n{registro['explain']}")
+    except Exception as e:
+        registro["explain"] = f"No se pudo obtener el plan: {e}"
+    finally:
+        _explicando = False
+
+
+def registrar_consultas_lentas(engine: AsyncEngine, nombre: str):
+    """
+    Agrega los eventos de medición al engine (una vez por engine).
+    Con CONSULTA_LENTA_MS <= 0 no hace nada.
+    """
+    if settings.CONSULTA_LENTA_MS <= 0 or nombre in _engines:
+        return
+    _engines[nombre] = engine
+    sync_engine = engine.sync_engine
+    umbral = settings.CONSULTA_LENTA_MS / 1000
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _antes(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("ovie_lenta_inicio", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _despues(conn, cursor, statement, parameters, context, executemany):
+        global _explicando
+        pila = conn.info.get("ovie_lenta_inicio")
+        if not pila:
+            return
+        duracion = time.perf_counter() - pila.pop()
+        if duracion < umbral or statement.lstrip().upper().startswith("EXPLAIN"):
+            return
+
+        registro = {
+            "engine": nombre,
+            "momento": time.time(),
+            "duracion_ms": round(duracion * 1000, 1),
+            "sentencia": " ".join(statement.split()),
+            "parametros": _parametros_visibles(statement, parameters),
+            "explain": None,
+        }
+        _registros.append(registro)
+        print(f"[consulta lenta] {nombre} {registro['duracion_ms']} ms: "
+              f"{registro['sentencia'][:1000]} | params={registro['parametros']}")
+
+        if (not executemany and not _explicando and _es_select(statement)
+                and random.random() < settings.CONSULTA_LENTA_MUESTRA_EXPLAIN):
+            try:
+                loop = asyncio.get_running_loop()
+            except RuntimeError:
+                return
+            _explicando = True
+            tarea = loop.create_task(_explicar(nombre, engine, statement, parameters, registro))
+            _tareas.add(tarea)
+            tarea.add_done_callback(_tareas.discard)
+
+    @event.listens_for(sync_engine, "handle_error")
+    def _error(contexto):
+        pila = contexto.connection.info.get("ovie_lenta_inicio") if contexto.connection is not None else None
+        if pila:
+            pila.pop()
+
+
+def consultas_lentas_recientes():
+    """
+    Últimas MAX_REGISTROS consultas lentas, de la más reciente a la más antigua.
+    """
+    return {
+        "umbral_ms": settings.CONSULTA_LENTA_MS,
+        "muestra_explain": settings.CONSULTA_LENTA_MUESTRA_EXPLAIN,
+        "consultas": list(reversed(_registros)),
+    }
@@ -0,0 +1,115 @@
+"""
+Resumen materializado de obras FAISMUN por año y tipo (base VISOP).
+
+La tabla faismun_estadisticas se llena con refrescar_resumen() y se mantiene
+al día de forma incremental desde los endpoints que insertan obras.
+Mientras no exista, las estadísticas se calculan en vivo con las tres
+consultas en paralelo, cada una en su propia conexión del pool.
+"""
+import asyncio
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+from db.connection import AsyncSessionLocal2
+
+# anio -> (tabla, columna de clasificación)
+FUENTES = {
+    2025: ("faismun_2025", "tipo_proy"),
+    2024: ("faismun_2024_geo", "tipo"),
+    2023: ("faismun_2023_geo", "tipo"),
+}
+
+SIN_CLASIFICAR = "Sin Clasificar"
+
+
+async def asegurar_resumen(db: AsyncSession):
+    await db.execute(text("""
+        CREATE TABLE IF NOT EXISTS faismun_estadisticas (
+            anio  integer NOT NULL,
+            label text    NOT NULL,
+            total integer NOT NULL DEFAULT 0,
+            PRIMARY KEY (anio, label)
+        )
+    """))
+
+
+async def resumen_disponible(db: AsyncSession) -> bool:
+    result = await db.execute(text("SELECT to_regclass('faismun_estadisticas') IS NOT NULL"))
+    return bool(result.scalar())
+
+
+async def refrescar_resumen(db: AsyncSession):
+    """
+    Recalcula el resumen completo en una sola transacción.
+    El LOCK espera a los inserts en curso para no perder incrementos.
+    """
+    await asegurar_resumen(db)
+    await db.execute(text("LOCK TABLE faismun_estadisticas IN SHARE ROW EXCLUSIVE MODE"))
+    await db.execute(text("DELETE FROM faismun_estadisticas"))
+    for anio, (tabla, columna) in FUENTES.items():
+        await db.execute(text(f"""
+            INSERT INTO faismun_estadisticas (anio, label, total)
+            SELECT :anio, COALESCE({columna}, :sin_clasificar), COUNT(*)
+            FROM {tabla}
+            GROUP BY 2
+        """), {"anio": anio, "sin_clasificar": SIN_CLASIFICAR})
+    await db.commit()
+
+
+async def incrementar_resumen(db: AsyncSession, anio: int, label: str = None, cantidad: int = 1):
+    """
+    Suma `cantidad` obras al resumen dentro de la transacción del llamador
+    (no hace commit). Si el resumen aún no se ha creado, no hace nada.
+    """
+    if not await resumen_disponible(db):
+        return
+
+    await db.execute(text("""
+        INSERT INTO faismun_estadisticas (anio, label, total)
+        VALUES (:anio, :label, :cantidad)
+        ON CONFLICT (anio, label) DO UPDATE
+        SET total = faismun_estadisticas.total + EXCLUDED.total
+    """), {"anio": anio, "label": label or SIN_CLASIFICAR, "cantidad": cantidad})
+
+
+def _formatear(filas_por_anio: dict):
+    return {
+        f"anio_{anio}": [
+            {"label": r["label"] or SIN_CLASIFICAR, "value": r["total"]}
+            for r in filas_por_anio.get(anio, [])
+        ]
+        for anio in FUENTES
+    }
+
+
+async def leer_resumen(db: AsyncSession):
+    """
+    Lectura única del resumen; None si la tabla no existe todavía.
+    """
+    if not await resumen_disponible(db):
+        return None
+
+    result = await db.execute(text("""
+        SELECT anio, label, total FROM faismun_estadisticas
+        ORDER BY anio DESC, total DESC
+    """))
+    filas_por_anio = {}
+    for r in result.mappings().all():
+        filas_por_anio.setdefault(r["anio"], []).append(r)
+    return _formatear(filas_por_anio)
+
+
+async def _contar_anio(anio: int):
+    tabla, columna = FUENTES[anio]
+    async with AsyncSessionLocal2() as session:
+        result = await session.execute(text(
+            f"SELECT {columna} AS label, COUNT(*) AS total FROM {tabla} GROUP BY {columna} ORDER BY total DESC"
+        ))
+        return anio, result.mappings().all()
+
+
+async def estadisticas_en_vivo():
+    """
+    Las tres consultas GROUP BY en paralelo, cada una con su conexión del pool VISOP.
+    """
+    resultados = await asyncio.gather(*(_contar_anio(anio) for anio in FUENTES))
+    return _formatear(dict(resultados))
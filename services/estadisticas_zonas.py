@@ -0,0 +1,131 @@
+"""
+Estadísticas zonales de mis_zonas (base General).
+
+Al guardar una zona se calcula, en la misma transacción, la población y las
+viviendas que contiene (intersección ponderada por área con cpyv_2020: una
+manzana cubierta a medias aporta la mitad) y el número de establecimientos
+DENUE por sector SCIAN (dos primeros dígitos de codigo_act). El resultado se
+guarda en mis_zonas_estadisticas y GET /zonas/mis_zonas/{id}/estadisticas
+lo lee de ahí.
+"""
+import json
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+async def asegurar_tabla(db: AsyncSession):
+    await db.execute(text("""
+        CREATE TABLE IF NOT EXISTS mis_zonas_estadisticas (
+            zona_id        integer PRIMARY KEY REFERENCES mis_zonas (id) ON DELETE CASCADE,
+            pobtot         numeric NOT NULL DEFAULT 0,
+            vivtot         numeric NOT NULL DEFAULT 0,
+            pobfem         numeric NOT NULL DEFAULT 0,
+            pobmas         numeric NOT NULL DEFAULT 0,
+            manzanas       integer NOT NULL DEFAULT 0,
+            denue_total    integer NOT NULL DEFAULT 0,
+            denue_sectores jsonb   NOT NULL DEFAULT '{}'::jsonb,
+            calculado      timestamptz NOT NULL DEFAULT now()
+        )
+    """))
+
+
+async def calcular_estadisticas(db: AsyncSession, ids: list):
+    """
+    Calcula (o recalcula) las estadísticas de las zonas indicadas dentro de
+    la transacción del llamador (no hace commit). Un solo INSERT ... SELECT
+    sirve igual para una zona que para una carga masiva.
+    """
+    if not ids:
+        return
+
+    # Las manzanas contenidas por completo pesan 1 sin calcular la intersección;
+    # el área se mide sobre geography para que el peso no dependa de la latitud.
+    await db.execute(text("""
+        INSERT INTO mis_zonas_estadisticas
+            (zona_id, pobtot, vivtot, pobfem, pobmas, manzanas, denue_total, denue_sectores, calculado)
+        SELECT z.id,
+               COALESCE(c.pobtot, 0), COALESCE(c.vivtot, 0),
+               COALESCE(c.pobfem, 0), COALESCE(c.pobmas, 0),
+               COALESCE(c.manzanas, 0),
+               COALESCE(d.total, 0), COALESCE(d.sectores, '{}'::jsonb),
+               now()
+        FROM mis_zonas z
+        LEFT JOIN LATERAL (
+            SELECT round(sum(m.pobtot * w.peso), 2) AS pobtot,
+                   round(sum(m.vivtot * w.peso), 2) AS vivtot,
+                   round(sum(m.pobfem * w.peso), 2) AS pobfem,
+                   round(sum(m.pobmas * w.peso), 2) AS pobmas,
+                   count(*)::int AS manzanas
+            FROM cpyv_2020 m
+            CROSS JOIN LATERAL (
+                SELECT CASE
+                           WHEN ST_Within(m.wkb_geometry, z.geom) THEN 1.0
+                           ELSE (ST_Area(ST_Intersection(m.wkb_geometry, z.geom)::geography)
+                                 / NULLIF(ST_Area(m.wkb_geometry::geography), 0))::numeric
+                       END AS peso
+            ) w
+            WHERE m.wkb_geometry && z.geom
+              AND ST_Intersects(m.wkb_geometry, z.geom)
+        ) c ON true
+        LEFT JOIN LATERAL (
+            SELECT sum(s.n)::int AS total, jsonb_object_agg(s.sector, s.n) AS sectores
+            FROM (
+                SELECT COALESCE(left(e.codigo_act, 2), '00') AS sector, count(*) AS n
+                FROM denue_tuxtla_cb_2026 e
+                WHERE e.geom && z.geom
+                  AND ST_Intersects(e.geom, z.geom)
+                GROUP BY 1
+            ) s
+        ) d ON true
+        WHERE z.id = ANY(:ids)
+        ON CONFLICT (zona_id) DO UPDATE SET
+            pobtot = EXCLUDED.pobtot,
+            vivtot = EXCLUDED.vivtot,
+            pobfem = EXCLUDED.pobfem,
+            pobmas = EXCLUDED.pobmas,
+            manzanas = EXCLUDED.manzanas,
+            denue_total = EXCLUDED.denue_total,
+            denue_sectores = EXCLUDED.denue_sectores,
+            calculado = EXCLUDED.calculado
+    """), {"ids": list(ids)})
+
+
+async def calcular_sin_bloquear(db: AsyncSession, ids: list):
+    """
+    Como calcular_estadisticas, pero dentro de un SAVEPOINT: si la geometría
+    de una zona hace fallar la intersección, la zona se guarda igual y sus
+    estadísticas se calculan al pedirlas.
+    """
+    try:
+        async with db.begin_nested():
+            await calcular_estadisticas(db, ids)
+    except Exception as e:
+        print(f"No se pudieron calcular las estadísticas de las zonas {list(ids)[:10]}: {e}")
+
+
+async def leer_estadisticas(db: AsyncSession, zona_id: int):
+    """
+    Estadísticas guardadas de una zona; None si aún no se han calculado.
+    """
+    result = await db.execute(text("""
+        SELECT zona_id, pobtot, vivtot, pobfem, pobmas, manzanas,
+               denue_total, denue_sectores::text AS denue_sectores, calculado
+        FROM mis_zonas_estadisticas
+        WHERE zona_id = :id
+    """), {"id": zona_id})
+    fila = result.mappings().first()
+    if fila is None:
+        return None
+
+    return {
+        "zona_id": fila["zona_id"],
+        "poblacion": {
+            "pobtot": float(fila["pobtot"]),
+            "vivtot": float(fila["vivtot"]),
+            "pobfem": float(fila["pobfem"]),
+            "pobmas": float(fila["pobmas"]),
+        },
+        "manzanas": fila["manzanas"],
+        "denue": {"total": fila["denue_total"], "sectores": json.loads(fila["denue_sectores"])},
+        "calculado": fila["calculado"].isoformat(),
+    }
@@ -0,0 +1,135 @@
+"""
+Exportación de capas completas a FlatGeobuf (GET /export/{layer}.fgb).
+
+El archivo lo genera ogr2ogr (GDAL) leyendo directo de PostGIS, con índice
+espacial empaquetado (SPATIAL_INDEX=YES): un cliente puede pedir solo el
+encabezado, el índice y los features de su bbox mediante peticiones Range,
+sin consulta en el servidor.
+
+Los archivos se guardan en EXPORT_DIR con la versión de la tabla en el
+nombre. La versión sale de los contadores de pg_stat_user_tables (altas,
+cambios y bajas) y del relfilenode (cambia con TRUNCATE o VACUUM FULL), así
+que cualquier escritura en la capa produce un archivo nuevo en la siguiente
+descarga. Se consulta siempre el primario: en una réplica esos contadores
+no avanzan.
+"""
+import asyncio
+import hashlib
+import os
+import shutil
+from sqlalchemy import text
+from core.config import settings
+from db.connection import ENGINES
+from services.capas import columnas_select
+from services.vuelo_unico import vuelo_unico
+
+FGB_MEDIA_TYPE = "application/flatgeobuf"
+
+
+class ExportacionNoDisponible(Exception):
+    """ogr2ogr no está instalado en el servidor."""
+
+
+async def version_capa(capa: dict) -> str:
+    async with ENGINES[capa["bd"]].connect() as conn:
+        result = await conn.execute(text("""
+            SELECT s.n_tup_ins, s.n_tup_upd, s.n_tup_del,
+                   pg_relation_filenode(s.relid),
+                   (SELECT stats_reset FROM pg_stat_database WHERE datname = current_database())
+            FROM pg_stat_user_tables s
+            WHERE s.schemaname = 'public' AND s.relname = :tabla
+        """), {"tabla": capa["tabla"]})
+        fila = result.first()
+
+    if fila is None:
+        raise LookupError(f"La tabla {capa['tabla']} no existe")
+    return hashlib.sha256(repr(tuple(fila)).encode()).hexdigest()[:16]
+
+
+def _cadena_pg(capa: dict):
+    """
+    Cadena de conexión OGR y entorno del proceso. La contraseña va en
+    PGPASSWORD para que no aparezca en la línea de comandos (ps).
+    """
+    url = ENGINES[capa["bd"]].url
+    cadena = f"PG:host={url.host} port={url.port or 5432} dbname={url.database} user={url.username}"
+    entorno = dict(os.environ)
+    if url.password:
+        entorno["PGPASSWORD"] = url.password
+    return cadena, entorno
+
+
+async def _generar(nombre: str, capa: dict, destino: str):
+    ejecutable = shutil.which(settings.OGR2OGR_BIN)
+    if not ejecutable:
+        raise ExportacionNoDisponible(f"No se encontró {settings.OGR2OGR_BIN} (GDAL)")
+
+    cadena, entorno = _cadena_pg(capa)
+    sql = f'SELECT {columnas_select(capa)}, t."{capa["geom"]}" AS geom FROM "{capa["tabla"]}" t'
+    # El driver FlatGeobuf crea un directorio si la salida no termina en .fgb
+    temporal = f"{destino[:-len('.fgb')]}.{os.getpid()}.tmp.fgb"
+
+    proceso = await asyncio.create_subprocess_exec(
+        ejecutable, "-f", "FlatGeobuf", temporal, cadena,
+        "-sql", sql, "-nln", nombre, "-t_srs", "EPSG:4326",
+        "-lco", "SPATIAL_INDEX=YES", "-overwrite",
+        stdout=asyncio.subprocess.DEVNULL,
+        stderr=asyncio.subprocess.PIPE,
+        env=entorno,
+    )
+    try:
+        _, error = await asyncio.wait_for(proceso.communicate(), settings.EXPORT_TIMEOUT_SEGUNDOS)
+    except (asyncio.TimeoutError, asyncio.CancelledError):
+        proceso.kill()
+        await proceso.wait()
+        _borrar(temporal)
+        raise
+
+    if proceso.returncode != 0:
+        _borrar(temporal)
+        raise RuntimeError(f"ogr2ogr terminó con código {proceso.returncode}: {error.decode(errors='replace')[-500:]}")
+
+    # Renombrado atómico: nunca se sirve un archivo a medio escribir
+    os.replace(temporal, destino)
+
+
+def _borrar(ruta: str):
+    try:
+        if os.path.isdir(ruta):
+            shutil.rmtree(ruta)
+        else:
+            os.remove(ruta)
+    except FileNotFoundError:
+        pass
+
+
+def _limpiar_versiones(nombre: str, vigente: str):
+    prefijo = f"{nombre}-"
+    for archivo in os.listdir(settings.EXPORT_DIR):
+        if (archivo.startswith(prefijo) and archivo.endswith(".fgb")
+                and not archivo.endswith(".tmp.fgb") and archivo != vigente):
+            # Un FileResponse en curso conserva su descriptor abierto
+            _borrar(os.path.join(settings.EXPORT_DIR, archivo))
+
+
+async def archivo_fgb(nombre: str, capa: dict) -> str:
+    """
+    Ruta del .fgb vigente de la capa; lo genera si la tabla cambió desde la
+    última exportación. Peticiones simultáneas comparten la misma generación.
+    """
+    version = await version_capa(capa)
+    archivo = f"{nombre}-{version}.fgb"
+    destino = os.path.join(settings.EXPORT_DIR, archivo)
+    if os.path.isfile(destino):
+        return destino
+
+    async def producir():
+        os.makedirs(settings.EXPORT_DIR, exist_ok=True)
+        if not os.path.isfile(destino):
+            # Restos de una exportación que dejó un directorio en lugar del archivo
+            _borrar(destino)
+            await _generar(nombre, capa, destino)
+            _limpiar_versiones(nombre, archivo)
+        return destino
+
+    return await vuelo_unico.ejecutar(f"fgb:{archivo}", producir)
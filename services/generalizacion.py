@@ -0,0 +1,85 @@
+"""
+Geometrías generalizadas por nivel de zoom para las capas de polígonos.
+
+Las columnas geom_gen_* se guardan junto a la geometría original en la misma
+tabla y se recalculan con:  python -m scripts.generalizar_geometrias
+"""
+import time
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+from services.capas import obtener_capa
+
+# (columna, zoom máximo que la usa, tolerancia de simplificación en metros)
+NIVELES = [
+    ("geom_gen_z10", 10, 150.0),
+    ("geom_gen_z13", 13, 20.0),
+]
+
+CAPAS_GENERALIZADAS = ("colonias", "censo", "centralidades")
+
+# Decimales de ST_AsGeoJSON cuando el cliente manda zoom pero no precision
+PRECISION_POR_ZOOM = [(10, 4), (13, 5), (22, 6)]
+PRECISION_DEFECTO = 9  # valor por defecto de ST_AsGeoJSON
+
+# tabla -> (momento de la consulta, columnas geom_gen_* presentes)
+_columnas_cache = {}
+_TTL_COLUMNAS = 300
+
+
+def columna_para_zoom(zoom: int = None):
+    """
+    Columna generalizada adecuada para el zoom, o None para la geometría original.
+    """
+    if zoom is None:
+        return None
+    for columna, zoom_max, _ in NIVELES:
+        if zoom <= zoom_max:
+            return columna
+    return None
+
+
+def precision_para(zoom: int = None, precision: int = None) -> int:
+    """
+    Decimales de salida: el valor explícito manda; si no, se deriva del zoom.
+    """
+    if precision is not None:
+        return precision
+    if zoom is None:
+        return PRECISION_DEFECTO
+    for zoom_max, digitos in PRECISION_POR_ZOOM:
+        if zoom <= zoom_max:
+            return digitos
+    return PRECISION_DEFECTO
+
+
+async def _columnas_generalizadas(db: AsyncSession, tabla: str):
+    cache = _columnas_cache.get(tabla)
+    if cache and time.monotonic() - cache[0] < _TTL_COLUMNAS:
+        return cache[1]
+
+    result = await db.execute(text("""
+        SELECT column_name FROM information_schema.columns
+        WHERE table_name = :tabla AND column_name LIKE 'geom_gen_%'
+    """), {"tabla": tabla})
+    columnas = {r["column_name"] for r in result.mappings().all()}
+    _columnas_cache[tabla] = (time.monotonic(), columnas)
+    return columnas
+
+
+async def expresion_geojson(db: AsyncSession, nombre_capa: str, zoom: int = None, alias_tabla: str = None):
+    """
+    Devuelve la expresión ST_AsGeoJSON(...) para la capa según el zoom.
+    Usa la geometría generalizada si ya fue calculada; si no, la original.
+    La precisión va como parámetro :precision.
+    """
+    capa = obtener_capa(nombre_capa)
+    prefijo = f"{alias_tabla}." if alias_tabla else ""
+    original = f'{prefijo}"{capa["geom"]}"'
+
+    columna = columna_para_zoom(zoom)
+    if columna and columna in await _columnas_generalizadas(db, capa["tabla"]):
+        geometria = f'COALESCE({prefijo}"{columna}", {original})'
+    else:
+        geometria = original
+
+    return f"ST_AsGeoJSON({geometria}, :precision)"
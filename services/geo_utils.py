@@ -1,4 +1,12 @@
 import json
+import math
+from datetime import date, datetime
+from decimal import Decimal
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+from core.config import settings
 
 def rows_to_geojson(rows, geom_col="geom"):
     """
@@ -35,19 +43,277 @@ def rows_to_geojson(rows, geom_col="geom"):
 
     return {"type": "FeatureCollection", "features": features}
 
-def generar_consulta_geojson(tabla: str, limite: int = None):
-    # Esta función se mantiene igual ya que solo genera el SQL string
-    limit_clause = f"LIMIT {limite}" if limite else ""
+def _lon_a_tile(lon: float, z: int) -> float:
+    return (lon + 180.0) / 360.0 * (1 << z)
+
+def _lat_a_tile(lat: float, z: int) -> float:
+    lat = max(min(lat, 85.0511), -85.0511)
+    rad = math.radians(lat)
+    return (1.0 - math.asinh(math.tan(rad)) / math.pi) / 2.0 * (1 << z)
+
+def _tile_a_lon(x: float, z: int) -> float:
+    return x / (1 << z) * 360.0 - 180.0
+
+def _tile_a_lat(y: float, z: int) -> float:
+    return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * y / (1 << z)))))
+
+def ajustar_bbox_a_rejilla(bbox, zoom_max: int = 18, max_expansion: float = None):
+    """
+    Expande el bbox a los límites de las teselas Web Mercator que lo cubren,
+    con el zoom en el que el bbox ocupa como mucho 2 teselas de ancho y de alto.
+    Así, bboxes casi iguales de distintos clientes producen la misma clave.
+    El bbox ajustado es también el filtro de la consulta, así que puede traer
+    features fuera del bbox pedido; si su área (en teselas) supera
+    `max_expansion` veces la pedida se devuelve el bbox original sin ajustar.
+    Devuelve [min_lon, min_lat, max_lon, max_lat].
+    """
+    min_lon, min_lat, max_lon, max_lat = bbox
+    # Extensión en teselas de zoom 0: el zoom sale de la dimensión mayor, que
+    # queda entre 1 y 2 teselas
+    ancho = max(_lon_a_tile(max_lon, 0) - _lon_a_tile(min_lon, 0), 0.0)
+    alto = max(_lat_a_tile(min_lat, 0) - _lat_a_tile(max_lat, 0), 0.0)
+    lado = max(ancho, alto, 1e-12)
+    z = max(0, min(zoom_max, int(math.floor(math.log2(2.0 / lado)))))
+
+    x0 = math.floor(_lon_a_tile(min_lon, z))
+    x1 = math.ceil(_lon_a_tile(max_lon, z))
+    y0 = math.floor(_lat_a_tile(max_lat, z))
+    y1 = math.ceil(_lat_a_tile(min_lat, z))
+
+    if max_expansion is not None:
+        escala = 1 << z
+        pedida = ancho * escala * alto * escala
+        if (x1 - x0) * (y1 - y0) > max_expansion * pedida:
+            return list(bbox)
+
+    return [
+        round(_tile_a_lon(x0, z), 7), round(_tile_a_lat(y1, z), 7),
+        round(_tile_a_lon(x1, z), 7), round(_tile_a_lat(y0, z), 7),
+    ]
+
+# Metros por píxel a zoom 0 en Web Mercator (tesela de 256 px)
+METROS_POR_PIXEL_Z0 = 156543.03392804097
+
+def tamano_celda(zoom: int, pixeles: int) -> float:
+    """
+    Lado en metros (EPSG:3857) de una celda que mide `pixeles` en pantalla a ese zoom.
+    """
+    return METROS_POR_PIXEL_Z0 / (1 << zoom) * pixeles
+
+def generar_consulta_geojson(tabla: str = None, limite: int = None, subconsulta: str = None, geom_col: str = "geom"):
+    """
+    Genera el SQL que arma el FeatureCollection completo dentro de PostGIS.
+    - Con `tabla`: publica la tabla completa, transformando su geometría a 4326.
+    - Con `subconsulta`: envuelve el SELECT de un router, cuya columna `geom_col`
+      ya viene como texto GeoJSON (ST_AsGeoJSON).
+    El resultado es una sola fila con el documento ya serializado (texto).
+    """
+    if subconsulta is None:
+        limit_clause = f"LIMIT {limite}" if limite else ""
+        subconsulta = f'SELECT * FROM "{tabla}" {limit_clause}'
+        geometria = f'ST_AsGeoJSON(ST_Transform(t."{geom_col}", 4326))::json'
+    else:
+        geometria = f't."{geom_col}"::json'
+
     return f"""
     SELECT json_build_object(
         'type', 'FeatureCollection',
         'features', COALESCE(json_agg(
             json_build_object(
                 'type', 'Feature',
-                'geometry', ST_AsGeoJSON(ST_Transform(t.geom, 4326))::json,
-                'properties', to_jsonb(t) - 'geom' 
+                'geometry', {geometria},
+                'properties', p.props,
+                'id', COALESCE(p.props->'id', p.props->'gid', p.props->'cvegeo')
             )
         ), '[]'::json)
+    )::text
+    FROM ({subconsulta}) AS t,
+         LATERAL (SELECT to_jsonb(t) - '{geom_col}' AS props) AS p;
+    """
+
+def _json_default(valor):
+    """
+    Serializa los tipos que devuelve asyncpg y que json no conoce
+    (mismo criterio que jsonable_encoder de FastAPI).
+    """
+    if isinstance(valor, Decimal):
+        return int(valor) if valor.as_tuple().exponent >= 0 else float(valor)
+    if isinstance(valor, (datetime, date)):
+        return valor.isoformat()
+    return str(valor)
+
+def json_a_bytes(documento) -> bytes:
+    """
+    Serializa un documento (FeatureCollection, lista, dict) a bytes JSON compactos.
+    """
+    return json.dumps(documento, default=_json_default, separators=(",", ":")).encode("utf-8")
+
+async def consultar_geojson(db: AsyncSession, sql: str, params: dict = None, geom_col: str = "geom", en_bd: bool = None) -> bytes:
+    """
+    Ejecuta el SELECT de un router y devuelve el FeatureCollection ya serializado.
+    - en_bd=True: PostGIS arma el documento completo y solo copiamos los bytes.
+    - en_bd=False: camino clásico (filas + rows_to_geojson + json.dumps).
+    Si no se indica, se usa settings.GEOJSON_EN_BD.
+    """
+    if en_bd is None:
+        en_bd = settings.GEOJSON_EN_BD
+
+    if en_bd:
+        result = await db.execute(text(generar_consulta_geojson(subconsulta=sql, geom_col=geom_col)), params or {})
+        return result.scalar().encode("utf-8")
+
+    result = await db.execute(text(sql), params or {})
+    return json_a_bytes(rows_to_geojson(result.mappings().all(), geom_col=geom_col))
+
+
+
+# --- CONSULTAS DE CAPA (fields=, in_bbox, paginación keyset) ---
+
+def validar_campos(capa: dict, fields: str = None):
+    """
+    Interpreta fields=a,b,geom contra la lista blanca de la capa.
+    Devuelve (campos, con_geometria); sin `fields`, todos los campos y la geometría.
+    La geometría solo se incluye si se pide "geom" (vistas de lista sin geometría).
+    """
+    if not fields:
+        return list(capa["campos"]), True
+
+    pedidos = [f.strip() for f in fields.split(",") if f.strip()]
+    desconocidos = [f for f in pedidos if f != "geom" and f not in capa["campos"]]
+    if desconocidos:
+        opciones = ", ".join(list(capa["campos"]) + ["geom"])
+        raise HTTPException(
+            status_code=400,
+            detail=f"Campos desconocidos: {', '.join(desconocidos)}. Opciones: {opciones}"
+        )
+    return [f for f in pedidos if f != "geom"], "geom" in pedidos
+
+def construir_consulta_capa(capa: dict, campos: list, geometria: str = None, bbox=None,
+                            cursor: int = None, limite: int = None):
+    """
+    SELECT de una capa del catálogo (alias de tabla `t`) con:
+    - proyección de `campos` (alias ya validados con validar_campos);
+    - `geometria`: expresión GeoJSON (p. ej. de expresion_geojson) o None
+      para devolver geom NULL;
+    - `bbox` en 4326, reproyectado al SRID de la tabla para usar el índice GiST;
+    - paginación keyset por capa["clave"] si hay `limite`: WHERE clave > cursor
+      ORDER BY clave, con una fila extra para saber si hay otra página.
+    Devuelve (sql, params).
+    """
+    columnas = [f"t.{capa['campos'][c]} AS {c}" for c in campos]
+    condiciones, params, orden = [], {}, ""
+
+    if limite is not None:
+        clave = capa["clave"]
+        # La clave siempre viaja en la página para poder pedir la siguiente
+        if clave not in campos:
+            columnas.insert(0, f't."{clave}" AS {clave}')
+        if cursor is not None:
+            condiciones.append(f't."{clave}" > :cursor')
+            params["cursor"] = cursor
+        orden = f't."{clave}" LIMIT :limite'
+        params["limite"] = limite + 1
+
+    columnas.append(f"{geometria} AS geom" if geometria else "NULL::text AS geom")
+
+    if bbox:
+        condiciones.append(f"""t."{capa['geom']}" && ST_Transform(
+            ST_MakeEnvelope(:min_lon, :min_lat, :max_lon, :max_lat, 4326),
+            Find_SRID('public', :bbox_tabla, :bbox_geom)
+        )""")
+        params.update({
+            "min_lon": bbox[0], "min_lat": bbox[1], "max_lon": bbox[2], "max_lat": bbox[3],
+            "bbox_tabla": capa["tabla"], "bbox_geom": capa["geom"],
+        })
+
+    sql = f'SELECT {", ".join(columnas)} FROM "{capa["tabla"]}" t'
+    if condiciones:
+        sql += " WHERE " + " AND ".join(condiciones)
+    if orden:
+        sql += " ORDER BY " + orden
+    return sql, params
+
+async def consultar_pagina(db: AsyncSession, sql: str, params: dict, clave: str, limite: int):
+    """
+    Ejecuta una consulta de construir_consulta_capa con `limite` y devuelve
+    (FeatureCollection serializado, cursor siguiente o None).
+    Las páginas están acotadas, así que se arman en Python.
+    """
+    result = await db.execute(text(sql), params)
+    filas = result.mappings().all()
+    siguiente = filas[limite - 1][clave] if len(filas) > limite else None
+    return json_a_bytes(rows_to_geojson(filas[:limite])), siguiente
+
+# --- STREAMING (cursor del lado del servidor) ---
+
+# format=... -> media type de la respuesta
+FORMATOS_STREAM = {
+    "geojson-stream": "application/geo+json",  # FeatureCollection enviado por trozos
+    "geojsonseq": "application/geo+seq",        # RFC 8142: RS + Feature + LF
+    "ndjson": "application/x-ndjson",           # un Feature por línea
+}
+
+FILAS_POR_LOTE = 500
+
+def validar_formato(formato: str, extra: tuple = ("geojson",)):
+    """
+    Lanza 400 si el formato pedido no está soportado por la ruta.
+    """
+    if formato not in extra and formato not in FORMATOS_STREAM:
+        opciones = ", ".join(list(extra) + list(FORMATOS_STREAM))
+        raise HTTPException(status_code=400, detail=f"Formato no soportado. Opciones: {opciones}")
+
+def fila_a_feature_json(row, geom_col="geom") -> str:
+    """
+    Serializa una fila como Feature GeoJSON (texto). La geometría de ST_AsGeoJSON
+    se inserta tal cual, sin json.loads.
+    """
+    props = dict(row)
+    raw_geom = props.pop(geom_col, None)
+    if raw_geom is None:
+        geometria = "null"
+    elif isinstance(raw_geom, str):
+        geometria = raw_geom
+    else:
+        geometria = json.dumps(raw_geom)
+
+    feature_id = props.get("id") or props.get("gid") or props.get("cvegeo")
+    return (
+        '{"type":"Feature","geometry":' + geometria
+        + ',"properties":' + json.dumps(props, default=_json_default, separators=(",", ":"))
+        + ',"id":' + json.dumps(feature_id, default=_json_default) + "}"
+    )
+
+async def stream_geojson(engine: AsyncEngine, sql: str, params: dict, formato: str, geom_col: str = "geom"):
+    """
+    Generador de bytes que lee las filas con un cursor del lado del servidor
+    (stream_results + yield_per) y escribe los Features a medida que llegan.
+    Usa su propia conexión para que viva exactamente lo que dura el envío.
+    """
+    async with engine.connect() as conn:
+        result = await conn.stream(
+            text(sql), params,
+            execution_options={"yield_per": FILAS_POR_LOTE},
+        )
+
+        if formato == "geojson-stream":
+            yield b'{"type":"FeatureCollection","features":['
+            primero = True
+            async for lote in result.mappings().partitions(FILAS_POR_LOTE):
+                trozo = ",".join(fila_a_feature_json(r, geom_col) for r in lote)
+                yield (trozo if primero else "," + trozo).encode("utf-8")
+                primero = False
+            yield b"]}"
+        else:
+            prefijo = "\x1e" if formato == "geojsonseq" else ""
+            async for lote in result.mappings().partitions(FILAS_POR_LOTE):
+                yield "".join(prefijo + fila_a_feature_json(r, geom_col) + "\n" for r in lote).encode("utf-8")
+
+def respuesta_stream(engine: AsyncEngine, sql: str, params: dict, formato: str, geom_col: str = "geom") -> StreamingResponse:
+    """
+    Respuesta por trozos (chunked) para los formatos de FORMATOS_STREAM.
+    """
+    return StreamingResponse(
+        stream_geojson(engine, sql, params, formato, geom_col),
+        media_type=FORMATOS_STREAM[formato],
     )
-    FROM (SELECT * FROM "{tabla}" {limit_clause}) as t;
-    """
\ No newline at end of file
@@ -0,0 +1,172 @@
+"""
+Índice espacial en memoria de las manzanas del censo (cpyv_2020).
+
+Modo opcional (settings.INDICE_MANZANAS_EN_MEMORIA): al arrancar se cargan
+los polígonos en un STRtree de shapely y los atributos en columnas numpy,
+y /info-manzana/ y /censo/ se responden sin ir a la base.
+Recarga: señal SIGHUP o POST /admin/indice-manzanas/recargar.
+
+Requiere: pip install shapely numpy  (opcionales)
+"""
+import asyncio
+import time
+from dataclasses import dataclass
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+from services.geo_utils import fila_a_feature_json
+
+try:
+    import resource  # no existe en Windows
+except ImportError:
+    resource = None
+
+try:
+    import numpy as np
+    import shapely
+except ImportError:
+    np = None
+    shapely = None
+
+ATRIBUTOS = ("pobtot", "vivtot", "pobfem", "pobmas")
+
+
+@dataclass
+class _DatosIndice:
+    arbol: object
+    geometrias: object
+    cvegeo: object
+    atributos: dict
+    bytes_wkb: int
+    cargado_en: float
+    segundos_carga: float
+
+
+def _valor(v):
+    # Las columnas numéricas se guardan como float64 (NaN = nulo)
+    if v != v:
+        return None
+    return int(v) if float(v).is_integer() else float(v)
+
+
+def _construir(filas) -> _DatosIndice:
+    inicio = time.perf_counter()
+    wkb = [bytes(f["wkb"]) for f in filas]
+    geometrias = shapely.from_wkb(wkb)
+    datos = _DatosIndice(
+        arbol=shapely.STRtree(geometrias),
+        geometrias=geometrias,
+        cvegeo=np.array([f["cvegeo"] for f in filas], dtype=str),
+        atributos={
+            a: np.array([f[a] if f[a] is not None else np.nan for f in filas], dtype=np.float64)
+            for a in ATRIBUTOS
+        },
+        bytes_wkb=sum(len(w) for w in wkb),
+        cargado_en=time.time(),
+        segundos_carga=0.0,
+    )
+    datos.segundos_carga = time.perf_counter() - inicio
+    return datos
+
+
+class IndiceManzanas:
+    def __init__(self):
+        self._datos = None
+        self._lock = asyncio.Lock()
+
+    @property
+    def disponible(self) -> bool:
+        return shapely is not None
+
+    @property
+    def activo(self) -> bool:
+        return self._datos is not None
+
+    async def cargar(self, engine: AsyncEngine):
+        """
+        Lee las manzanas y reconstruye el índice en un hilo aparte; el índice
+        anterior sigue atendiendo hasta que el nuevo está listo.
+        """
+        if not self.disponible:
+            raise RuntimeError("El índice en memoria requiere shapely>=2 y numpy")
+
+        async with self._lock:
+            async with engine.connect() as conn:
+                result = await conn.execute(text("""
+                    SELECT cvegeo, pobtot, vivtot, pobfem, pobmas, ST_AsBinary(wkb_geometry) AS wkb
+                    FROM cpyv_2020
+                    WHERE wkb_geometry IS NOT NULL
+                """))
+                filas = result.mappings().all()
+
+            self._datos = await asyncio.to_thread(_construir, filas)
+            print(f"Índice de manzanas cargado: {len(filas)} polígonos en {self._datos.segundos_carga:.2f}s")
+
+    async def recargar(self, engine: AsyncEngine):
+        """
+        Recarga para tareas en segundo plano (señal): registra el error en vez de propagarlo.
+        """
+        try:
+            await self.cargar(engine)
+        except Exception as e:
+            print(f"Error al recargar índice de manzanas: {e}")
+
+    def _fila(self, datos: _DatosIndice, i: int):
+        fila = {"cvegeo": str(datos.cvegeo[i])}
+        for a in ATRIBUTOS:
+            fila[a] = _valor(datos.atributos[a][i])
+        return fila
+
+    def buscar_puntos(self, coordenadas):
+        """
+        Manzana que contiene cada (lon, lat), en el orden de entrada (None si no hay).
+        """
+        datos = self._datos
+        puntos = shapely.points(np.asarray(coordenadas, dtype=np.float64))
+        entrada, arbol = datos.arbol.query(puntos, predicate="within")
+
+        encontrados = {}
+        for i, j in zip(entrada.tolist(), arbol.tolist()):
+            encontrados.setdefault(i, j)
+
+        return [
+            self._fila(datos, encontrados[i]) if i in encontrados else None
+            for i in range(len(coordenadas))
+        ]
+
+    def feature_collection_bbox(self, bbox) -> bytes:
+        """
+        Equivalente en memoria de /censo/: manzanas cuyo envolvente cruza el bbox (&&).
+        """
+        datos = self._datos
+        indices = datos.arbol.query(shapely.box(*bbox))
+        indices.sort()
+        geojson = shapely.to_geojson(datos.geometrias[indices])
+
+        features = []
+        for i, geom in zip(indices.tolist(), geojson.tolist()):
+            fila = self._fila(datos, i)
+            fila["geom"] = geom
+            features.append(fila_a_feature_json(fila))
+        return ('{"type":"FeatureCollection","features":[' + ",".join(features) + "]}").encode("utf-8")
+
+    def memoria(self):
+        datos = self._datos
+        uso = {"activo": self.activo, "disponible": self.disponible}
+        if resource:
+            # ru_maxrss está en KiB en Linux
+            uso["rss_max_proceso_bytes"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+        if not datos:
+            return uso
+
+        uso.update({
+            "manzanas": len(datos.geometrias),
+            "bytes_atributos": int(datos.cvegeo.nbytes + sum(a.nbytes for a in datos.atributos.values())),
+            # Aproximación: GEOS ocupa del orden del tamaño WKB de las geometrías
+            "bytes_geometrias_aprox": datos.bytes_wkb,
+            "cargado_en": datos.cargado_en,
+            "segundos_carga": round(datos.segundos_carga, 3),
+        })
+        return uso
+
+
+indice_manzanas = IndiceManzanas()
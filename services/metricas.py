@@ -0,0 +1,150 @@
+"""
+Métricas Prometheus de la API (expuestas en GET /metrics).
+
+- Latencia y tamaño de respuesta por ruta (middleware ASGI; cuenta también
+  las respuestas por streaming).
+- Tiempo de ejecución por sentencia SQL (eventos de SQLAlchemy en cada engine).
+- Estado de los pools: conexiones en uso, overflow y tiempo de espera.
+- Contadores internos: caché de respuestas, coalescencia de bbox y pool de bcrypt.
+"""
+import time
+from prometheus_client import Histogram, REGISTRY  # pip install prometheus_client
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+BUCKETS_LATENCIA = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+BUCKETS_TAMANO = (1e3, 1e4, 1e5, 5e5, 1e6, 5e6, 1e7, 5e7, 1e8)
+
+HTTP_LATENCIA = Histogram(
+    "ovie_http_request_duration_seconds", "Latencia de las peticiones HTTP por ruta",
+    ["metodo", "ruta", "estado"], buckets=BUCKETS_LATENCIA,
+)
+HTTP_TAMANO = Histogram(
+    "ovie_http_response_size_bytes", "Tamaño del cuerpo de respuesta por ruta",
+    ["metodo", "ruta"], buckets=BUCKETS_TAMANO,
+)
+DB_SENTENCIA = Histogram(
+    "ovie_db_statement_duration_seconds", "Tiempo de ejecución de sentencias SQL",
+    ["bd", "operacion"], buckets=BUCKETS_LATENCIA,
+)
+DB_POOL_ESPERA = Histogram(
+    "ovie_db_pool_wait_seconds", "Tiempo esperando una conexión del pool",
+    ["bd"], buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 30),
+)
+
+# nombre -> engine instrumentado (para los gauges del pool)
+_engines = {}
+
+
+class MetricasMiddleware:
+    """
+    Middleware ASGI: mide hasta que se envía el último byte del cuerpo.
+    La ruta se toma de la plantilla (p. ej. /tiles/{layer}/{z}/{x}/{y}.pbf)
+    para no disparar la cardinalidad de las etiquetas.
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        inicio = time.perf_counter()
+        estado = [500]
+        tamano = [0]
+
+        async def enviar(mensaje):
+            if mensaje["type"] == "http.response.start":
+                estado[0] = mensaje["status"]
+            elif mensaje["type"] == "http.response.body":
+                tamano[0] += len(mensaje.get("body", b""))
+            await send(mensaje)
+
+        try:
+            await self.app(scope, receive, enviar)
+        finally:
+            ruta = getattr(scope.get("route"), "path", "sin_ruta")
+            metodo = scope["method"]
+            HTTP_LATENCIA.labels(metodo, ruta, str(estado[0])).observe(time.perf_counter() - inicio)
+            HTTP_TAMANO.labels(metodo, ruta).observe(tamano[0])
+
+
+def _operacion(statement: str) -> str:
+    partes = statement.lstrip().split(None, 1)
+    return partes[0].upper() if partes else "?"
+
+
+def instrumentar_engine(engine: AsyncEngine, nombre: str):
+    """
+    Registra los eventos de SQLAlchemy para medir cada sentencia y conecta
+    el histograma de espera del pool (db.connection.PoolMedido).
+    """
+    if nombre in _engines:
+        return
+    _engines[nombre] = engine
+    sync_engine = engine.sync_engine
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _antes(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("ovie_inicio", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _despues(conn, cursor, statement, parameters, context, executemany):
+        pila = conn.info.get("ovie_inicio")
+        if pila:
+            DB_SENTENCIA.labels(nombre, _operacion(statement)).observe(time.perf_counter() - pila.pop())
+
+    @event.listens_for(sync_engine, "handle_error")
+    def _error(contexto):
+        pila = contexto.connection.info.get("ovie_inicio") if contexto.connection is not None else None
+        if pila:
+            pila.pop()
+
+    pool = engine.pool
+    if hasattr(pool, "observar_espera"):
+        pool.observar_espera = DB_POOL_ESPERA.labels(nombre).observe
+
+
+class _ColectorEstado:
+    """
+    Gauges que se leen en el momento del scrape (pools y contadores internos).
+    """
+    def collect(self):
+        # Importación diferida para no crear ciclos al importar este módulo
+        from core.security import pool_hash
+        from services.cache import cache_respuestas
+        from services.vuelo_unico import vuelo_unico
+
+        en_uso = GaugeMetricFamily("ovie_db_pool_checked_out", "Conexiones prestadas por el pool", labels=["bd"])
+        overflow = GaugeMetricFamily("ovie_db_pool_overflow", "Conexiones abiertas por encima de pool_size", labels=["bd"])
+        tamano = GaugeMetricFamily("ovie_db_pool_size", "pool_size configurado", labels=["bd"])
+        for nombre, engine in _engines.items():
+            pool = engine.pool
+            if hasattr(pool, "checkedout"):
+                en_uso.add_metric([nombre], pool.checkedout())
+                overflow.add_metric([nombre], pool.overflow())
+                tamano.add_metric([nombre], pool.size())
+        yield en_uso
+        yield overflow
+        yield tamano
+
+        cache = cache_respuestas.estadisticas()
+        yield CounterMetricFamily("ovie_cache_hits", "Aciertos de la caché de respuestas", value=cache["hits"])
+        yield CounterMetricFamily("ovie_cache_misses", "Fallos de la caché de respuestas", value=cache["misses"])
+        yield CounterMetricFamily("ovie_cache_evictions", "Expulsiones LRU de la caché", value=cache["expulsiones"])
+        yield GaugeMetricFamily("ovie_cache_bytes", "Bytes ocupados por la caché", value=cache["bytes"])
+        yield GaugeMetricFamily("ovie_cache_entries", "Entradas en la caché", value=cache["entradas"])
+
+        vuelo = vuelo_unico.estadisticas()
+        yield CounterMetricFamily("ovie_bbox_queries_executed", "Consultas bbox ejecutadas", value=vuelo["ejecuciones"])
+        yield CounterMetricFamily("ovie_bbox_queries_coalesced", "Peticiones bbox que compartieron una ejecución", value=vuelo["compartidas"])
+
+        hashing = pool_hash.estadisticas()
+        yield GaugeMetricFamily("ovie_hash_pool_pending", "Verificaciones bcrypt en curso o en cola", value=hashing["pendientes"])
+        yield CounterMetricFamily("ovie_hash_pool_rejected", "Verificaciones rechazadas con 503", value=hashing["rechazadas"])
+        yield CounterMetricFamily("ovie_hash_pool_completed", "Verificaciones bcrypt completadas", value=hashing["completadas"])
+
+
+REGISTRY.register(_ColectorEstado())
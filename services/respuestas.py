@@ -0,0 +1,115 @@
+"""
+Respuestas HTTP con validadores y compresión para payloads JSON/GeoJSON grandes.
+
+Un Payload guarda los bytes ya serializados, su hash (ETag fuerte) y las
+variantes comprimidas (gzip y, si está instalado, brotli). Las que viven en
+la caché se comprimen una sola vez; el resto se comprime bajo demanda.
+"""
+import gzip
+import hashlib
+from fastapi import Request, Response
+
+try:
+    import brotli  # pip install brotli (opcional)
+except ImportError:
+    brotli = None
+
+# Por debajo de este tamaño no vale la pena comprimir
+UMBRAL_COMPRESION = 1024
+GZIP_NIVEL = 6
+BROTLI_CALIDAD = 9
+
+CODIFICACIONES = ("br", "gzip") if brotli else ("gzip",)
+
+
+def _comprimir(contenido: bytes, codificacion: str) -> bytes:
+    if codificacion == "br":
+        return brotli.compress(contenido, quality=BROTLI_CALIDAD)
+    return gzip.compress(contenido, compresslevel=GZIP_NIVEL, mtime=0)
+
+
+class Payload:
+    __slots__ = ("contenido", "media_type", "hash", "_variantes")
+
+    def __init__(self, contenido: bytes, media_type: str = "application/json"):
+        self.contenido = contenido
+        self.media_type = media_type
+        self.hash = hashlib.sha256(contenido).hexdigest()[:32]
+        self._variantes = {}
+
+    def variante(self, codificacion: str) -> bytes:
+        """
+        Bytes en la codificación pedida; cada variante se comprime una sola vez.
+        """
+        if codificacion not in self._variantes:
+            self._variantes[codificacion] = _comprimir(self.contenido, codificacion)
+        return self._variantes[codificacion]
+
+    def precomprimir(self):
+        """
+        Calcula de antemano todas las variantes (antes de guardar en la caché).
+        """
+        if len(self.contenido) >= UMBRAL_COMPRESION:
+            for codificacion in CODIFICACIONES:
+                self.variante(codificacion)
+        return self
+
+    def etag(self, codificacion: str = None) -> str:
+        # Cada representación tiene su propio ETag fuerte
+        return f'"{self.hash}-{codificacion}"' if codificacion else f'"{self.hash}"'
+
+    def __len__(self):
+        return len(self.contenido) + sum(len(v) for v in self._variantes.values())
+
+
+def _codificacion_aceptada(request: Request, payload: Payload):
+    if len(payload.contenido) < UMBRAL_COMPRESION:
+        return None
+
+    aceptadas = {}
+    for parte in request.headers.get("accept-encoding", "").split(","):
+        token, _, params = parte.strip().partition(";")
+        calidad = 1.0
+        if params.strip().startswith("q="):
+            try:
+                calidad = float(params.strip()[2:])
+            except ValueError:
+                calidad = 0.0
+        aceptadas[token.strip().lower()] = calidad
+
+    for codificacion in CODIFICACIONES:
+        if aceptadas.get(codificacion, aceptadas.get("*", 0)) > 0:
+            return codificacion
+    return None
+
+
+def _coincide_etag(request: Request, payload: Payload) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+
+    for etiqueta in if_none_match.split(","):
+        valor = etiqueta.strip().removeprefix("W/").strip('"')
+        if valor.split("-", 1)[0] == payload.hash:
+            return True
+    return False
+
+
+def responder(request: Request, payload: Payload, headers: dict = None) -> Response:
+    """
+    304 si el cliente ya tiene la versión (If-None-Match); si no, la variante
+    comprimida que acepte (Accept-Encoding) con su ETag.
+    """
+    codificacion = _codificacion_aceptada(request, payload)
+    cabeceras = {"ETag": payload.etag(codificacion), "Vary": "Accept-Encoding", **(headers or {})}
+
+    if _coincide_etag(request, payload):
+        return Response(status_code=304, headers=cabeceras)
+
+    if codificacion:
+        cabeceras["Content-Encoding"] = codificacion
+        return Response(content=payload.variante(codificacion), media_type=payload.media_type, headers=cabeceras)
+
+    return Response(content=payload.contenido, media_type=payload.media_type, headers=cabeceras)
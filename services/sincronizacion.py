@@ -0,0 +1,136 @@
+"""
+Sincronización incremental (?since=) de mis_zonas y de las obras FAISMUN.
+
+Cada fila lleva `sync_version`: el id de la transacción que la insertó o
+modificó por última vez (pg_current_xact_id, puesto por trigger). Las bajas
+se anotan en sync_bajas con el id de la transacción que borró. Ambas cosas
+las instala `python -m scripts.instalar_sincronizacion`.
+
+La marca que se devuelve al cliente no es la versión más alta vista sino el
+xmin del snapshot tomado ANTES de leer: toda transacción con id menor ya
+terminó y su efecto está en la lectura; las que tienen id mayor o igual
+podrían seguir en curso. Por eso la siguiente consulta usa `>= since` y
+puede repetir algunas features ya recibidas (el cliente las reemplaza), pero
+nunca se salta un cambio que se confirme tarde.
+"""
+from fastapi import HTTPException, Request
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+from services.capas import columnas_select, obtener_capa
+from services.geo_utils import rows_to_geojson, json_a_bytes
+from services.respuestas import Payload, responder
+
+# capa de services.capas que admite ?since=
+CAPAS_SINCRONIZABLES = ("mis_zonas", "faismun_2023", "faismun_2024", "faismun_2025")
+
+
+class SincronizacionNoInstalada(Exception):
+    """Faltan la columna sync_version, los triggers o sync_bajas en la base."""
+
+
+def sentencias_instalacion(tablas: list) -> list:
+    """
+    DDL idempotente para una base. ADD COLUMN con DEFAULT constante no
+    reescribe la tabla; las filas existentes quedan con versión 0.
+    """
+    sentencias = [
+        "CREATE SEQUENCE IF NOT EXISTS sync_bajas_id_seq",
+        """
+        CREATE TABLE IF NOT EXISTS sync_bajas (
+            id         bigint PRIMARY KEY DEFAULT nextval('sync_bajas_id_seq'),
+            tabla      text   NOT NULL,
+            feature_id bigint NOT NULL,
+            version    bigint NOT NULL,
+            borrado    timestamptz NOT NULL DEFAULT now()
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS sync_bajas_tabla_version_idx ON sync_bajas (tabla, version)",
+        """
+        CREATE OR REPLACE FUNCTION sync_marcar_version() RETURNS trigger AS $$
+        BEGIN
+            NEW.sync_version := pg_current_xact_id()::text::bigint;
+            RETURN NEW;
+        END
+        $$ LANGUAGE plpgsql
+        """,
+        """
+        CREATE OR REPLACE FUNCTION sync_registrar_baja() RETURNS trigger AS $$
+        BEGIN
+            INSERT INTO sync_bajas (tabla, feature_id, version)
+            VALUES (TG_TABLE_NAME, OLD.id, pg_current_xact_id()::text::bigint);
+            RETURN OLD;
+        END
+        $$ LANGUAGE plpgsql
+        """,
+    ]
+    for tabla in tablas:
+        sentencias += [
+            f'ALTER TABLE "{tabla}" ADD COLUMN IF NOT EXISTS sync_version bigint NOT NULL DEFAULT 0',
+            f'CREATE INDEX IF NOT EXISTS "{tabla}_sync_version_idx" ON "{tabla}" (sync_version)',
+            f'DROP TRIGGER IF EXISTS sync_version_trg ON "{tabla}"',
+            f"""CREATE TRIGGER sync_version_trg BEFORE INSERT OR UPDATE ON "{tabla}"
+                FOR EACH ROW EXECUTE FUNCTION sync_marcar_version()""",
+            f'DROP TRIGGER IF EXISTS sync_baja_trg ON "{tabla}"',
+            f"""CREATE TRIGGER sync_baja_trg AFTER DELETE ON "{tabla}"
+                FOR EACH ROW EXECUTE FUNCTION sync_registrar_baja()""",
+        ]
+    return sentencias
+
+
+async def _instalada(db: AsyncSession, tabla: str) -> bool:
+    result = await db.execute(text("""
+        SELECT to_regclass('sync_bajas') IS NOT NULL
+           AND EXISTS (
+               SELECT 1 FROM information_schema.columns
+               WHERE table_schema = 'public' AND table_name = :tabla AND column_name = 'sync_version'
+           )
+    """), {"tabla": tabla})
+    return bool(result.scalar())
+
+
+async def cambios_desde(db: AsyncSession, capa: dict, since: int) -> dict:
+    """
+    FeatureCollection con las features nuevas o modificadas desde `since`,
+    más los miembros `eliminados` (ids borrados) y `version` (marca para la
+    siguiente llamada). since=0 devuelve la capa completa.
+    """
+    tabla = capa["tabla"]
+    if not await _instalada(db, tabla):
+        raise SincronizacionNoInstalada(
+            f"Sincronización no instalada en {tabla}: python -m scripts.instalar_sincronizacion"
+        )
+
+    # La marca se toma antes de leer (ver docstring del módulo)
+    result = await db.execute(text("SELECT pg_snapshot_xmin(pg_current_snapshot())::text::bigint"))
+    version = result.scalar()
+
+    result = await db.execute(text(f"""
+        SELECT {columnas_select(capa)}, ST_AsGeoJSON(t."{capa['geom']}") AS geom
+        FROM "{tabla}" t
+        WHERE t.sync_version >= :since
+        ORDER BY t.sync_version
+    """), {"since": since})
+    coleccion = rows_to_geojson(result.mappings().all())
+
+    eliminados = []
+    if since > 0:
+        result = await db.execute(text("""
+            SELECT DISTINCT feature_id FROM sync_bajas
+            WHERE tabla = :tabla AND version >= :since
+        """), {"tabla": tabla, "since": since})
+        eliminados = [r[0] for r in result.all()]
+
+    coleccion["eliminados"] = eliminados
+    coleccion["version"] = version
+    return coleccion
+
+
+async def responder_cambios(request: Request, db: AsyncSession, nombre_capa: str, since: int):
+    """
+    Respuesta de ?since= para una ruta; 501 si falta instalar la sincronización.
+    """
+    try:
+        coleccion = await cambios_desde(db, obtener_capa(nombre_capa), since)
+    except SincronizacionNoInstalada as e:
+        raise HTTPException(status_code=501, detail=str(e))
+    return responder(request, Payload(json_a_bytes(coleccion), media_type="application/geo+json"))
@@ -0,0 +1,264 @@
+"""
+Codificador TopoJSON (format=topojson) para capas poligonales que forman
+teselaciones: colonias, manzanas del censo y centralidades.
+
+En GeoJSON cada frontera compartida aparece dos veces y con todos los
+decimales; aquí:
+1. Las coordenadas se cuantizan a una rejilla entera de TOPOJSON_CUANTIZACION
+   pasos sobre el bbox de la respuesta (transform scale/translate).
+2. Se detectan las uniones: puntos donde se encuentran anillos con vecinos
+   distintos (o extremos de líneas).
+3. Anillos y líneas se cortan en las uniones y cada arco se guarda una sola
+   vez; si otro anillo lo recorre en sentido contrario se referencia como ~i.
+4. Los arcos se codifican en deltas (primer punto absoluto, luego diferencias).
+
+Sin dependencias externas: la salida es la misma que lee topojson-client.
+"""
+import asyncio
+import json
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+from core.config import settings
+from services.geo_utils import json_a_bytes
+
+
+class _Linea:
+    __slots__ = ("puntos", "anillo")
+
+    def __init__(self, puntos, anillo: bool):
+        self.puntos = puntos
+        self.anillo = anillo
+
+
+def _rotar_al_minimo(anillo):
+    """Anillo cerrado sin uniones rotado para empezar en su punto menor (forma canónica)."""
+    abierto = anillo[:-1]
+    k = abierto.index(min(abierto))
+    return abierto[k:] + abierto[:k] + [abierto[k]]
+
+
+class _Topologia:
+    def __init__(self, cuantizacion: int):
+        self.cuantizacion = cuantizacion
+        self.lineas = []
+        self.arcos = []
+        self._indice_arcos = {}
+
+    # --- 1. cuantización ---
+
+    def preparar(self, geometrias):
+        coords = []
+        for geometria in geometrias:
+            _recolectar(geometria, coords)
+        if coords:
+            xs = [c[0] for c in coords]
+            ys = [c[1] for c in coords]
+            self.bbox = [min(xs), min(ys), max(xs), max(ys)]
+        else:
+            self.bbox = [0.0, 0.0, 0.0, 0.0]
+
+        x0, y0, x1, y1 = self.bbox
+        pasos = self.cuantizacion - 1
+        self.kx = (x1 - x0) / pasos if x1 > x0 else 1.0
+        self.ky = (y1 - y0) / pasos if y1 > y0 else 1.0
+
+    def _q(self, coord):
+        return (round((coord[0] - self.bbox[0]) / self.kx), round((coord[1] - self.bbox[1]) / self.ky))
+
+    def _cuantizar(self, coords, anillo: bool):
+        puntos = []
+        for c in coords:
+            p = self._q(c)
+            if not puntos or puntos[-1] != p:
+                puntos.append(p)
+        if anillo:
+            if puntos[0] != puntos[-1]:
+                puntos.append(puntos[0])
+            # Anillo colapsado por la cuantización
+            if len(puntos) < 4:
+                return None
+        elif len(puntos) < 2:
+            puntos.append(puntos[0])
+        linea = _Linea(puntos, anillo)
+        self.lineas.append(linea)
+        return linea
+
+    def plantilla(self, geometria):
+        """
+        Sustituye anillos y líneas por objetos _Linea; los arcos se resuelven
+        después, cuando ya se conocen todas las uniones.
+        """
+        if not geometria:
+            return None
+        tipo, coords = geometria.get("type"), geometria.get("coordinates")
+
+        if tipo == "Polygon":
+            anillos = [a for a in (self._cuantizar(r, True) for r in coords if r) if a]
+            return ("Polygon", anillos) if anillos else None
+        if tipo == "MultiPolygon":
+            poligonos = []
+            for poligono in coords:
+                anillos = [a for a in (self._cuantizar(r, True) for r in poligono if r) if a]
+                if anillos:
+                    poligonos.append(anillos)
+            return ("MultiPolygon", poligonos) if poligonos else None
+        if tipo == "LineString":
+            return ("LineString", self._cuantizar(coords, False)) if coords else None
+        if tipo == "MultiLineString":
+            return ("MultiLineString", [self._cuantizar(l, False) for l in coords if l]) if coords else None
+        if tipo == "Point":
+            return ("Point", list(self._q(coords)))
+        if tipo == "MultiPoint":
+            return ("MultiPoint", [list(self._q(c)) for c in coords])
+        return None
+
+    # --- 2. uniones ---
+
+    def calcular_uniones(self):
+        vecinos = {}
+        self.uniones = set()
+
+        def visitar(punto, anterior, siguiente):
+            visto = vecinos.get(punto)
+            if visto is None:
+                vecinos[punto] = (anterior, siguiente)
+            elif visto != (anterior, siguiente) and visto != (siguiente, anterior):
+                self.uniones.add(punto)
+
+        for linea in self.lineas:
+            pts = linea.puntos
+            if linea.anillo:
+                n = len(pts) - 1
+                for i in range(n):
+                    visitar(pts[i], pts[i - 1] if i else pts[n - 1], pts[i + 1])
+            else:
+                self.uniones.add(pts[0])
+                self.uniones.add(pts[-1])
+                for i in range(1, len(pts) - 1):
+                    visitar(pts[i], pts[i - 1], pts[i + 1])
+
+    # --- 3. corte y deduplicación ---
+
+    def _registrar(self, arco, anillo_libre: bool) -> int:
+        indice = self._indice_arcos.get(tuple(arco))
+        if indice is not None:
+            return indice
+
+        inverso = arco[::-1]
+        if anillo_libre:
+            inverso = _rotar_al_minimo(inverso)
+        indice = self._indice_arcos.get(tuple(inverso))
+        if indice is not None:
+            return ~indice
+
+        self.arcos.append(arco)
+        self._indice_arcos[tuple(arco)] = len(self.arcos) - 1
+        return len(self.arcos) - 1
+
+    def arcos_de(self, linea: _Linea):
+        pts = linea.puntos
+        if linea.anillo:
+            abierto = pts[:-1]
+            cortes = [i for i, p in enumerate(abierto) if p in self.uniones]
+            if not cortes:
+                return [self._registrar(_rotar_al_minimo(pts), True)]
+            k = cortes[0]
+            pts = abierto[k:] + abierto[:k] + [abierto[k]]
+
+        indices, inicio = [], 0
+        for i in range(1, len(pts)):
+            if pts[i] in self.uniones or i == len(pts) - 1:
+                indices.append(self._registrar(pts[inicio:i + 1], False))
+                inicio = i
+        return indices
+
+    def resolver(self, plantilla):
+        if plantilla is None:
+            return None
+        tipo, datos = plantilla
+        if tipo == "Polygon":
+            return {"type": tipo, "arcs": [self.arcos_de(a) for a in datos]}
+        if tipo == "MultiPolygon":
+            return {"type": tipo, "arcs": [[self.arcos_de(a) for a in p] for p in datos]}
+        if tipo == "LineString":
+            return {"type": tipo, "arcs": self.arcos_de(datos)}
+        if tipo == "MultiLineString":
+            return {"type": tipo, "arcs": [self.arcos_de(l) for l in datos]}
+        return {"type": tipo, "coordinates": datos}
+
+    # --- 4. deltas ---
+
+    def arcos_delta(self):
+        salida = []
+        for arco in self.arcos:
+            x0, y0 = arco[0]
+            codificado = [[x0, y0]]
+            for x, y in arco[1:]:
+                codificado.append([x - x0, y - y0])
+                x0, y0 = x, y
+            salida.append(codificado)
+        return salida
+
+
+def _recolectar(geometria, coords):
+    if not geometria:
+        return
+    c = geometria.get("coordinates")
+    tipo = geometria.get("type")
+    if tipo == "Point":
+        coords.append(c)
+    elif tipo in ("MultiPoint", "LineString"):
+        coords.extend(c)
+    elif tipo in ("Polygon", "MultiLineString"):
+        for parte in c:
+            coords.extend(parte)
+    elif tipo == "MultiPolygon":
+        for poligono in c:
+            for anillo in poligono:
+                coords.extend(anillo)
+
+
+def codificar_topojson(features, nombre_objeto: str, cuantizacion: int = None) -> dict:
+    """
+    `features`: lista de (propiedades, geometría GeoJSON como dict o None).
+    Devuelve el documento Topology con un solo objeto GeometryCollection.
+    """
+    topologia = _Topologia(cuantizacion or settings.TOPOJSON_CUANTIZACION)
+    topologia.preparar([g for _, g in features])
+    plantillas = [(props, topologia.plantilla(g)) for props, g in features]
+    topologia.calcular_uniones()
+
+    geometrias = []
+    for props, plantilla in plantillas:
+        geometria = topologia.resolver(plantilla) or {"type": None}
+        geometria["properties"] = props
+        feature_id = props.get("id") or props.get("gid") or props.get("cvegeo")
+        if feature_id is not None:
+            geometria["id"] = feature_id
+        geometrias.append(geometria)
+
+    return {
+        "type": "Topology",
+        "bbox": topologia.bbox,
+        "transform": {
+            "scale": [topologia.kx, topologia.ky],
+            "translate": [topologia.bbox[0], topologia.bbox[1]],
+        },
+        "objects": {nombre_objeto: {"type": "GeometryCollection", "geometries": geometrias}},
+        "arcs": topologia.arcos_delta(),
+    }
+
+
+async def consultar_topojson(db: AsyncSession, sql: str, params: dict, nombre_objeto: str, geom_col: str = "geom") -> bytes:
+    """
+    Ejecuta el SELECT de un router (geometría como texto de ST_AsGeoJSON) y
+    devuelve la topología serializada. La codificación es CPU pura y corre en
+    un hilo para no bloquear el event loop con capas grandes.
+    """
+    result = await db.execute(text(sql), params or {})
+    features = []
+    for row in result.mappings().all():
+        props = dict(row)
+        crudo = props.pop(geom_col, None)
+        features.append((props, json.loads(crudo) if isinstance(crudo, str) else crudo))
+    return await asyncio.to_thread(lambda: json_a_bytes(codificar_topojson(features, nombre_objeto)))
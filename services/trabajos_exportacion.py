@@ -0,0 +1,269 @@
+"""
+Trabajos de exportación en segundo plano (/exportaciones).
+
+Las descargas grandes (capa completa o bbox muy amplio) no ocupan la
+petición: se encolan, un número fijo de workers las escribe a disco en
+EXPORT_DIR/trabajos y el cliente consulta el estado y descarga el archivo
+cuando está listo.
+
+- La cola es acotada (EXPORT_MAX_COLA); si está llena se rechaza el trabajo.
+- Un trabajo idéntico (capa, bbox, formato) pendiente o en proceso no se
+  duplica: se devuelve el existente.
+- Los formatos GeoJSON se escriben con el mismo cursor del lado del servidor
+  que usa el streaming de las rutas; fgb reutiliza la exportación FlatGeobuf.
+- Los trabajos terminados se borran (registro y archivo) tras
+  EXPORT_RETENCION_SEGUNDOS, desde una tarea periódica. Esa tarea también
+  borra los archivos viejos que dejaron procesos anteriores (los registros
+  solo viven en memoria).
+"""
+import asyncio
+import os
+import shutil
+import time
+import uuid
+from core.config import settings
+from db.connection import ENGINES_LECTURA
+from services.capas import columnas_select
+from services.exportacion_fgb import archivo_fgb, FGB_MEDIA_TYPE, _borrar
+from services.geo_utils import stream_geojson, FORMATOS_STREAM
+
+# formato -> (extensión, media type)
+FORMATOS_EXPORTACION = {
+    "geojson": ("geojson", "application/geo+json"),
+    "ndjson": ("ndjson", FORMATOS_STREAM["ndjson"]),
+    "geojsonseq": ("geojsons", FORMATOS_STREAM["geojsonseq"]),
+    "fgb": ("fgb", FGB_MEDIA_TYPE),
+}
+
+PENDIENTE, EN_PROCESO, TERMINADO, ERROR = "pendiente", "en_proceso", "terminado", "error"
+
+# Cada cuánto se purgan trabajos vencidos (como mucho, la retención)
+INTERVALO_PURGA_SEGUNDOS = 300
+
+
+class ColaExportacionLlena(Exception):
+    """Hay EXPORT_MAX_COLA trabajos esperando; el cliente debe reintentar."""
+
+
+class Trabajo:
+    def __init__(self, nombre_capa: str, capa: dict, bbox, formato: str):
+        self.id = uuid.uuid4().hex
+        self.nombre_capa = nombre_capa
+        self.capa = capa
+        self.bbox = bbox
+        self.formato = formato
+        self.estado = PENDIENTE
+        self.creado = time.time()
+        self.iniciado = None
+        self.terminado = None
+        self.error = None
+        self.ruta = None
+        self.bytes = None
+
+    @property
+    def clave(self):
+        return (self.nombre_capa, self.bbox, self.formato)
+
+    @property
+    def nombre_archivo(self):
+        return f"{self.nombre_capa}.{FORMATOS_EXPORTACION[self.formato][0]}"
+
+    @property
+    def media_type(self):
+        return FORMATOS_EXPORTACION[self.formato][1]
+
+    def a_dict(self):
+        return {
+            "id": self.id,
+            "estado": self.estado,
+            "capa": self.nombre_capa,
+            "formato": self.formato,
+            "bbox": list(self.bbox) if self.bbox else None,
+            "creado": self.creado,
+            "iniciado": self.iniciado,
+            "terminado": self.terminado,
+            "bytes": self.bytes,
+            "error": self.error,
+        }
+
+
+def _sql_capa(capa: dict, bbox) -> tuple:
+    geom = capa["geom"]
+    filtro, params = "", {}
+    if bbox:
+        # Envolvente reproyectada al SRID de la tabla para usar el índice GiST
+        filtro = f"""
+            WHERE t."{geom}" && ST_Transform(
+                ST_MakeEnvelope(:min_lon, :min_lat, :max_lon, :max_lat, 4326),
+                Find_SRID('public', :tabla, :geom_col)
+            )
+        """
+        params = {
+            "min_lon": bbox[0], "min_lat": bbox[1], "max_lon": bbox[2], "max_lat": bbox[3],
+            "tabla": capa["tabla"], "geom_col": geom,
+        }
+    sql = f"""
+        SELECT {columnas_select(capa)}, ST_AsGeoJSON(ST_Transform(t."{geom}", 4326)) AS geom
+        FROM "{capa['tabla']}" t
+        {filtro}
+    """
+    return sql, params
+
+
+class GestorExportaciones:
+    def __init__(self, workers: int, max_cola: int):
+        self.workers = workers
+        self.max_cola = max_cola
+        self._cola = None
+        self._tareas = []
+        self._trabajos = {}
+        self._activos = {}  # clave -> trabajo pendiente o en proceso
+        self.deduplicados = 0
+        self.rechazados = 0
+
+    @property
+    def directorio(self):
+        return os.path.join(settings.EXPORT_DIR, "trabajos")
+
+    def iniciar(self):
+        if self._tareas:
+            return
+        self._cola = asyncio.Queue(maxsize=self.max_cola)
+        self._tareas = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        self._tareas.append(asyncio.create_task(self._purgar_periodicamente()))
+
+    async def detener(self):
+        for tarea in self._tareas:
+            tarea.cancel()
+        await asyncio.gather(*self._tareas, return_exceptions=True)
+        self._tareas = []
+
+    def enviar(self, nombre_capa: str, capa: dict, bbox, formato: str) -> Trabajo:
+        # Normalmente arranca en el startup de main.py; aquí por si no se llamó
+        self.iniciar()
+        self._purgar()
+        nuevo = Trabajo(nombre_capa, capa, tuple(bbox) if bbox else None, formato)
+
+        existente = self._activos.get(nuevo.clave)
+        if existente is not None:
+            self.deduplicados += 1
+            return existente
+
+        try:
+            self._cola.put_nowait(nuevo)
+        except asyncio.QueueFull:
+            self.rechazados += 1
+            raise ColaExportacionLlena(f"Hay {self.max_cola} exportaciones en espera")
+
+        self._trabajos[nuevo.id] = nuevo
+        self._activos[nuevo.clave] = nuevo
+        return nuevo
+
+    def obtener(self, trabajo_id: str):
+        return self._trabajos.get(trabajo_id)
+
+    async def _worker(self):
+        while True:
+            trabajo = await self._cola.get()
+            trabajo.estado = EN_PROCESO
+            trabajo.iniciado = time.time()
+            try:
+                await self._ejecutar(trabajo)
+                trabajo.estado = TERMINADO
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Error en la exportación {trabajo.id} ({trabajo.nombre_capa}): {e}")
+                trabajo.estado = ERROR
+                trabajo.error = str(e)
+            finally:
+                trabajo.terminado = time.time()
+                self._activos.pop(trabajo.clave, None)
+                self._cola.task_done()
+
+    async def _ejecutar(self, trabajo: Trabajo):
+        os.makedirs(self.directorio, exist_ok=True)
+        destino = os.path.join(self.directorio, f"{trabajo.id}.{FORMATOS_EXPORTACION[trabajo.formato][0]}")
+        temporal = destino + ".tmp"
+
+        try:
+            if trabajo.formato == "fgb":
+                # Copia (enlace duro si se puede) del archivo cacheado: la caché
+                # FlatGeobuf borra versiones viejas y la descarga debe sobrevivir
+                origen = await archivo_fgb(trabajo.nombre_capa, trabajo.capa)
+                await asyncio.to_thread(_enlazar_o_copiar, origen, temporal)
+            else:
+                formato_stream = "geojson-stream" if trabajo.formato == "geojson" else trabajo.formato
+                sql, params = _sql_capa(trabajo.capa, trabajo.bbox)
+                engine = ENGINES_LECTURA[trabajo.capa["bd"]]
+                with open(temporal, "wb") as archivo:
+                    async for trozo in stream_geojson(engine, sql, params, formato_stream):
+                        await asyncio.to_thread(archivo.write, trozo)
+            os.replace(temporal, destino)
+        except BaseException:
+            _borrar(temporal)
+            raise
+
+        trabajo.ruta = destino
+        trabajo.bytes = os.path.getsize(destino)
+
+    async def _purgar_periodicamente(self):
+        # La primera pasada (al arrancar) limpia lo que dejó el proceso anterior
+        while True:
+            try:
+                self._purgar()
+            except Exception as e:
+                print(f"Error al purgar exportaciones: {e}")
+            await asyncio.sleep(min(INTERVALO_PURGA_SEGUNDOS, settings.EXPORT_RETENCION_SEGUNDOS))
+
+    def _purgar(self):
+        limite = time.time() - settings.EXPORT_RETENCION_SEGUNDOS
+        vencidos = [t for t in self._trabajos.values() if t.terminado and t.terminado < limite]
+        for trabajo in vencidos:
+            del self._trabajos[trabajo.id]
+            if trabajo.ruta:
+                _borrar(trabajo.ruta)
+        self._barrer_directorio(limite)
+
+    def _barrer_directorio(self, limite: float):
+        """
+        Archivos sin trabajo registrado (de otro proceso o de antes de un
+        reinicio) con más antigüedad que la retención.
+        """
+        try:
+            nombres = os.listdir(self.directorio)
+        except FileNotFoundError:
+            return
+        for nombre in nombres:
+            # Los archivos se llaman <id>.<ext> o <id>.<ext>.tmp
+            if nombre.split(".", 1)[0] in self._trabajos:
+                continue
+            ruta = os.path.join(self.directorio, nombre)
+            try:
+                if os.path.getmtime(ruta) < limite:
+                    _borrar(ruta)
+            except FileNotFoundError:
+                pass
+
+    def estadisticas(self):
+        estados = {}
+        for trabajo in self._trabajos.values():
+            estados[trabajo.estado] = estados.get(trabajo.estado, 0) + 1
+        return {
+            "workers": self.workers,
+            "en_cola": self._cola.qsize() if self._cola else 0,
+            "max_cola": self.max_cola,
+            "por_estado": estados,
+            "deduplicados": self.deduplicados,
+            "rechazados": self.rechazados,
+        }
+
+
+def _enlazar_o_copiar(origen: str, destino: str):
+    try:
+        os.link(origen, destino)
+    except OSError:
+        shutil.copyfile(origen, destino)
+
+
+gestor_exportaciones = GestorExportaciones(settings.EXPORT_WORKERS, settings.EXPORT_MAX_COLA)
@@ -0,0 +1,50 @@
+"""
+Coalescencia de consultas idénticas en curso ("single-flight").
+
+Si llegan varias peticiones con la misma clave mientras la primera sigue
+consultando la base, todas esperan esa misma ejecución y reciben el mismo
+resultado. La tarea es independiente de la petición que la inició, así que
+si ese cliente se desconecta los demás no se quedan sin respuesta.
+"""
+import asyncio
+
+
+class VueloUnico:
+    def __init__(self):
+        self._en_curso = {}
+        self.ejecuciones = 0
+        self.compartidas = 0
+
+    async def ejecutar(self, clave: str, productor):
+        """
+        `productor` es una función sin argumentos que devuelve una corrutina;
+        solo se llama si no hay otra ejecución en curso con la misma clave.
+        """
+        tarea = self._en_curso.get(clave)
+        if tarea is None:
+            tarea = asyncio.create_task(productor())
+            self._en_curso[clave] = tarea
+            tarea.add_done_callback(lambda t: self._terminar(clave, t))
+            self.ejecuciones += 1
+        else:
+            self.compartidas += 1
+
+        # shield: cancelar a un cliente no cancela la consulta compartida
+        return await asyncio.shield(tarea)
+
+    def _terminar(self, clave: str, tarea: asyncio.Task):
+        if self._en_curso.get(clave) is tarea:
+            del self._en_curso[clave]
+        # Marca la excepción como consultada aunque todos los clientes se hayan ido
+        if not tarea.cancelled():
+            tarea.exception()
+
+    def estadisticas(self):
+        return {
+            "en_curso": len(self._en_curso),
+            "ejecuciones": self.ejecuciones,
+            "compartidas": self.compartidas,
+        }
+
+
+vuelo_unico = VueloUnico()
@@ -0,0 +1,39 @@
+"""
+ogr2ogr falso que imita al driver FlatGeobuf de GDAL: si la salida no
+termina en .fgb crea un directorio con <capa>.fgb dentro. La versión de la
+capa y la conexión a PostGIS se sustituyen para no necesitar la base.
+"""
+import os
+import stat
+import sys
+import pytest
+from core.config import settings
+from services import exportacion_fgb
+
+OGR2OGR_FALSO = f"""#!{sys.executable}
+import os, sys
+args = sys.argv[1:]
+salida = args[args.index("-f") + 2]
+capa = args[args.index("-nln") + 1]
+if not salida.endswith(".fgb"):
+    os.makedirs(salida, exist_ok=True)
+    salida = os.path.join(salida, capa + ".fgb")
+with open(salida, "wb") as f:
+    f.write(b"fgb\\x03fgb\\x00")
+"""
+
+
+@pytest.fixture
+def ogr2ogr_falso(tmp_path, monkeypatch):
+    ogr2ogr = tmp_path / "ogr2ogr"
+    ogr2ogr.write_text(OGR2OGR_FALSO)
+    ogr2ogr.chmod(ogr2ogr.stat().st_mode | stat.S_IEXEC)
+
+    async def version_fija(capa):
+        return "v1"
+
+    monkeypatch.setattr(settings, "OGR2OGR_BIN", str(ogr2ogr))
+    monkeypatch.setattr(settings, "EXPORT_DIR", str(tmp_path / "exportaciones"))
+    monkeypatch.setattr(exportacion_fgb, "version_capa", version_fija)
+    monkeypatch.setattr(exportacion_fgb, "_cadena_pg", lambda capa: ("PG:dbname=prueba", dict(os.environ)))
+    return tmp_path
@@ -0,0 +1,26 @@
+"""
+Invalidación de la caché de respuestas mientras se calcula una entrada.
+"""
+import asyncio
+from services.cache import cache_respuestas, obtener_o_calcular
+
+
+def test_invalidacion_durante_el_calculo_no_se_cachea():
+    cache_respuestas.limpiar()
+    clave = cache_respuestas.clave("/mis_zonas/", prueba="invalidacion")
+
+    async def productor_con_escritura():
+        # Una escritura confirma e invalida mientras la consulta sigue en curso
+        cache_respuestas.invalidar("mis_zonas")
+        return b'{"antes": true}'
+
+    async def productor():
+        return b'{"despues": true}'
+
+    async def correr():
+        await obtener_o_calcular(clave, ("mis_zonas",), productor_con_escritura)
+        assert cache_respuestas.obtener(clave) is None
+        await obtener_o_calcular(clave, ("mis_zonas",), productor)
+        return cache_respuestas.obtener(clave)
+
+    assert asyncio.run(correr()).contenido == b'{"despues": true}'
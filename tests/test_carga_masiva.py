@@ -0,0 +1,32 @@
+"""
+Validación de geometrías de la carga masiva: lo que se rechaza aquí se
+reporta por feature en vez de hacer fallar ST_GeomFromGeoJSON en la base.
+"""
+import pytest
+from services.carga_masiva import validar_geometria
+
+CUADRADO = [[[0, 0], [1, 0], [1, 1], [0, 1], [0, 0]]]
+
+
+@pytest.mark.parametrize("geometria", [
+    {"type": "Point", "coordinates": [-93.1, 16.75]},
+    {"type": "Point", "coordinates": [-93, 16, 520.5]},
+    {"type": "Polygon", "coordinates": CUADRADO},
+    {"type": "MultiPolygon", "coordinates": [CUADRADO]},
+])
+def test_acepta_geometrias_validas(geometria):
+    assert validar_geometria(geometria)
+
+
+@pytest.mark.parametrize("geometria", [
+    None,
+    {"type": "Point", "coordinates": [True, False]},
+    {"type": "Point", "coordinates": [-93.1, True]},
+    {"type": "Point", "coordinates": ["-93.1", 16.75]},
+    {"type": "Point", "coordinates": [-93.1]},
+    {"type": "Polygon", "coordinates": [[[0, 0], [1, 0], [1, 1], [0, 0.5]]]},
+    {"type": "GeometryCollection", "geometries": []},
+])
+def test_rechaza_geometrias_invalidas(geometria):
+    with pytest.raises(ValueError):
+        validar_geometria(geometria)
@@ -0,0 +1,30 @@
+"""
+Qué sentencias lentas se vuelven a ejecutar con EXPLAIN ANALYZE.
+"""
+import pytest
+from services.consultas_lentas import _es_select
+
+
+@pytest.mark.parametrize("sentencia", [
+    "SELECT * FROM cpyv_2020 WHERE wkb_geometry && ST_MakeEnvelope($1, $2, $3, $4, 4326)",
+    "  select id, updated_at, update_count FROM mis_zonas",
+    "WITH z AS (SELECT id FROM mis_zonas) SELECT count(*) FROM z",
+])
+def test_explica_lecturas(sentencia):
+    assert _es_select(sentencia)
+
+
+@pytest.mark.parametrize("sentencia", [
+    "WITH x AS (INSERT INTO mis_zonas (nombre) VALUES ($1) RETURNING id) SELECT * FROM x",
+    "WITH x AS(DELETE FROM sync_bajas RETURNING id) SELECT count(*) FROM x",
+    "WITH x AS (\nUPDATE mis_zonas SET nombre = $1 RETURNING id) SELECT * FROM x",
+    "SELECT * FROM users WHERE username = $1 FOR UPDATE",
+    "SELECT * FROM users WHERE username = $1 FOR NO KEY UPDATE",
+    "SELECT * FROM users WHERE username = $1 for share",
+    "SELECT * FROM users WHERE username = $1 FOR KEY SHARE",
+    "SELECT nextval('sync_bajas_id_seq')",
+    "INSERT INTO mis_zonas (nombre) VALUES ($1)",
+    "",
+])
+def test_no_explica_escrituras(sentencia):
+    assert not _es_select(sentencia)
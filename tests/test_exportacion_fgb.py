@@ -0,0 +1,29 @@
+"""
+Exportación FlatGeobuf con el ogr2ogr falso de conftest.py.
+"""
+import asyncio
+import os
+from core.config import settings
+from services import exportacion_fgb
+from services.capas import obtener_capa
+
+
+def test_exporta_archivo_regular(ogr2ogr_falso):
+    ruta = asyncio.run(exportacion_fgb.archivo_fgb("colonias", obtener_capa("colonias")))
+
+    assert os.path.basename(ruta) == "colonias-v1.fgb"
+    assert os.path.isfile(ruta)
+    assert os.listdir(settings.EXPORT_DIR) == ["colonias-v1.fgb"]
+
+
+def test_reemplaza_directorio_de_exportacion_anterior(ogr2ogr_falso):
+    # Lo que dejaba la versión que escribía a <destino>.<pid>.tmp
+    viejo = os.path.join(settings.EXPORT_DIR, "colonias-v1.fgb")
+    os.makedirs(viejo)
+    open(os.path.join(viejo, "colonias.fgb"), "wb").close()
+    os.makedirs(os.path.join(settings.EXPORT_DIR, "colonias-v0.fgb"))
+
+    ruta = asyncio.run(exportacion_fgb.archivo_fgb("colonias", obtener_capa("colonias")))
+
+    assert os.path.isfile(ruta)
+    assert os.listdir(settings.EXPORT_DIR) == ["colonias-v1.fgb"]
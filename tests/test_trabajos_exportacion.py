@@ -0,0 +1,52 @@
+"""
+Trabajos de exportación: formato fgb (con el ogr2ogr falso de conftest.py)
+y purga de archivos vencidos.
+"""
+import asyncio
+import os
+import time
+from core.config import settings
+from services.capas import obtener_capa
+from services.trabajos_exportacion import GestorExportaciones, TERMINADO
+
+
+async def _exportar(gestor: GestorExportaciones, nombre_capa: str):
+    trabajo = gestor.enviar(nombre_capa, obtener_capa(nombre_capa), None, "fgb")
+    try:
+        await asyncio.wait_for(gestor._cola.join(), 30)
+    finally:
+        await gestor.detener()
+    return trabajo
+
+
+def test_trabajo_fgb_termina_con_archivo(ogr2ogr_falso):
+    trabajo = asyncio.run(_exportar(GestorExportaciones(workers=1, max_cola=5), "colonias"))
+
+    assert trabajo.estado == TERMINADO, trabajo.error
+    assert os.path.isfile(trabajo.ruta)
+    assert trabajo.ruta.endswith(".fgb")
+    assert trabajo.bytes == os.path.getsize(trabajo.ruta) > 0
+
+
+def test_purga_archivos_de_procesos_anteriores(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "EXPORT_DIR", str(tmp_path))
+    monkeypatch.setattr(settings, "EXPORT_RETENCION_SEGUNDOS", 3600)
+    gestor = GestorExportaciones(workers=1, max_cola=5)
+    os.makedirs(gestor.directorio)
+
+    viejo = os.path.join(gestor.directorio, "a" * 32 + ".geojson")
+    reciente = os.path.join(gestor.directorio, "b" * 32 + ".geojson")
+    for ruta in (viejo, reciente):
+        open(ruta, "wb").close()
+    hace_dos_horas = time.time() - 7200
+    os.utime(viejo, (hace_dos_horas, hace_dos_horas))
+
+    async def arrancar_y_detener():
+        gestor.iniciar()
+        await asyncio.sleep(0)
+        await gestor.detener()
+
+    asyncio.run(arrancar_y_detener())
+
+    assert not os.path.exists(viejo)
+    assert os.path.exists(reciente)